@@ -0,0 +1,158 @@
+"""
+VideoNet Pro - 동영상 분석 결과 캐시
+같은 동영상을 다시 분석하면 프레임 추출과 GPT Vision 호출 없이 저장된 결과를 반환합니다
+- 키: 동영상 SHA256 + 분석 파라미터 (프레임 수, 모델, 프롬프트 버전 등)
+- SQLite에 저장되어 재시작/여러 워커 간에 유지
+- 항목 수/전체 크기 제한, 초과 시 오래 조회되지 않은 항목부터 삭제 (LRU)
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def cache_key(file_hash: str, params: dict) -> str:
+    """동영상 해시 + 파라미터로 캐시 키 생성 (파라미터 순서와 무관)"""
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{file_hash}:{encoded}".encode()).hexdigest()
+
+
+class AnalysisCache:
+    """
+    분석 결과 캐시
+    - get: 조회 시 마지막 조회 시각 갱신 (LRU)
+    - put: 저장 후 제한을 넘으면 오래된 항목 삭제
+    - 적중/실패 수와 절약한 Vision 호출 시간/토큰 집계 (프로세스 시작 이후)
+    max_entries가 0이면 캐시를 쓰지 않음
+    """
+
+    def __init__(self, db_path: Path, max_entries: int, max_bytes: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(str(db_path), isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                         "saved_vision_seconds": 0.0, "saved_tokens": 0}
+        self._init_schema()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _init_schema(self):
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                params TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                vision_seconds REAL NOT NULL,
+                tokens_used INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_lru "
+                          "ON analysis_cache (last_accessed_at)")
+
+    def get(self, key: str) -> Optional[dict]:
+        """저장된 분석 결과 (없으면 None)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result, vision_seconds, tokens_used FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.conn.execute(
+                "UPDATE analysis_cache SET last_accessed_at = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key)
+            )
+            self.counters["hits"] += 1
+            self.counters["saved_vision_seconds"] += row["vision_seconds"]
+            self.counters["saved_tokens"] += row["tokens_used"]
+        return json.loads(row["result"])
+
+    def put(self, key: str, file_hash: str, params: dict, result: dict,
+            vision_seconds: float, tokens_used: int):
+        """
+        분석 결과 저장
+        vision_seconds / tokens_used: 이 결과를 만드는 데 든 비용 (적중 시 절약량으로 집계)
+        """
+        if not self.enabled:
+            return
+        encoded = json.dumps(result, ensure_ascii=False)
+        if len(encoded) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO analysis_cache
+                        (key, file_hash, params, result, size, vision_seconds, tokens_used,
+                         created_at, last_accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (key, file_hash, json.dumps(params, sort_keys=True), encoded, len(encoded),
+                      vision_seconds, tokens_used, now, now))
+                evicted = self._evict()
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+            self.counters["stores"] += 1
+            self.counters["evictions"] += evicted
+
+    def _evict(self) -> int:
+        """제한을 넘는 만큼 오래 조회되지 않은 항목부터 삭제 -> 삭제한 항목 수"""
+        entries, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache"
+        ).fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return 0
+
+        victims = []
+        for row in self.conn.execute("SELECT key, size FROM analysis_cache ORDER BY last_accessed_at"):
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((row["key"],))
+            entries -= 1
+            total -= row["size"]
+        self.conn.executemany("DELETE FROM analysis_cache WHERE key = ?", victims)
+        return len(victims)
+
+    def invalidate(self, file_hash: str) -> int:
+        """동영상의 모든 분석 결과 삭제 -> 삭제한 항목 수"""
+        with self._lock:
+            return self.conn.execute(
+                "DELETE FROM analysis_cache WHERE file_hash = ?", (file_hash,)
+            ).rowcount
+
+    def stats(self) -> Dict[str, float]:
+        entries, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache"
+        ).fetchone()
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "saved_vision_seconds": round(self.counters["saved_vision_seconds"], 3),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
@@ -0,0 +1,251 @@
+"""
+VideoNet Pro - 동영상 분석 작업 큐
+업로드를 받으면 작업 ID를 바로 돌려주고 분석은 백그라운드 워커가 실행합니다
+- 크기 제한 큐: 가득 차면 새 작업을 거절 (503, 업로드 본문을 받기 전에 판단)
+- 워커 수만큼만 동시에 분석 (프레임 추출/Vision 호출이 요청 수만큼 늘지 않음)
+- 진행 상황은 이벤트로 발행 (SSE 구독자 + Socket.IO 등 등록된 리스너)
+- 끝난 작업의 결과는 일정 시간 보관 (개수 제한, 오래된 작업부터 삭제)
+"""
+
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# ===== 설정 =====
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))  # 동시에 실행할 분석 수
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "16"))  # 대기 가능한 작업 수
+ANALYSIS_JOB_TTL_SECONDS = int(os.getenv("ANALYSIS_JOB_TTL_SECONDS", "3600"))  # 끝난 작업 보관 시간
+ANALYSIS_MAX_JOBS = int(os.getenv("ANALYSIS_MAX_JOBS", "200"))  # 보관할 작업 수 (결과 포함)
+ANALYSIS_EVENT_KEEPALIVE_SECONDS = float(os.getenv("ANALYSIS_EVENT_KEEPALIVE_SECONDS", "15"))
+
+FINISHED = ("done", "failed")
+
+# 분석 함수: (작업 인자, 진행 보고 함수) -> 결과
+# 진행 보고 함수: await progress(stage, **data)
+Runner = Callable[[Dict[str, Any], Callable[..., Awaitable[None]]], Awaitable[Dict[str, Any]]]
+Listener = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+
+
+class JobQueueFull(Exception):
+    """분석 대기열이 가득 참"""
+
+
+class AnalysisJobQueue:
+    """
+    분석 작업 워커 풀
+    - submit: 작업 등록 (기다리지 않음), 큐가 가득 차면 JobQueueFull
+    - 상태: queued -> running -> done / failed
+    - 이벤트: status (상태 변경), progress (단계/진행률)
+    """
+
+    def __init__(self, run: Runner, workers: int = ANALYSIS_WORKERS, queue_size: int = ANALYSIS_QUEUE_SIZE,
+                 ttl: int = ANALYSIS_JOB_TTL_SECONDS, max_jobs: int = ANALYSIS_MAX_JOBS):
+        self.run = run
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self.max_jobs = max(max_jobs, workers + queue_size)  # 진행 중인 작업은 지우지 않도록
+        self.queue: Optional[asyncio.Queue] = None
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.listeners: List[Listener] = []
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "expired": 0}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._cleanups: Dict[str, Callable[[], None]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    # ----- 조회 -----
+
+    def check(self):
+        """새 작업을 받을 수 있는지 확인 (업로드를 받기 전에 호출, 불가능하면 JobQueueFull)"""
+        if self.queue is None or self.queue.full():
+            self.counters["rejected"] += 1
+            raise JobQueueFull("분석 대기열이 가득 찼습니다")
+
+    def _position(self, job_id: str) -> int:
+        """대기열에서 앞에 있는 작업 수 (실행 중이거나 끝났으면 0)"""
+        position = 0
+        for other_id, job in self.jobs.items():
+            if other_id == job_id:
+                return position if job["status"] == "queued" else 0
+            if job["status"] == "queued":
+                position += 1
+        return 0
+
+    def view(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        """작업 상태 (결과는 include_result일 때만, 없는 작업은 None)"""
+        self._prune()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        view = {key: value for key, value in job.items() if key not in ("params", "result")}
+        view["position"] = self._position(job_id)
+        if include_result and job["status"] == "done":
+            view["result"] = job["result"]
+        return view
+
+    # ----- 등록/실행 -----
+
+    def submit(self, params: Dict[str, Any], cleanup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """
+        분석 작업 등록 -> 작업 상태
+        cleanup: 작업이 끝나거나 버려질 때 호출 (임시 파일 삭제 등)
+        """
+        self._prune()
+        self.check()
+        job_id = uuid.uuid4().hex
+        self.queue.put_nowait(job_id)
+
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": {},
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "params": params,
+            "result": None
+        }
+        if cleanup is not None:
+            self._cleanups[job_id] = cleanup
+        self.counters["submitted"] += 1
+        return self.view(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                await self._publish(job_id, "status")
+
+                async def progress(stage: str, **data):
+                    job["stage"] = stage
+                    job["progress"] = data
+                    await self._publish(job_id, "progress")
+
+                try:
+                    job["result"] = await self.run(job["params"], progress)
+                    job["status"] = job["stage"] = "done"
+                    self.counters["completed"] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    job["status"] = job["stage"] = "failed"
+                    job["error"] = getattr(e, "detail", None) or str(e)
+                    self.counters["failed"] += 1
+                    print(f"⚠️ 분석 작업 실패: {job_id[:8]} ({job['error']})")
+                job["finished_at"] = time.time()
+                job["params"] = None
+                await self._publish(job_id, "status")
+            finally:
+                self._cleanup(job_id)
+                self.queue.task_done()
+
+    def _cleanup(self, job_id: str):
+        cleanup = self._cleanups.pop(job_id, None)
+        if cleanup is None:
+            return
+        try:
+            cleanup()
+        except Exception as e:
+            print(f"⚠️ 분석 작업 정리 실패: {job_id[:8]} ({e})")
+
+    def _prune(self):
+        """보관 시간이 지났거나 개수 제한을 넘는 끝난 작업 삭제 (오래된 것부터)"""
+        now = time.time()
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in FINISHED]
+        excess = len(self.jobs) - self.max_jobs
+        for job_id in finished:
+            if excess <= 0 and now - self.jobs[job_id]["finished_at"] <= self.ttl:
+                continue
+            del self.jobs[job_id]
+            excess -= 1
+            self.counters["expired"] += 1
+
+    # ----- 이벤트 -----
+
+    def add_listener(self, listener: Listener):
+        """모든 작업 이벤트를 받을 함수 등록: await listener(job_id, event, 작업 상태)"""
+        self.listeners.append(listener)
+
+    async def _publish(self, job_id: str, event: str):
+        view = self.view(job_id)
+        if view is None:
+            return
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait((event, view))
+        for listener in self.listeners:
+            try:
+                await listener(job_id, event, view)
+            except Exception as e:
+                print(f"⚠️ 분석 이벤트 전달 실패: {job_id[:8]} ({e})")
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Tuple[Optional[str], Optional[Dict[str, Any]]]]:
+        """
+        작업 이벤트 구독 -> (이벤트, 작업 상태)
+        - 현재 상태를 먼저 보내고 작업이 끝나면 종료
+        - 이벤트가 없으면 ANALYSIS_EVENT_KEEPALIVE_SECONDS마다 (None, None) (연결 유지용)
+        """
+        view = self.view(job_id)
+        if view is None:
+            return
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            yield "status", view
+            if view["status"] in FINISHED:
+                return
+            while True:
+                try:
+                    event, view = await asyncio.wait_for(queue.get(), ANALYSIS_EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None, None
+                    continue
+                yield event, view
+                if event == "status" and view["status"] in FINISHED:
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    # ----- 수명 -----
+
+    def start(self):
+        """워커 시작 (이벤트 루프 안에서 호출)"""
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+        # 실행되지 못한 작업의 임시 파일 정리
+        for job_id in list(self._cleanups):
+            self._cleanup(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            **self.counters,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "retained": len(self.jobs),
+            "queue_size": self.queue_size,
+            "workers": self.workers
+        }
@@ -0,0 +1,140 @@
+"""
+동영상 분석 채팅 벤치마크 (POST /api/video/chat, /api/video/chat/stream)
+- 로컬 OpenAI 스텁에 대해 같은 분석 결과로 --turns번 질문
+- history: 클라이언트가 매 요청에 전체 대화 기록(chatHistory)을 보냄 (세션 ID 없음)
+- session: 첫 응답의 session_id만 보내고 대화 기록은 서버 세션이 보관
+- stream: session과 같지만 /chat/stream (SSE)으로 답변 조각을 받음
+- context: session과 같지만 분석 결과를 한 번 등록하고 (POST /chat/contexts) analysis_id만 보냄
+- 턴별 요청 본문 크기, 프롬프트 토큰, 첫 토큰까지 시간 (스트리밍이 아니면 응답 시간과 같음), 응답 시간
+  방식별 턴당 서버 CPU 시간
+  스텁 첫 토큰 지연 = --latency + 프롬프트 토큰 x --prompt-token-latency (긴 프롬프트의 처리 시간)
+  이후 출력 토큰마다 --token-latency
+
+사용법:
+    python benchmarks/bench_chat.py --turns 40 --latency 0.2 --prompt-token-latency 0.0002 --token-latency 0.01
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_vision import StubOpenAI  # noqa: E402
+from common import process_usage, run_server  # noqa: E402
+
+# 분석 결과 예시 (프레임 10개, 이미지 URL)
+ANALYSIS = {
+    "duration": 120.0, "frame_count": 3600, "fps": 30.0, "resolution": [1280, 720], "file_size": 52428800,
+    "summary": "동영상 길이: 120.00초, 해상도: 1280x720, FPS: 30.00\n" + "".join(
+        f"  - 프레임 {i + 1} ({i * 12.0:.1f}초): 1. 인물 1명\n2. 회의\n3. 회의실\n" for i in range(10)),
+    "persons_detected": [{"frame_index": i, "timestamp": i * 12.0, "analysis": "1. 인물 1명\n2. 회의\n3. 회의실",
+                          "has_person": True, "person_count": None, "duplicate_of": None,
+                          "key_frame_index": i, "tokens_used": 146} for i in range(10)],
+    "key_frames": [f"/api/video/frames/{i:064x}.jpg" for i in range(10)],
+}
+
+
+def post(host: str, port: int, path: str, payload: dict):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    started = time.perf_counter()
+    conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = response.read()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"채팅 실패: {response.status} {data[:200]}")
+    return json.loads(data), len(body), elapsed, elapsed
+
+
+def chat(host: str, port: int, payload: dict):
+    return post(host, port, "/api/video/chat", payload)
+
+
+def chat_stream(host: str, port: int, payload: dict):
+    """SSE 이벤트를 읽으며 첫 delta까지 시간 측정 -> (결과, 요청 크기, 첫 토큰 s, 전체 s)"""
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    started = time.perf_counter()
+    conn.request("POST", "/api/video/chat/stream", body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    if response.status != 200:
+        raise RuntimeError(f"채팅 실패: {response.status} {response.read()[:200]}")
+    first_token, parts, result, event = None, [], None, None
+    for line in response:
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+            if event == "delta":
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(data["text"])
+            elif event == "done":
+                result = data
+            elif event == "error":
+                raise RuntimeError(f"채팅 실패: {data['detail']}")
+    elapsed = time.perf_counter() - started
+    conn.close()
+    if result is None:
+        raise RuntimeError("채팅 실패: done 이벤트 없이 종료")
+    # 스트리밍은 사용량을 돌려주지 않으므로 프롬프트 토큰은 표시하지 않음
+    return {**result, "answer": "".join(parts), "prompt_tokens": "-"}, len(body), first_token, elapsed
+
+
+def run(host: str, port: int, mode: str, turns: int):
+    """턴별 (요청 크기, 프롬프트 토큰, 첫 토큰 s, 응답 s)"""
+    history, session_id, rows = [], None, []
+    video_info = {"filename": "meeting.mp4", "duration": ANALYSIS["duration"], "resolution": ANALYSIS["resolution"]}
+    if mode == "context":
+        analysis = {"analysis_id": post(host, port, "/api/video/chat/contexts",
+                                        {"analysisResult": ANALYSIS, "videoInfo": video_info})[0]["analysis_id"]}
+    else:
+        analysis = {"analysisResult": ANALYSIS, "videoInfo": video_info}
+    for turn in range(turns):
+        question = f"{turn + 1}번째 질문: 발표자는 무엇을 하고 있나요?"
+        payload = {"question": question, **analysis, "chatHistory": history if mode == "history" else []}
+        if mode != "history":
+            payload["session_id"] = session_id
+        result, size, first_token, elapsed = (chat_stream if mode == "stream" else chat)(host, port, payload)
+        session_id = result["session_id"]
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": result["answer"]}]
+        rows.append((size, result["prompt_tokens"], first_token, elapsed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="동영상 분석 채팅 벤치마크 (로컬 스텁)")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="스텁 응답 지연 (초)")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0002, help="스텁 프롬프트 토큰당 추가 지연 (초)")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="스텁 출력 토큰당 지연 (초)")
+    parser.add_argument("--modes", default="history,session,stream,context")
+    args = parser.parse_args()
+
+    shown = sorted({1, 5, 10, 20, args.turns} & set(range(1, args.turns + 1)))
+    print(f"{'방식':>8}{'턴':>5}{'요청 KB':>9}{'프롬프트 토큰':>14}{'첫 토큰 s':>11}{'응답 s':>9}")
+    with StubOpenAI(args.latency, 0.0, token_latency=args.token_latency,
+                    prompt_token_latency=args.prompt_token_latency) as stub:
+        env = {"OPENAI_API_KEY": "stub", "OPENAI_BASE_URL": f"http://127.0.0.1:{stub.port}/v1"}
+        with run_server(env) as (host, port, proc):
+            cpu_per_turn = {}
+            for mode in args.modes.split(","):
+                before = process_usage(proc.pid)
+                rows = run(host, port, mode, args.turns)
+                cpu_per_turn[mode] = (process_usage(proc.pid)["cpu_seconds"] - before["cpu_seconds"]) * 1000 / args.turns
+                for turn in shown:
+                    size, prompt_tokens, first_token, elapsed = rows[turn - 1]
+                    print(f"{mode:>8}{turn:>5}{size / 1024:>9.1f}{prompt_tokens:>14}{first_token:>11.2f}"
+                          f"{elapsed:>9.2f}")
+    print("턴당 서버 CPU ms: " + ", ".join(f"{mode} {ms:.1f}" for mode, ms in cpu_per_turn.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+저장/전송 압축 벤치마크
+- 파일 종류별 압축률, 압축/해제 처리량 (MB/s)
+- 주어진 네트워크 대역폭에서 압축본 전송이 이득인지 계산
+
+사용법:
+    python benchmarks/bench_compression.py --size-mb 32 --link-mbps 100
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_compression  # noqa: E402
+from file_compression import compress_file, open_decompressed  # noqa: E402
+
+
+def make_samples(size: int) -> dict:
+    """회의에서 공유되는 파일을 흉내 낸 샘플 데이터"""
+    rng = random.Random(42)
+    users = [f"user{i}" for i in range(200)]
+
+    def repeat(make_line):
+        lines, total = [], 0
+        while total < size:
+            line = make_line()
+            lines.append(line)
+            total += len(line) + 1
+        return "\n".join(lines).encode()[:size]
+
+    log = repeat(lambda: f"2026-10-19T12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z "
+                         f"{rng.choice(['INFO', 'WARN', 'DEBUG'])} room={rng.randint(1, 50)} "
+                         f"user={rng.choice(users)} latency_ms={rng.randint(1, 900)}")
+    csv = repeat(lambda: f"{rng.randint(1, 10**6)},{rng.choice(users)},{rng.random():.6f},"
+                         f"{rng.choice(['seoul', 'busan', 'chuncheon'])},{rng.randint(0, 100)}")
+    records = repeat(lambda: json.dumps({"id": rng.randint(1, 10**6), "user": rng.choice(users),
+                                         "score": round(rng.random(), 4), "tags": ["meeting", "note"]}))
+    noise = os.urandom(size)
+    return {"log": log, "csv": csv, "jsonl": records, "random(binary)": noise}
+
+
+def measure(data: bytes, codec: str, workdir: Path) -> dict:
+    src = workdir / "src"
+    dst = workdir / "dst"
+    src.write_bytes(data)
+
+    started = time.perf_counter()
+    stored = compress_file(src, dst, codec)
+    compress_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    total = 0
+    with open_decompressed(dst, codec) as reader:
+        while chunk := reader.read(1024 * 1024):
+            total += len(chunk)
+    decompress_time = time.perf_counter() - started
+    assert total == len(data)
+
+    return {
+        "ratio": stored / len(data),
+        "compress_mbps": len(data) / 1024 / 1024 / compress_time,
+        "decompress_mbps": len(data) / 1024 / 1024 / decompress_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="압축률/처리량 벤치마크")
+    parser.add_argument("--size-mb", type=int, default=16, help="샘플별 크기 (MB)")
+    parser.add_argument("--link-mbps", type=float, default=100.0, help="클라이언트 회선 속도 (Mbps)")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    link_mb_per_s = args.link_mbps / 8
+    samples = make_samples(size)
+
+    codecs = [("gzip", {"GZIP_LEVEL": 6})]
+    if file_compression.zstandard is not None:
+        codecs = [("zstd", {"ZSTD_LEVEL": level}) for level in (1, 3, 9)] + codecs
+    else:
+        print("⚠️ zstandard 미설치 - gzip만 측정합니다")
+
+    print(f"샘플 크기 {args.size_mb} MB, 회선 {args.link_mbps:.0f} Mbps ({link_mb_per_s:.1f} MB/s)")
+    print(f"{'데이터':<16}{'코덱':<10}{'압축률':>8}{'압축 MB/s':>12}{'해제 MB/s':>12}"
+          f"{'원본 전송(s)':>14}{'압축본 전송(s)':>16}  판단")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for name, data in samples.items():
+            for codec, settings in codecs:
+                for key, value in settings.items():
+                    setattr(file_compression, key, value)
+                label = f"{codec}-{settings.get('ZSTD_LEVEL', settings.get('GZIP_LEVEL'))}"
+                result = measure(data, codec, workdir)
+
+                raw_seconds = args.size_mb / link_mb_per_s
+                # 압축본 전송 시간 + 클라이언트 해제 시간 (저장 시 압축은 업로드 후 1회)
+                encoded_seconds = args.size_mb * result["ratio"] / link_mb_per_s \
+                    + args.size_mb / result["decompress_mbps"]
+                kept = result["ratio"] <= 1 - file_compression.MIN_SAVINGS_RATIO
+                verdict = "압축 유지" if kept and encoded_seconds < raw_seconds else "원본 유지"
+                print(f"{name:<16}{label:<10}{result['ratio']:>8.1%}{result['compress_mbps']:>12.1f}"
+                      f"{result['decompress_mbps']:>12.1f}{raw_seconds:>14.2f}{encoded_seconds:>16.2f}  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
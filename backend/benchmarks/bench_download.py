@@ -0,0 +1,82 @@
+"""
+대용량 파일 다운로드 벤치마크
+- 전체 다운로드 처리량 (MB/s)
+- 중간에 끊긴 다운로드를 Range 요청으로 이어받을 때 전송량/시간
+- ETag 조건부 요청(304) 응답 시간
+
+사용법:
+    python benchmarks/bench_download.py --size-mb 512 --runs 3
+"""
+
+import os
+import time
+import argparse
+import http.client
+from common import run_server, upload_file, make_random_file, mb_per_s
+
+READ_SIZE = 1024 * 1024
+
+
+def download(host, port, path, headers=None, stop_after=None):
+    """다운로드 후 (상태 코드, 받은 바이트 수, 걸린 시간, 응답 헤더) 반환"""
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    started = time.perf_counter()
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    received = 0
+    while chunk := response.read(READ_SIZE):
+        received += len(chunk)
+        if stop_after is not None and received >= stop_after:
+            break
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return response.status, received, elapsed, dict(response.getheaders())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="다운로드 처리량 및 이어받기 벤치마크")
+    parser.add_argument("--size-mb", type=int, default=256, help="테스트 파일 크기 (MB)")
+    parser.add_argument("--runs", type=int, default=3, help="반복 횟수")
+    parser.add_argument("--resume-at", type=float, default=0.6, help="다운로드를 끊을 지점 (비율)")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    source = make_random_file(size)
+
+    try:
+        with run_server() as (host, port, _):
+            uploaded = upload_file(host, port, source, "bench.bin")
+            url = f"/api/files/download/{uploaded['file_id']}"
+            print(f"파일 크기: {args.size_mb} MB, 반복: {args.runs}회")
+
+            # 1) 전체 다운로드
+            for run in range(args.runs):
+                status, received, elapsed, headers = download(host, port, url)
+                assert status == 200 and received == size
+                print(f"[전체] run {run + 1}: {elapsed:.2f}s, {mb_per_s(received, elapsed):.1f} MB/s")
+            etag = headers["etag"]
+
+            # 2) 끊긴 다운로드 이어받기 (처음부터 다시 받는 경우와 비교)
+            cut = int(size * args.resume_at)
+            _, first, first_time, _ = download(host, port, url, stop_after=cut)
+            status, rest, rest_time, _ = download(
+                host, port, url, headers={"Range": f"bytes={first}-", "If-Range": etag}
+            )
+            assert status == 206 and first + rest == size
+            print(f"[이어받기] 끊긴 지점 {first / size:.0%}: 추가 전송 {rest / 1024 / 1024:.1f} MB "
+                  f"({rest_time:.2f}s) / 재시작 시 {size / 1024 / 1024:.1f} MB")
+            print(f"[이어받기] 합계 {first_time + rest_time:.2f}s, 재전송 절감 {first / size:.0%}")
+
+            # 3) 조건부 요청 (변경 없음 -> 304)
+            timings = []
+            for _ in range(max(args.runs, 10)):
+                status, received, elapsed, _ = download(host, port, url, headers={"If-None-Match": etag})
+                assert status == 304 and received == 0
+                timings.append(elapsed)
+            print(f"[조건부] 304 응답 평균 {sum(timings) / len(timings) * 1000:.2f} ms, 전송 0 바이트")
+    finally:
+        os.remove(source)
+
+
+if __name__ == "__main__":
+    main()
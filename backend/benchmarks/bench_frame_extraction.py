@@ -0,0 +1,138 @@
+"""
+프레임 추출 전략 벤치마크 (frame_extraction.py)
+- 합성 동영상을 코덱/GOP별로 만들어 전략마다 추출 시간 비교
+  - MJPG: 모든 프레임이 키프레임 (탐색이 싼 경우)
+  - mp4v: OpenCV VideoWriter 기본 GOP 12
+  - H.264: GOP 250 (PyAV 설치 시, 일반적인 카메라/인코더 출력과 비슷한 긴 GOP)
+- 기존 방식(seek) 대비 속도, 기존 방식과 같은 프레임인지 / 옮겨진 평균 프레임 수
+
+사용법:
+    python benchmarks/bench_frame_extraction.py --seconds 120 --frames 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_extraction import STRATEGIES, extract_frames, keyframe_index  # noqa: E402
+
+try:
+    import av  # PyAV (긴 GOP H.264 생성용, 선택)
+except ImportError:
+    av = None
+
+FPS = 30
+
+
+def synthetic_frame(index: int, width: int, height: int) -> np.ndarray:
+    """프레임마다 내용이 달라 디코딩 결과를 구분할 수 있는 합성 이미지"""
+    frame = np.zeros((height, width, 3), np.uint8)
+    frame[:, :, 0] = (np.arange(width) + index * 3) % 256
+    frame[:, :, 1] = (np.arange(height)[:, None] + index) % 256
+    x = (index * 7) % max(1, width - 80)
+    cv2.rectangle(frame, (x, height // 3), (x + 80, height // 3 + 80), (255, 255, 255), -1)
+    cv2.putText(frame, str(index), (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 3)
+    return frame
+
+
+def write_opencv(path: str, fourcc: str, frames: int, width: int, height: int) -> bool:
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), FPS, (width, height))
+    if not writer.isOpened():
+        return False
+    for i in range(frames):
+        writer.write(synthetic_frame(i, width, height))
+    writer.release()
+    return True
+
+
+def write_h264(path: str, frames: int, width: int, height: int, gop: int) -> bool:
+    if av is None:
+        return False
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libx264", rate=FPS)
+        stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+        stream.options = {"g": str(gop), "keyint_min": str(gop), "sc_threshold": "0", "preset": "ultrafast"}
+        for i in range(frames):
+            frame = av.VideoFrame.from_ndarray(synthetic_frame(i, width, height), format="bgr24")
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    return True
+
+
+def make_videos(workdir: str, seconds: int, width: int, height: int) -> list:
+    frames = seconds * FPS
+    videos = []
+    candidates = [
+        ("MJPG (intra)", "mjpg.avi", lambda p: write_opencv(p, "MJPG", frames, width, height)),
+        ("mp4v (GOP 12)", "mp4v.mp4", lambda p: write_opencv(p, "mp4v", frames, width, height)),
+        ("H.264 (GOP 250)", "h264.mp4", lambda p: write_h264(p, frames, width, height, 250)),
+    ]
+    for label, name, write in candidates:
+        path = os.path.join(workdir, name)
+        started = time.perf_counter()
+        if write(path):
+            print(f"  {label:<16} {os.path.getsize(path) / 1024 / 1024:7.1f}MB  "
+                  f"생성 {time.perf_counter() - started:.1f}초")
+            videos.append((label, path))
+        else:
+            print(f"  {label:<16} 생략 (인코더/PyAV 없음)")
+    return videos
+
+
+def best_of(runs: int, func):
+    best, result = None, None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="프레임 추출 전략 벤치마크")
+    parser.add_argument("--seconds", type=int, default=120, help="합성 동영상 길이 (초, 30fps)")
+    parser.add_argument("--frames", type=int, default=10, help="추출할 프레임 수")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--runs", type=int, default=3, help="반복 횟수 (최솟값 사용)")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.split("x"))
+    strategies = args.strategies.split(",")
+
+    with tempfile.TemporaryDirectory(prefix="videonet-frames-") as workdir:
+        print(f"[합성 동영상] {args.seconds}초, {args.resolution}, {FPS}fps")
+        videos = make_videos(workdir, args.seconds, width, height)
+
+        print(f"\n{'동영상':<18}{'전략':<12}{'시간 s':>9}{'속도':>8}{'프레임':>8}{'동일':>6}{'이동 평균':>10}")
+        for label, path in videos:
+            started = time.perf_counter()
+            keyframes = keyframe_index(path) or []
+            print(f"{label:<18}(키프레임 {len(keyframes)}개, 목록 읽기 {time.perf_counter() - started:.3f}초)")
+
+            baseline_time, baseline = best_of(args.runs, lambda: extract_frames(path, args.frames, "seek"))
+            reference = {index: frame for index, frame in baseline}
+            for strategy in strategies:
+                if strategy == "seek":
+                    elapsed, frames = baseline_time, baseline
+                else:
+                    elapsed, frames = best_of(args.runs, lambda: extract_frames(path, args.frames, strategy))
+                same = all(index in reference and np.array_equal(frame, reference[index])
+                           for index, frame in frames)
+                shift = np.mean([abs(a[0] - b[0]) for a, b in zip(frames, baseline)]) if frames else 0
+                print(f"{'':<18}{strategy:<12}{elapsed:>9.3f}{baseline_time / elapsed:>7.1f}x"
+                      f"{len(frames):>8}{'예' if same else '-':>6}{shift:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+로컬 인물 검출 사전 필터 벤치마크 (person_detection.py)
+- PERSON_PREFILTER별로 /api/video/analyze를 로컬 OpenAI 스텁에 대해 실행
+- Vision 호출 수, 생략한 프레임 수, 전체 분석 시간
+- 검출기별 프레임당 검출 시간 (서버 없이 측정)
+
+기본 동영상은 사람이 없는 합성 장면이므로 모든 프레임이 생략되는 경우를 보여 줍니다
+실제 회의 녹화로 검출 정확도까지 보려면 --video로 지정하세요
+
+사용법:
+    python benchmarks/bench_person_filter.py --latency 1.0
+    python benchmarks/bench_person_filter.py --video meeting.mp4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_vision import StubOpenAI, analyze  # noqa: E402
+from bench_scene_selection import scenarios, write_video  # noqa: E402
+from common import run_server  # noqa: E402
+from frame_extraction import extract_frames  # noqa: E402
+from person_detection import DETECTORS, PersonDetector  # noqa: E402
+
+
+def detector_timing(video: str, modes):
+    frames = [frame for _, frame in extract_frames(video, 10)]
+    print(f"\n[검출 시간] 프레임 {len(frames)}개 ({frames[0].shape[1]}x{frames[0].shape[0]})")
+    for mode in modes:
+        detector = PersonDetector(mode)
+        detector.count(frames[0])  # 검출기 로딩 제외
+        started = time.perf_counter()
+        counts = [detector.count(frame) for frame in frames]
+        elapsed = (time.perf_counter() - started) / len(frames)
+        print(f"  {mode:<5} {elapsed * 1000:7.1f} ms/프레임  인물 있는 프레임 {sum(1 for c in counts if c)}개")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 인물 검출 사전 필터 벤치마크")
+    parser.add_argument("--video", help="분석할 동영상 (기본: 사람이 없는 합성 동영상)")
+    parser.add_argument("--latency", type=float, default=1.0, help="스텁 응답 지연 (초)")
+    parser.add_argument("--modes", default=",".join(DETECTORS))
+    args = parser.parse_args()
+    modes = args.modes.split(",")
+
+    with tempfile.TemporaryDirectory(prefix="videonet-person-") as workdir:
+        video = args.video
+        if video is None:
+            video = os.path.join(workdir, "empty.avi")
+            write_video(video, scenarios(random.Random(7))["fast-cut"], random.Random(7))
+
+        print(f"[스텁] 응답 지연 {args.latency:.2f}초")
+        print(f"{'검출기':<8}{'분석 s':>9}{'Vision 호출':>12}{'생략':>6}{'인물 프레임':>12}")
+        with StubOpenAI(args.latency, 0.0) as stub:
+            for mode in modes:
+                env = {
+                    "OPENAI_API_KEY": "stub", "OPENAI_BASE_URL": f"http://127.0.0.1:{stub.port}/v1",
+                    "PERSON_PREFILTER": mode, "ANALYSIS_CACHE_MAX_ENTRIES": "0",
+                }
+                with run_server(env) as (host, port, _):
+                    stub.reset()
+                    started = time.perf_counter()
+                    result = analyze(host, port, video)
+                    elapsed = time.perf_counter() - started
+                frames = result["persons_detected"]
+                skipped = len(frames) - stub.requests
+                with_person = sum(1 for p in frames if p["has_person"])
+                print(f"{mode:<8}{elapsed:>9.2f}{stub.requests:>12}{skipped:>6}{with_person:>12}")
+
+        detector_timing(video, [mode for mode in modes if mode != "off"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+장면 전환 기반 프레임 선택 벤치마크 (frame_extraction.select_scene_frames)
+- 장면 경계를 알고 있는 합성 동영상으로 균등 샘플링과 비교
+  - lecture: 정적인 슬라이드 3장 (카메라 노이즈)
+  - fast-cut: 길이가 제각각인 짧은 장면 다수
+  - mixed: 긴 정적 구간 뒤에 빠른 컷
+- 선택한 프레임 수 (= Vision 호출 수), 포함된 장면 비율, 소요 시간
+- uniform+dedup: 균등 샘플링 후 거의 같은 프레임(dHash)을 묶은 대표 프레임만 분석하는 경우
+
+사용법:
+    python benchmarks/bench_scene_selection.py --frames 10 --threshold 0.2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_extraction import dhash, extract_frames, group_near_duplicates, select_scene_frames  # noqa: E402
+
+FPS = 30
+WIDTH, HEIGHT = 640, 360
+
+
+def slide(rng: random.Random) -> np.ndarray:
+    """흰 배경 + 제목/본문 줄 (색 분포가 거의 같은 슬라이드)"""
+    frame = np.full((HEIGHT, WIDTH, 3), 245, np.uint8)
+    cv2.rectangle(frame, (40, 30), (40 + rng.randint(200, 500), 70), (40, 40, 40), -1)
+    for row in range(rng.randint(3, 7)):
+        y = 110 + row * 35
+        cv2.rectangle(frame, (60, y), (60 + rng.randint(150, 520), y + 12), (90, 90, 90), -1)
+    return frame
+
+
+def shot(rng: random.Random) -> np.ndarray:
+    """임의 배경색 + 도형 (다른 장소/카메라 컷)"""
+    frame = np.full((HEIGHT, WIDTH, 3), [rng.randint(0, 255) for _ in range(3)], np.uint8)
+    for _ in range(4):
+        color = [rng.randint(0, 255) for _ in range(3)]
+        x, y = rng.randint(0, WIDTH - 100), rng.randint(0, HEIGHT - 100)
+        cv2.rectangle(frame, (x, y), (x + rng.randint(40, 200), y + rng.randint(40, 150)), color, -1)
+    return frame
+
+
+def write_video(path: str, scenes, rng: random.Random) -> list:
+    """scenes: [(길이 초, 배경 이미지)] -> 장면 시작 프레임 번호 목록"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (WIDTH, HEIGHT))
+    starts, index = [], 0
+    for seconds, base in scenes:
+        starts.append(index)
+        for i in range(int(seconds * FPS)):
+            frame = base.copy()
+            # 장면 안의 작은 움직임과 카메라 노이즈
+            x = (i * 2) % (WIDTH - 40)
+            cv2.circle(frame, (x + 20, HEIGHT - 30), 12, (0, 0, 200), -1)
+            noise = np.frombuffer(rng.randbytes(HEIGHT * WIDTH), np.uint8).reshape(HEIGHT, WIDTH) % 7
+            frame = cv2.add(frame, cv2.merge([noise, noise, noise]))
+            writer.write(frame)
+            index += 1
+    writer.release()
+    return starts
+
+
+def scenarios(rng: random.Random) -> dict:
+    return {
+        "lecture": [(40, slide(rng)) for _ in range(3)],
+        "fast-cut": [(rng.uniform(0.5, 4), shot(rng)) for _ in range(25)],
+        "mixed": [(60, slide(rng))] + [(rng.uniform(0.5, 2), shot(rng)) for _ in range(12)],
+    }
+
+
+def coverage(indices, starts, total: int) -> int:
+    """선택된 프레임이 하나라도 있는 장면 수"""
+    bounds = starts + [total]
+    return sum(1 for a, b in zip(bounds, bounds[1:]) if any(a <= i < b for i in indices))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="장면 전환 기반 프레임 선택 벤치마크")
+    parser.add_argument("--frames", type=int, default=10, help="최대 프레임 수 (Vision 호출 예산)")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--sample-fps", type=float, default=2.0)
+    parser.add_argument("--dedup-distance", type=int, default=5, help="dHash 해밍 거리 (FRAME_DEDUP_DISTANCE)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'동영상':<10}{'장면':>6}{'방식':>15}{'프레임':>8}{'포함 장면':>10}{'시간 s':>9}")
+    with tempfile.TemporaryDirectory(prefix="videonet-scenes-") as workdir:
+        for name, scenes in scenarios(rng).items():
+            path = os.path.join(workdir, f"{name}.avi")
+            starts = write_video(path, scenes, rng)
+            total = int(cv2.VideoCapture(path).get(cv2.CAP_PROP_FRAME_COUNT))
+
+            started = time.perf_counter()
+            frames = extract_frames(path, args.frames)
+            uniform_time = time.perf_counter() - started
+            uniform = [i for i, _ in frames]
+
+            started = time.perf_counter()
+            groups = group_near_duplicates([dhash(frame) for _, frame in frames], args.dedup_distance)
+            deduped = [i for (i, _), duplicate_of in zip(frames, groups) if duplicate_of is None]
+            dedup_time = uniform_time + time.perf_counter() - started
+
+            started = time.perf_counter()
+            scene = [i for i, _ in select_scene_frames(path, args.frames, args.sample_fps, args.threshold)]
+            scene_time = time.perf_counter() - started
+
+            for label, indices, elapsed in (("uniform", uniform, uniform_time),
+                                            ("uniform+dedup", deduped, dedup_time),
+                                            ("scene", scene, scene_time)):
+                covered = coverage(indices, starts, total)
+                print(f"{name:<10}{len(starts):>6}{label:>15}{len(indices):>8}"
+                      f"{f'{covered}/{len(starts)}':>10}{elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+파일 전송 경로 처리량 벤치마크 (file_transfer.py)
+- 파일 크기 x 서버 청크 크기(FILE_CHUNK_SIZE) x 동시 클라이언트 수
+- 일반 업로드(multipart), 이어받기 업로드(PUT 청크), 병렬 파트 업로드(한 세션에 파트 동시 전송), 다운로드
+- 처리량 (MB/s), 서버 CPU 시간 (ms/MB), 서버 최대 RSS, 이벤트 루프 지연 최대값
+- 파일 해시 계산의 읽기 크기별 처리량 (서버 없이 측정)
+
+사용법:
+    python benchmarks/bench_transfer.py --sizes 1K,1M,64M,1G --chunks 8K,64K,1M,8M --clients 1,4,16
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from common import (
+    LagSampler, make_random_file, mb_per_s, process_usage, request_json, run_server, upload_file
+)
+
+READ_SIZE = 1024 * 1024
+BOUNDARY = "videonet-bench-boundary"
+# 작은 파일은 여러 번 반복해 측정 시간을 확보
+TARGET_BYTES_PER_RUN = 256 * 1024 * 1024
+MAX_REPEATS = 200
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for unit, factor in (("G", 1024 ** 3), ("M", 1024 ** 2), ("K", 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def multipart_upload(host: str, port: int, path: str, filename: str) -> dict:
+    """파일을 메모리에 올리지 않고 multipart 본문으로 스트리밍 업로드"""
+    size = os.path.getsize(path)
+    head = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    def body():
+        yield head
+        with open(path, "rb") as f:
+            while chunk := f.read(READ_SIZE):
+                yield chunk
+        yield tail
+
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    conn.request("POST", "/api/files/upload", body=body(), headers={
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        "Content-Length": str(len(head) + size + len(tail)),
+    })
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"업로드 실패: {response.status} {data[:200]}")
+    return {"size": size}
+
+
+def parts_upload(host: str, port: int, path: str, filename: str, part_size: int, workers: int) -> dict:
+    """병렬 멀티파트 업로드: 한 세션의 파트를 workers개 스레드에서 동시에 PUT"""
+    size = os.path.getsize(path)
+    _, session = request_json(
+        host, port, "POST", "/api/files/uploads",
+        json.dumps({"filename": filename, "size": size, "part_size": part_size}).encode(),
+        {"Content-Type": "application/json"},
+    )
+    upload_id = session["upload_id"]
+
+    def put_part(index: int):
+        with open(path, "rb") as f:
+            f.seek(index * part_size)
+            data = f.read(part_size)
+        status, result = request_json(
+            host, port, "PUT", f"/api/files/uploads/{upload_id}/parts/{index}", data,
+            {"Content-Type": "application/octet-stream", "X-Part-SHA256": hashlib.sha256(data).hexdigest()},
+        )
+        if status != 200:
+            raise RuntimeError(f"파트 업로드 실패: {status} {result}")
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(put_part, range(session["part_count"])))
+    status, result = request_json(host, port, "POST", f"/api/files/uploads/{upload_id}/complete")
+    if status != 200:
+        raise RuntimeError(f"업로드 완료 실패: {status} {result}")
+    return result
+
+
+def download(host: str, port: int, file_id: str) -> int:
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    conn.request("GET", f"/api/files/download/{file_id}")
+    response = conn.getresponse()
+    received = 0
+    while chunk := response.read(READ_SIZE):
+        received += len(chunk)
+    conn.close()
+    return received
+
+
+def measure(host, port, pid, clients: int, repeats: int, task) -> dict:
+    """task를 clients개 스레드에서 총 repeats번 실행하며 서버 자원 사용량 측정"""
+    before = process_usage(pid)
+    with LagSampler(host, port) as sampler, ThreadPoolExecutor(clients) as pool:
+        started = time.perf_counter()
+        transferred = sum(pool.map(lambda _: task(), range(repeats)))
+        elapsed = time.perf_counter() - started
+    after = process_usage(pid)
+
+    megabytes = transferred / 1024 / 1024
+    return {
+        "mb_per_s": mb_per_s(transferred, elapsed),
+        "files_per_s": repeats / elapsed,
+        "cpu_ms_per_mb": (after["cpu_seconds"] - before["cpu_seconds"]) * 1000 / megabytes if megabytes else 0.0,
+        "peak_rss_mb": after["peak_rss"] / 1024 / 1024,
+        "max_lag_ms": sampler.max_lag_ms,
+    }
+
+
+def bench_hash_read_sizes(path: str, read_sizes):
+    """파일 해시 계산 (읽기 + SHA256)의 읽기 크기별 처리량"""
+    size = os.path.getsize(path)
+    print(f"\n[해시] 파일 {format_size(size)} 읽기 + SHA256")
+    for read_size in read_sizes:
+        started = time.perf_counter()
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(read_size):
+                sha256.update(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"  읽기 {format_size(read_size):>5}: {mb_per_s(size, elapsed):8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업로드/다운로드 처리량 벤치마크")
+    parser.add_argument("--sizes", default="1K,1M,64M,512M", help="파일 크기 목록 (예: 1K,1M,2G)")
+    parser.add_argument("--chunks", default="8K,64K,1M,8M", help="서버 FILE_CHUNK_SIZE 목록")
+    parser.add_argument("--clients", default="1,4,16", help="동시 클라이언트 수 목록")
+    parser.add_argument("--ops", default="upload,resumable,parts,download", help="측정할 전송 종류")
+    parser.add_argument("--client-chunk", default="8M", help="이어받기 업로드 클라이언트 청크 크기")
+    parser.add_argument("--part-size", default="64K", help="병렬 파트 업로드 파트 크기")
+    parser.add_argument("--part-workers", type=int, default=16, help="병렬 파트 업로드 세션당 동시 전송 수")
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    chunks = [parse_size(s) for s in args.chunks.split(",")]
+    clients_list = [int(c) for c in args.clients.split(",")]
+    ops = args.ops.split(",")
+    client_chunk = parse_size(args.client_chunk)
+    part_size = parse_size(args.part_size)
+
+    sources = {size: make_random_file(size) for size in sizes}
+    # 측정 대상만 보도록 부하 차단/할당량/후처리는 끔
+    server_env = {
+        "OVERLOAD_MAX_HEAVY": "1000", "OVERLOAD_LAG_THRESHOLD_MS": "100000",
+        "MAX_UPLOAD_SIZE": "0", "ROOM_QUOTA_BYTES": "0", "STORAGE_QUOTA_BYTES": "0",
+        "MIN_FREE_DISK_BYTES": "0", "FILE_COMPRESSION": "0",
+    }
+
+    print(f"{'종류':<10}{'크기':>6}{'청크':>6}{'동시':>6}{'MB/s':>10}{'파일/s':>9}{'CPU ms/MB':>11}"
+          f"{'최대 RSS MB':>13}{'루프 지연 ms':>14}")
+    try:
+        for chunk in chunks:
+            env = {**server_env, "FILE_CHUNK_SIZE": str(chunk)}
+            with run_server(env) as (host, port, proc):
+                for size in sizes:
+                    source = sources[size]
+                    repeats_base = max(1, min(MAX_REPEATS, TARGET_BYTES_PER_RUN // max(size, 1)))
+                    file_id = upload_file(host, port, source, "bench.bin", client_chunk)["file_id"]
+
+                    tasks = {
+                        "upload": lambda: multipart_upload(host, port, source, "bench.bin")["size"],
+                        "resumable": lambda: upload_file(host, port, source, "bench.bin", client_chunk)["size"],
+                        "parts": lambda: parts_upload(host, port, source, "bench.bin", part_size,
+                                                      args.part_workers)["size"],
+                        "download": lambda: download(host, port, file_id),
+                    }
+                    for clients in clients_list:
+                        repeats = max(clients, repeats_base)
+                        for op in ops:
+                            result = measure(host, port, proc.pid, clients, repeats, tasks[op])
+                            print(f"{op:<10}{format_size(size):>6}{format_size(chunk):>6}{clients:>6}"
+                                  f"{result['mb_per_s']:>10.1f}{result['files_per_s']:>9.1f}"
+                                  f"{result['cpu_ms_per_mb']:>11.2f}"
+                                  f"{result['peak_rss_mb']:>13.1f}{result['max_lag_ms']:>14.1f}")
+
+                # 측정 서버의 인덱스 크기 확인 (반복 업로드는 같은 내용이라 블롭 1개씩)
+                _, storage = request_json(host, port, "GET", "/api/files/storage")
+                print(f"  (FILE_CHUNK_SIZE={format_size(chunk)} 저장 블롭 {storage['blobs']}개, "
+                      f"참조 {storage['files']}개)")
+
+        bench_hash_read_sizes(sources[max(sizes)], [8 * 1024, 64 * 1024, 1024 * 1024, 8 * 1024 * 1024])
+    finally:
+        for path in sources.values():
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
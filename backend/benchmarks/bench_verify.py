@@ -0,0 +1,96 @@
+"""
+파일 검증 API 벤치마크 (POST /api/video/verify)
+- two-files: 원본 + 수신 파일을 함께 업로드 (multipart 본문 스트리밍)
+- file_id: 원본은 미리 저장해 두고 (이어받기 업로드) 수신 파일만 업로드
+- 처리량 (MB/s, 업로드한 바이트 기준), 서버 CPU 시간 (ms/MB), 서버 최대 RSS, 이벤트 루프 지연 최대값
+- 크기/모드마다 서버를 새로 띄워 최대 RSS를 따로 측정
+
+사용법:
+    python benchmarks/bench_verify.py --sizes 64M,512M --modes two-files,file_id
+"""
+
+import os
+import json
+import time
+import argparse
+import http.client
+from common import LagSampler, make_random_file, mb_per_s, process_usage, run_server, upload_file
+from bench_transfer import format_size, parse_size
+
+READ_SIZE = 1024 * 1024
+BOUNDARY = "videonet-bench-boundary"
+
+
+def verify(host: str, port: int, files, fields=None) -> dict:
+    """files: [(필드 이름, 경로)] 를 메모리에 올리지 않고 multipart 본문으로 스트리밍"""
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append((f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                      f"{value}\r\n").encode())
+    heads = [(f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{name}.bin\"\r\n"
+              f"Content-Type: application/octet-stream\r\n\r\n").encode() for name, _ in files]
+    tail = f"--{BOUNDARY}--\r\n".encode()
+    length = (sum(len(p) for p in parts) + sum(len(h) + os.path.getsize(path) + 2
+                                               for h, (_, path) in zip(heads, files)) + len(tail))
+
+    def body():
+        yield from parts
+        for head, (_, path) in zip(heads, files):
+            yield head
+            with open(path, "rb") as f:
+                while chunk := f.read(READ_SIZE):
+                    yield chunk
+            yield b"\r\n"
+        yield tail
+
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    conn.request("POST", "/api/video/verify", body=body(), headers={
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        "Content-Length": str(length),
+    })
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"검증 실패: {response.status} {data[:200]}")
+    return json.loads(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="파일 검증 API 벤치마크")
+    parser.add_argument("--sizes", default="64M,512M", help="파일 크기 목록 (예: 1M,64M,1G)")
+    parser.add_argument("--modes", default="two-files,file_id")
+    args = parser.parse_args()
+
+    print(f"{'크기':>6}{'모드':>11}{'시간 s':>9}{'MB/s':>9}{'CPU ms/MB':>11}{'최대 RSS MB':>12}"
+          f"{'루프 지연 ms':>12}{'일치':>6}")
+    for size in [parse_size(s) for s in args.sizes.split(",")]:
+        path = make_random_file(size)
+        try:
+            for mode in args.modes.split(","):
+                with run_server() as (host, port, proc):
+                    if mode == "file_id":
+                        stored = upload_file(host, port, path, "original.bin")
+                        files, fields = [("received_file", path)], {"original_file_id": stored["file_id"]}
+                    else:
+                        files, fields = [("original_file", path), ("received_file", path)], None
+                    uploaded = size * len(files)
+
+                    before = process_usage(proc.pid)
+                    with LagSampler(host, port) as sampler:
+                        started = time.perf_counter()
+                        result = verify(host, port, files, fields)
+                        elapsed = time.perf_counter() - started
+                    after = process_usage(proc.pid)
+
+                megabytes = uploaded / 1024 / 1024
+                cpu_ms_per_mb = (after["cpu_seconds"] - before["cpu_seconds"]) * 1000 / megabytes
+                print(f"{format_size(size):>6}{mode:>11}{elapsed:>9.2f}{mb_per_s(uploaded, elapsed):>9.1f}"
+                      f"{cpu_ms_per_mb:>11.2f}{after['peak_rss'] / 1024 / 1024:>12.1f}"
+                      f"{sampler.max_lag_ms:>12.1f}{str(result['is_valid']):>6}")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
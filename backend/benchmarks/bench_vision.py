@@ -0,0 +1,245 @@
+"""
+동영상 분석 GPT Vision 호출 벤치마크 (video_analysis.py)
+- OpenAI API를 흉내 내는 로컬 스텁 서버 (응답 지연, 일시적 오류 비율 지정)
+- VISION_CONCURRENCY x 요청 방식(frame / batch / sheet)별로 /api/video/analyze 전체 소요 시간 측정
+- 스텁이 본 요청 수, 최대 동시 호출 수, 오류 응답 수, 분석에 쓴 토큰, 실패한 프레임 수, 분석 응답 크기
+- 스텁 토큰 계산: 이미지 detail=low 85, high 765, 텍스트 2글자당 1, 답변은 프레임당 20 (+묶음 JSON 10)
+  응답 지연 = --latency + 답변 토큰 x --token-latency (+ 프롬프트 토큰 x prompt_token_latency)
+
+사용법:
+    python benchmarks/bench_vision.py --latency 1.0 --concurrency 1,5,10 --error-rate 0.2
+    python benchmarks/bench_vision.py --concurrency 10 --modes frame,batch,sheet
+"""
+
+import os
+import re
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from common import free_port, run_server
+
+BOUNDARY = "videonet-bench-boundary"
+STREAM_CHUNK_CHARS = 8  # 스텁 스트리밍 응답 조각 크기 (약 4토큰)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128  # 기본값(5)이면 동시 연결이 대기열에서 막힘
+    daemon_threads = True
+
+
+class StubOpenAI:
+    """/v1/chat/completions만 구현한 스텁 (지연 후 고정 응답, 일부는 429/503, stream=true면 조각으로 전송)"""
+
+    def __init__(self, latency: float, error_rate: float, seed: int = 42, token_latency: float = 0.0,
+                 prompt_token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.max_inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.port = free_port()
+        self.server = StubHTTPServer(("127.0.0.1", self.port), self._handler())
+
+    def reset(self):
+        with self.lock:
+            self.max_inflight = self.requests = self.errors = 0
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                reply, usage = stub.reply(request)
+                with stub.lock:
+                    stub.requests += 1
+                    stub.inflight += 1
+                    stub.max_inflight = max(stub.max_inflight, stub.inflight)
+                    fail = stub.random.random() < stub.error_rate
+                    if fail:
+                        stub.errors += 1
+                streaming = request.get("stream") and not fail
+                try:
+                    # 첫 토큰까지: 기본 지연 + 프롬프트 처리, 이후 출력 토큰마다 token_latency
+                    time.sleep(stub.latency + usage["prompt_tokens"] * stub.prompt_token_latency)
+                    if streaming:
+                        self._stream(reply)
+                        return
+                    time.sleep(usage["completion_tokens"] * stub.token_latency)
+                finally:
+                    with stub.lock:
+                        stub.inflight -= 1
+
+                if fail:
+                    status = stub.random.choice((429, 503))
+                    body = {"error": {"message": "stub overloaded", "type": "server_error"}}
+                else:
+                    status = 200
+                    body = {
+                        "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                        "model": "stub",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": reply}}],
+                        "usage": usage,
+                    }
+                data = json.dumps(body, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except BrokenPipeError:
+                    pass  # 서버 종료 중 끊긴 백그라운드 호출
+
+            def _stream(self, reply: str):
+                """stream=true: 답변을 STREAM_CHUNK_CHARS 글자씩 chat.completion.chunk SSE로 (연결 종료로 끝 표시)"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                created = int(time.time())
+                try:
+                    for start in range(0, len(reply), STREAM_CHUNK_CHARS):
+                        text = reply[start:start + STREAM_CHUNK_CHARS]
+                        time.sleep(len(text) // 2 * stub.token_latency)
+                        chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                                 "model": "stub", "choices": [{"index": 0, "delta": {"content": text},
+                                                               "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except BrokenPipeError:
+                    pass  # 클라이언트가 중간에 끊음
+
+        return Handler
+
+    @staticmethod
+    def reply(request: dict):
+        """요청 내용으로 답변과 토큰 사용량 생성 (묶음 요청은 프레임별 JSON, 이미지 없는 요청은 채팅 답변)"""
+        description = "1. 인물 1명\n2. 회의\n3. 회의실"
+        content = [part for message in request.get("messages", [])
+                   for part in (message["content"] if isinstance(message["content"], list)
+                                else [{"type": "text", "text": message["content"]}])]
+        text = "".join(part.get("text", "") for part in content if part.get("type") == "text")
+        images = [part["image_url"] for part in content if part.get("type") == "image_url"]
+        prompt_tokens = len(text) // 2 + sum(765 if image.get("detail") == "high" else 85 for image in images)
+
+        if not images:
+            # 채팅/요약: max_tokens 안에서 긴 답변 (대화 기록이 빨리 늘어나도록)
+            sentence = "분석 결과에 따르면 회의실에서 한 명이 발표하고 있으며 화면에는 슬라이드가 보입니다. "
+            reply = sentence * max(1, min(request.get("max_tokens", 500), 400) // len(sentence))
+            completion_tokens = len(reply) // 2
+        elif request.get("response_format", {}).get("type") == "json_object":
+            match = re.search(r"프레임 (\d+)개", text)
+            count = int(match.group(1)) if match else len(images)
+            reply = json.dumps({"frames": [{"frame": i + 1, "description": description}
+                                           for i in range(count)]}, ensure_ascii=False)
+            completion_tokens = 30 * count
+        else:
+            reply = description
+            completion_tokens = 20
+        return reply, {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                       "total_tokens": prompt_tokens + completion_tokens}
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_video(path: str, seconds: int = 10, fps: int = 30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (320, 240))
+    for i in range(seconds * fps):
+        frame = np.full((240, 320, 3), i % 256, np.uint8)
+        cv2.putText(frame, str(i), (20, 200), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def analyze(host: str, port: int, path: str, vision_mode: str = None) -> dict:
+    with open(path, "rb") as f:
+        content = f.read()
+    body = b""
+    if vision_mode:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"vision_mode\"\r\n\r\n"
+                 f"{vision_mode}\r\n").encode()
+    body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench.avi\"\r\n"
+             f"Content-Type: video/x-msvideo\r\n\r\n").encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    conn.request("POST", "/api/video/analyze", body=body,
+                 headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"분석 실패: {response.status} {data[:200]}")
+    return json.loads(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPT Vision 동시 호출 벤치마크 (로컬 스텁)")
+    parser.add_argument("--latency", type=float, default=1.0, help="스텁 응답 지연 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="스텁이 429/503으로 응답하는 비율")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="스텁 답변 토큰당 추가 지연 (초)")
+    parser.add_argument("--concurrency", default="1,5,10", help="VISION_CONCURRENCY 목록")
+    parser.add_argument("--modes", default="frame", help="요청 방식 목록 (frame,batch,sheet)")
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+
+    fd, video = tempfile.mkstemp(suffix=".avi", prefix="videonet-bench-")
+    os.close(fd)
+    make_video(video)
+
+    print(f"[스텁] 응답 지연 {args.latency:.2f}초, 오류 비율 {args.error_rate:.0%}")
+    print(f"{'동시':>4}{'방식':>7}{'분석 s':>9}{'왕복 대비':>10}{'최대 동시':>10}{'호출':>6}{'오류 응답':>10}"
+          f"{'토큰':>8}{'실패 프레임':>12}{'응답 KB':>9}")
+    try:
+        with StubOpenAI(args.latency, args.error_rate, token_latency=args.token_latency) as stub:
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                # 프레임 수가 항상 10개가 되도록 선택/중복 제거를 끄고, 반복 측정이 캐시에 걸리지 않게 함
+                env = {
+                    "OPENAI_API_KEY": "stub", "OPENAI_BASE_URL": f"http://127.0.0.1:{stub.port}/v1",
+                    "VISION_CONCURRENCY": str(concurrency), "VISION_BACKOFF_SECONDS": "0.1",
+                    "FRAME_SELECTION": "uniform", "FRAME_DEDUP_DISTANCE": "-1", "ANALYSIS_CACHE_MAX_ENTRIES": "0",
+                }
+                with run_server(env) as (host, port, _):
+                    for mode in args.modes.split(","):
+                        best, failed, tokens, size = None, 0, 0, 0
+                        stub.reset()
+                        for _ in range(args.runs):
+                            started = time.perf_counter()
+                            result = analyze(host, port, video, mode)
+                            elapsed = time.perf_counter() - started
+                            best = elapsed if best is None else min(best, elapsed)
+                            failed += sum(1 for p in result["persons_detected"] if p["analysis"] == "분석 실패")
+                            tokens += sum(p["tokens_used"] for p in result["persons_detected"])
+                            size = len(json.dumps(result, ensure_ascii=False).encode())
+                        print(f"{concurrency:>4}{mode:>7}{best:>9.2f}{best / args.latency:>9.1f}x"
+                              f"{stub.max_inflight:>10}{stub.requests // args.runs:>6}{stub.errors:>10}"
+                              f"{tokens // args.runs:>8}{failed:>12}{size / 1024:>9.1f}")
+    finally:
+        os.remove(video)
+
+
+if __name__ == "__main__":
+    main()
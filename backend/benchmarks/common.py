@@ -0,0 +1,157 @@
+"""
+벤치마크 공통 유틸리티
+- 임시 디렉토리에서 백엔드 서버(uvicorn)를 별도 프로세스로 실행
+- 표준 라이브러리(http.client)만 사용
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import http.client
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def run_server(env: Optional[Dict[str, str]] = None):
+    """
+    백엔드 서버를 임시 작업 디렉토리에서 실행
+    반환값: (host, port, 서버 프로세스)
+    """
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="videonet-bench-")
+    server_env = {**os.environ, "PYTHONPATH": BACKEND_DIR, **(env or {})}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=server_env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    break
+            except OSError:
+                if proc.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("벤치마크 서버 시작 실패")
+                time.sleep(0.1)
+        yield "127.0.0.1", port, proc
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def request_json(host: str, port: int, method: str, path: str,
+                 body: Optional[bytes] = None, headers: Optional[dict] = None):
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, json.loads(data) if data else None
+
+
+def upload_file(host: str, port: int, path: str, filename: str,
+                chunk_size: int = 8 * 1024 * 1024, room_id: Optional[str] = None) -> dict:
+    """이어받기 업로드 API로 파일 업로드 -> 완료 응답"""
+    size = os.path.getsize(path)
+    _, session = request_json(
+        host, port, "POST", "/api/files/uploads",
+        json.dumps({"filename": filename, "size": size, "room_id": room_id}).encode(),
+        {"Content-Type": "application/json"},
+    )
+    upload_id = session["upload_id"]
+    offset = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            status, result = request_json(
+                host, port, "PUT", f"/api/files/uploads/{upload_id}?offset={offset}", chunk,
+                {"Content-Type": "application/octet-stream"},
+            )
+            if status != 200:
+                raise RuntimeError(f"청크 업로드 실패: {status} {result}")
+            offset = result["offset"]
+    status, result = request_json(host, port, "POST", f"/api/files/uploads/{upload_id}/complete")
+    if status != 200:
+        raise RuntimeError(f"업로드 완료 실패: {status} {result}")
+    return result
+
+
+def make_random_file(size: int, directory: Optional[str] = None) -> str:
+    """size 바이트의 임의 데이터 파일 생성"""
+    fd, path = tempfile.mkstemp(prefix="videonet-bench-", dir=directory)
+    block = os.urandom(min(size, 4 * 1024 * 1024)) if size else b""
+    with os.fdopen(fd, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block[:remaining])
+    return path
+
+
+def mb_per_s(num_bytes: int, seconds: float) -> float:
+    return num_bytes / 1024 / 1024 / seconds if seconds > 0 else 0.0
+
+
+def process_usage(pid: int) -> dict:
+    """
+    서버 프로세스 자원 사용량 (/proc, 리눅스 전용)
+    - cpu_seconds: 사용자 + 커널 CPU 시간
+    - peak_rss: 시작 이후 최대 RSS (VmHWM)
+    """
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+    peak_rss = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                peak_rss = int(line.split()[1]) * 1024
+    return {"cpu_seconds": cpu_seconds, "peak_rss": peak_rss}
+
+
+class LagSampler:
+    """측정 중 /api/system/load를 주기적으로 조회해 이벤트 루프 지연 최대값 기록"""
+
+    def __init__(self, host: str, port: int, interval: float = 0.2):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.max_lag_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                _, status = request_json(self.host, self.port, "GET", "/api/system/load")
+                self.max_lag_ms = max(self.max_lag_ms, status["loop_lag_ms"])
+            except OSError:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,123 @@
+"""
+VideoNet Pro - 분석 채팅 컨텍스트 저장소
+동영상 분석 결과를 한 번 등록해 두고 채팅 요청은 ID와 질문만 보냅니다
+- 등록할 때 채팅 시스템 프롬프트(분석 결과 컨텍스트 포함)를 미리 만들어 보관
+  -> 요청마다 분석 결과 전체를 보내거나 컨텍스트를 다시 만들지 않음
+- ID는 시스템 프롬프트의 내용 해시(SHA256): 같은 분석 결과는 한 번만 보관
+- 항목 수 제한 (초과 시 가장 오래 쓰이지 않은 항목 삭제), 마지막 사용 후 TTL이 지나면 삭제
+  (삭제된 ID로 채팅하면 404: 클라이언트가 분석 결과로 다시 등록)
+"""
+
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from chat_sessions import estimate_tokens
+
+# ===== 설정 =====
+CHAT_MAX_CONTEXTS = int(os.getenv("CHAT_MAX_CONTEXTS", "500"))
+CHAT_CONTEXT_TTL_SECONDS = int(os.getenv("CHAT_CONTEXT_TTL_SECONDS", str(6 * 60 * 60)))  # 6시간
+
+
+def render_system_prompt(analysis_result: Dict[str, Any], video_info: Dict[str, Any]) -> str:
+    """분석 결과로 채팅 시스템 프롬프트 생성 (동영상 정보 + 분석 요약 + 인물 감지 정보)"""
+    resolution = video_info.get('resolution', [0, 0])
+    context = f"""
+동영상 정보:
+- 파일명: {video_info.get('filename', 'unknown')}
+- 길이: {video_info.get('duration', 0):.2f}초
+- 해상도: {resolution[0]}x{resolution[1]}
+
+분석 요약:
+{analysis_result.get('summary', '')}
+
+인물 감지 정보:
+"""
+    # 인물 정보 추가
+    for person in analysis_result.get('persons_detected', []):
+        context += f"\n- 프레임 {person.get('frame_index', 0) + 1}: {person.get('analysis', '')}"
+
+    return f"""당신은 동영상 분석 전문 AI 어시스턴트입니다.
+사용자의 질문에 대해 제공된 동영상 분석 결과를 바탕으로 정확하고 상세하게 답변해주세요.
+동영상에 등장하는 인물의 특징, 장면 설명, 동영상 요약 등을 명확하게 전달하세요.
+분석 결과에 없는 정보는 추측하지 말고, "분석 결과에 해당 정보가 없습니다"라고 답변하세요.
+이전 대화 내용을 참고하여 일관성 있게 답변하세요.
+
+{context}"""
+
+
+class AnalysisContextStore:
+    """
+    분석 컨텍스트 저장소 (메모리, 프로세스 단위)
+    항목: {"analysis_id", "filename", "system_prompt", "tokens", "created_at", "last_used_at"}
+    """
+
+    def __init__(self, max_contexts: int = CHAT_MAX_CONTEXTS, ttl: int = CHAT_CONTEXT_TTL_SECONDS):
+        self.max_contexts = max_contexts
+        self.ttl = ttl
+        self.contexts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.counters = {"registered": 0, "reused": 0, "hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def _prune(self):
+        """TTL이 지난 항목 삭제 (사용 순서로 정렬되어 있으므로 앞에서부터)"""
+        now = time.time()
+        while self.contexts:
+            analysis_id, context = next(iter(self.contexts.items()))
+            if now - context["last_used_at"] <= self.ttl:
+                break
+            del self.contexts[analysis_id]
+            self.counters["expired"] += 1
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """컨텍스트 조회 (사용 시각 갱신, 없거나 만료되었으면 None)"""
+        self._prune()
+        context = self.contexts.get(analysis_id)
+        if context is None:
+            self.counters["misses"] += 1
+            return None
+        context["last_used_at"] = time.time()
+        self.contexts.move_to_end(analysis_id)
+        self.counters["hits"] += 1
+        return context
+
+    def register(self, analysis_result: Dict[str, Any], video_info: Dict[str, Any]) -> Dict[str, Any]:
+        """분석 결과 등록 (이미 있으면 사용 시각만 갱신)"""
+        self._prune()
+        system_prompt = render_system_prompt(analysis_result, video_info)
+        analysis_id = hashlib.sha256(system_prompt.encode()).hexdigest()
+        now = time.time()
+        context = self.contexts.get(analysis_id)
+        if context is not None:
+            context["last_used_at"] = now
+            self.contexts.move_to_end(analysis_id)
+            self.counters["reused"] += 1
+            return context
+
+        while len(self.contexts) >= self.max_contexts:
+            self.contexts.popitem(last=False)
+            self.counters["evicted"] += 1
+        context = {
+            "analysis_id": analysis_id,
+            "filename": video_info.get('filename', 'unknown'),
+            "system_prompt": system_prompt,
+            "tokens": estimate_tokens(system_prompt),
+            "created_at": now,
+            "last_used_at": now
+        }
+        self.contexts[analysis_id] = context
+        self.counters["registered"] += 1
+        return context
+
+    def view(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: context[key] for key in ("analysis_id", "filename", "tokens", "created_at")}
+
+    def stats(self) -> Dict[str, int]:
+        self._prune()
+        return {
+            **self.counters,
+            "contexts": len(self.contexts),
+            "max_contexts": self.max_contexts,
+            "ttl_seconds": self.ttl
+        }
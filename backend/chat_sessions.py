@@ -0,0 +1,156 @@
+"""
+VideoNet Pro - 동영상 분석 채팅 세션 저장소
+대화 기록을 서버에 세션 ID별로 보관합니다 (클라이언트가 매번 전체 기록을 보내지 않음)
+- 세션 수 제한 (초과 시 가장 오래 쓰이지 않은 세션 삭제), 마지막 사용 후 TTL이 지나면 삭제
+- 프롬프트에 넣는 대화 기록은 토큰 예산 이내로 유지: 넘치면 오래된 대화부터 잘라내고
+  잘라낸 대화는 요약으로 합침 (요약은 답변 후 백그라운드에서 생성)
+  -> 대화가 길어져도 프롬프트 크기와 응답 지연이 일정
+"""
+
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# ===== 설정 =====
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+CHAT_SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL_SECONDS", str(6 * 60 * 60)))  # 6시간
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))  # 프롬프트에 넣는 대화 기록 토큰
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))  # 잘라낸 대화 요약 길이 (0이면 요약 안 함)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토큰 수 추정 (토크나이저 없이)
+    한글/한자/가나는 글자당 1토큰, 그 외는 4글자당 1토큰으로 계산 (실제보다 약간 많게)
+    """
+    wide = sum(1 for ch in text if ord(ch) >= 0x1100)
+    return wide + (len(text) - wide + 3) // 4 + 4  # 메시지마다 역할 등 고정 토큰
+
+
+class ChatSessionStore:
+    """
+    채팅 세션 저장소 (메모리, 프로세스 단위)
+    세션: {"session_id", "history": [{"role", "content", "timestamp", "tokens"}],
+           "summary": 잘라낸 대화 요약, "pending": 아직 요약에 합치지 않은 잘라낸 대화, ...}
+    """
+
+    def __init__(self, max_sessions: int = CHAT_MAX_SESSIONS, ttl: int = CHAT_SESSION_TTL_SECONDS,
+                 token_budget: int = CHAT_HISTORY_TOKEN_BUDGET):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.counters = {"created": 0, "expired": 0, "evicted": 0, "trimmed_messages": 0, "summaries": 0}
+
+    def _prune(self):
+        """TTL이 지난 세션 삭제 (사용 순서로 정렬되어 있으므로 앞에서부터)"""
+        now = time.time()
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if now - session["last_used_at"] <= self.ttl:
+                break
+            del self.sessions[session_id]
+            self.counters["expired"] += 1
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """세션 조회 (사용 시각 갱신, 없거나 만료되었으면 None)"""
+        self._prune()
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None:
+            session["last_used_at"] = time.time()
+            self.sessions.move_to_end(session_id)
+        return session
+
+    def create(self, history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """새 세션 (history: 이전 대화로 시작할 때)"""
+        self._prune()
+        while len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.counters["evicted"] += 1
+        now = time.time()
+        session = {
+            "session_id": uuid.uuid4().hex,
+            "history": [],
+            "summary": "",
+            "pending": [],
+            "summarizing": False,
+            "created_at": now,
+            "last_used_at": now
+        }
+        self.sessions[session["session_id"]] = session
+        self.counters["created"] += 1
+        for message in history or []:
+            self.append(session, message["role"], message["content"])
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def append(self, session: Dict[str, Any], role: str, content: str):
+        """대화 추가 후 토큰 예산을 넘으면 오래된 대화부터 잘라냄"""
+        session["history"].append({
+            "role": role,
+            "content": content,
+            "timestamp": time.time(),
+            "tokens": estimate_tokens(content)
+        })
+        self._trim(session)
+
+    def _trim(self, session: Dict[str, Any]):
+        history = session["history"]
+        total = sum(message["tokens"] for message in history)
+        while total > self.token_budget and len(history) > 1:
+            dropped = history.pop(0)
+            total -= dropped["tokens"]
+            session["pending"].append(dropped)
+            self.counters["trimmed_messages"] += 1
+            # 질문/답변 쌍이 갈라지지 않도록 남은 기록은 질문부터 시작
+            while len(history) > 1 and history[0]["role"] != "user":
+                dropped = history.pop(0)
+                total -= dropped["tokens"]
+                session["pending"].append(dropped)
+                self.counters["trimmed_messages"] += 1
+
+    def prompt_messages(self, session: Dict[str, Any]) -> List[Dict[str, str]]:
+        """프롬프트에 넣을 대화 (이전 대화 요약 + 예산 이내의 최근 대화)"""
+        messages = []
+        if session["summary"]:
+            messages.append({"role": "system", "content": f"이전 대화 요약:\n{session['summary']}"})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in session["history"])
+        return messages
+
+    def take_pending(self, session: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """요약에 합칠 잘라낸 대화 (가져간 뒤 비움, 이미 요약 중이면 빈 목록)"""
+        if session["summarizing"] or not session["pending"]:
+            return []
+        pending, session["pending"] = session["pending"], []
+        session["summarizing"] = True
+        return pending
+
+    def set_summary(self, session: Dict[str, Any], summary: Optional[str]):
+        """요약 결과 저장 (실패하면 None: 잘라낸 대화는 요약 없이 버림)"""
+        if summary:
+            session["summary"] = summary
+            self.counters["summaries"] += 1
+        session["summarizing"] = False
+
+    def view(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "session_id": session["session_id"],
+            "history": [{key: m[key] for key in ("role", "content", "timestamp")} for m in session["history"]],
+            "summary": session["summary"],
+            "message_count": len(session["history"]),
+            "history_tokens": sum(m["tokens"] for m in session["history"])
+        }
+
+    def stats(self) -> Dict[str, int]:
+        self._prune()
+        return {
+            **self.counters,
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "token_budget": self.token_budget
+        }
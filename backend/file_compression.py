@@ -0,0 +1,109 @@
+"""
+VideoNet Pro - 저장 파일 압축
+문서/로그/CSV처럼 압축이 잘 되는 파일만 골라 zstd(없으면 gzip)로 저장합니다
+압축/해제는 모두 스트리밍 방식 (파일 전체를 메모리에 올리지 않음)
+"""
+
+import os
+import gzip
+import mimetypes
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstandard 미설치 시 gzip 사용
+    zstandard = None
+
+# ===== 설정 =====
+COMPRESSION_ENABLED = os.getenv("FILE_COMPRESSION", "1") != "0"
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# 이 비율 이상 줄어들 때만 압축본 유지
+MIN_SAVINGS_RATIO = float(os.getenv("COMPRESSION_MIN_SAVINGS", "0.1"))
+# 너무 작은 파일은 압축하지 않음
+MIN_COMPRESS_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", str(4 * 1024)))
+# 너무 큰 파일도 압축하지 않음: 압축본은 Range 요청 시 처음부터 해제해야 하므로 (0이면 제한 없음)
+# 원본으로 두면 Range/이어받기를 pread(sendfile)로 바로 처리
+MAX_COMPRESS_SIZE = int(os.getenv("COMPRESSION_MAX_SIZE", str(64 * 1024 * 1024)))
+COMPRESSION_CHUNK_SIZE = 1024 * 1024
+
+# 파일 확장자(접미사)
+ENCODING_SUFFIX = {"zstd": ".zst", "gzip": ".gz"}
+
+# 압축 효과가 큰 콘텐츠 타입
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/xml", "application/javascript", "application/x-javascript",
+    "application/x-ndjson", "application/x-yaml", "application/yaml", "application/sql",
+    "application/x-sh", "application/rtf", "application/x-tex", "image/svg+xml",
+    "application/vnd.ms-excel", "application/msword", "application/vnd.ms-powerpoint",
+}
+COMPRESSIBLE_EXTENSIONS = {
+    ".txt", ".log", ".csv", ".tsv", ".json", ".jsonl", ".ndjson", ".xml", ".yaml", ".yml",
+    ".md", ".html", ".htm", ".css", ".js", ".ts", ".tsx", ".py", ".java", ".c", ".cpp",
+    ".h", ".sql", ".srt", ".vtt", ".svg", ".ini", ".cfg", ".conf", ".bmp", ".wav",
+}
+
+
+def available_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def guess_content_type(filename: str) -> str:
+    content_type, _ = mimetypes.guess_type(filename)
+    return content_type or "application/octet-stream"
+
+
+def is_compressible(filename: str, size: int) -> bool:
+    """파일명(확장자/콘텐츠 타입) 기준 압축 대상 여부"""
+    if not COMPRESSION_ENABLED or size < MIN_COMPRESS_SIZE:
+        return False
+    if MAX_COMPRESS_SIZE and size > MAX_COMPRESS_SIZE:
+        return False
+    if Path(filename).suffix.lower() in COMPRESSIBLE_EXTENSIONS:
+        return True
+    content_type = guess_content_type(filename)
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def compress_file(src: Path, dst: Path, codec: str) -> int:
+    """src를 codec으로 스트리밍 압축해 dst에 기록 -> 압축 크기"""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        if codec == "zstd":
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            compressor.copy_stream(fin, fout, read_size=COMPRESSION_CHUNK_SIZE,
+                                   write_size=COMPRESSION_CHUNK_SIZE)
+        else:
+            with gzip.GzipFile(fileobj=fout, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as gz:
+                while chunk := fin.read(COMPRESSION_CHUNK_SIZE):
+                    gz.write(chunk)
+    return dst.stat().st_size
+
+
+def open_decompressed(path: Path, encoding: Optional[str]) -> BinaryIO:
+    """저장된 파일을 원본 바이트로 읽는 스트림"""
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd로 압축된 파일을 읽으려면 zstandard 패키지가 필요합니다")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    if encoding == "gzip":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """Accept-Encoding 헤더가 encoding을 허용하는지 (q=0은 거부)"""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() not in (encoding, "*"):
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
@@ -0,0 +1,257 @@
+"""
+VideoNet Pro - 공유 파일 미리보기 생성
+업로드가 끝난 뒤 백그라운드 워커가 작은 JPEG 미리보기를 만들어 캐시합니다
+- 이미지: 축소 썸네일 (Pillow)
+- 동영상: 대표 프레임 (OpenCV)
+- PDF: 첫 페이지 (PyMuPDF 설치 시)
+미리보기는 내용 해시 기준으로 저장되어 같은 내용의 파일끼리 공유됩니다
+"""
+
+import io
+import os
+import asyncio
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import cv2
+from PIL import Image, ImageOps
+
+from file_compression import guess_content_type, open_decompressed
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # 미설치 시 PDF 미리보기 생략
+    fitz = None
+
+# ===== 설정 =====
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+PREVIEW_QUEUE_SIZE = int(os.getenv("PREVIEW_QUEUE_SIZE", "64"))  # 가득 차면 새 작업은 버림 (업로드는 기다리지 않음)
+PREVIEW_MAX_DIMENSION = int(os.getenv("PREVIEW_MAX_DIMENSION", "320"))  # 긴 변 (px)
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "80"))
+# 압축 저장된 이미지는 메모리에서 해제해 열기 때문에 크기 제한
+PREVIEW_MAX_INMEMORY_BYTES = int(os.getenv("PREVIEW_MAX_INMEMORY_BYTES", str(64 * 1024 * 1024)))
+
+# 미리보기를 만들 수 없는 파일 표시 (매번 다시 시도하지 않도록)
+UNSUPPORTED_SUFFIX = ".none"
+
+
+class PreviewUnsupported(Exception):
+    """미리보기를 만들 수 없는 형식"""
+
+
+def preview_kind(filename: str) -> Optional[str]:
+    """미리보기 종류 (image / video / pdf, 불가능하면 None)"""
+    content_type = guess_content_type(filename)
+    if content_type == "image/svg+xml":
+        return None
+    if content_type.startswith("image/"):
+        return "image"
+    if content_type.startswith("video/"):
+        return "video"
+    if content_type == "application/pdf" and fitz is not None:
+        return "pdf"
+    return None
+
+
+def _encode_jpeg(image: Image.Image) -> bytes:
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((PREVIEW_MAX_DIMENSION, PREVIEW_MAX_DIMENSION))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=PREVIEW_JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def render_image(path: Path, encoding: Optional[str]) -> bytes:
+    if encoding:
+        with open_decompressed(path, encoding) as reader:
+            data = reader.read(PREVIEW_MAX_INMEMORY_BYTES + 1)
+        if len(data) > PREVIEW_MAX_INMEMORY_BYTES:
+            raise PreviewUnsupported("이미지가 너무 큽니다")
+        source = io.BytesIO(data)
+    else:
+        source = path
+    with Image.open(source) as image:
+        # JPEG은 디코딩 단계에서 축소 (전체 해상도로 풀지 않음)
+        image.draft("RGB", (PREVIEW_MAX_DIMENSION, PREVIEW_MAX_DIMENSION))
+        return _encode_jpeg(image)
+
+
+def render_video(path: Path) -> bytes:
+    """앞부분 검은 화면을 피해 전체 길이의 10% 지점 프레임을 대표 프레임으로 사용"""
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            raise PreviewUnsupported("동영상을 열 수 없습니다")
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count > 1:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count // 10)
+        ok, frame = cap.read()
+        if not ok:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = cap.read()
+        if not ok:
+            raise PreviewUnsupported("프레임을 읽을 수 없습니다")
+    finally:
+        cap.release()
+
+    height, width = frame.shape[:2]
+    scale = PREVIEW_MAX_DIMENSION / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_JPEG_QUALITY])
+    if not ok:
+        raise PreviewUnsupported("프레임 인코딩 실패")
+    return buffer.tobytes()
+
+
+def render_pdf(path: Path) -> bytes:
+    with fitz.open(str(path)) as document:
+        if document.page_count == 0:
+            raise PreviewUnsupported("빈 PDF입니다")
+        page = document.load_page(0)
+        zoom = PREVIEW_MAX_DIMENSION / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    with Image.open(io.BytesIO(pixmap.tobytes("png"))) as image:
+        return _encode_jpeg(image)
+
+
+def render_preview(kind: str, path: Path, encoding: Optional[str]) -> bytes:
+    if kind == "image":
+        return render_image(path, encoding)
+    if encoding:
+        # 동영상/PDF는 압축 대상이 아니므로 압축 저장된 경우는 없음
+        raise PreviewUnsupported("압축 저장된 파일입니다")
+    if kind == "video":
+        return render_video(path)
+    return render_pdf(path)
+
+
+class PreviewWorkerPool:
+    """
+    미리보기 생성 워커 풀
+    - 크기 제한 큐: 가득 차면 작업을 버리고 dropped로 집계 (요청 시 다시 예약)
+    - 생성은 스레드에서 실행 (이벤트 루프 블로킹 방지)
+    """
+
+    def __init__(self, preview_dir: Path,
+                 locate: Callable[[str], Optional[Tuple[Path, Optional[str]]]],
+                 workers: int = PREVIEW_WORKERS, queue_size: int = PREVIEW_QUEUE_SIZE):
+        self.preview_dir = preview_dir
+        self.locate = locate  # 해시 -> (현재 블롭 경로, 압축 방식), 삭제되었으면 None
+        self.preview_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Set[str] = set()
+        self.counters = {"generated": 0, "unsupported": 0, "failed": 0, "dropped": 0}
+        self._tasks: List[asyncio.Task] = []
+
+    def preview_path(self, file_hash: str) -> Path:
+        return self.preview_dir / file_hash[:2] / f"{file_hash}.jpg"
+
+    def _marker_path(self, file_hash: str) -> Path:
+        return self.preview_dir / file_hash[:2] / f"{file_hash}{UNSUPPORTED_SUFFIX}"
+
+    def status(self, file_hash: str) -> str:
+        """ready / pending / unsupported / missing"""
+        if self.preview_path(file_hash).exists():
+            return "ready"
+        if file_hash in self.pending:
+            return "pending"
+        if self._marker_path(file_hash).exists():
+            return "unsupported"
+        return "missing"
+
+    def submit(self, file_hash: str, filename: str) -> bool:
+        """
+        미리보기 생성 예약 (기다리지 않음)
+        반환값: 예약되었거나 이미 처리 중/완료면 True, 큐가 가득 차 버렸으면 False
+        """
+        kind = preview_kind(filename)
+        if kind is None:
+            return True
+        if self.status(file_hash) in ("ready", "pending", "unsupported"):
+            return True
+        if self.queue is None:
+            return False
+        try:
+            self.queue.put_nowait((file_hash, kind))
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            return False
+        self.pending.add(file_hash)
+        return True
+
+    def _generate(self, file_hash: str, kind: str) -> str:
+        target = self.preview_path(file_hash)
+        target.parent.mkdir(exist_ok=True)
+        try:
+            # 대기 중 압축본으로 교체되었을 수 있으므로 생성 직전에 경로 확인
+            location = self.locate(file_hash)
+            if location is None:
+                return "failed"
+            data = render_preview(kind, *location)
+        except FileNotFoundError:
+            # 생성 전에 삭제된 파일
+            return "failed"
+        except Exception as e:
+            # 손상/미지원 파일은 다시 시도하지 않음
+            if not isinstance(e, PreviewUnsupported):
+                print(f"⚠️ 미리보기 생성 실패: {file_hash[:16]} ({e})")
+            self._marker_path(file_hash).touch()
+            return "unsupported"
+
+        tmp_path = target.with_name(target.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+        return "generated"
+
+    async def _worker(self):
+        while True:
+            file_hash, kind = await self.queue.get()
+            try:
+                result = await asyncio.to_thread(self._generate, file_hash, kind)
+                self.counters[result] += 1
+            except Exception as e:
+                self.counters["failed"] += 1
+                print(f"⚠️ 미리보기 작업 오류: {file_hash[:16]} ({e})")
+            finally:
+                self.pending.discard(file_hash)
+                self.queue.task_done()
+
+    def discard(self, file_hash: str):
+        """블롭 삭제 시 미리보기도 삭제"""
+        for path in (self.preview_path(file_hash), self._marker_path(file_hash)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def start(self):
+        """워커 시작 (이벤트 루프 안에서 호출)"""
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+        self.pending.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "pdf_supported": fitz is not None
+        }
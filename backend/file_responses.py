@@ -0,0 +1,253 @@
+"""
+VideoNet Pro - 파일 다운로드 응답
+HTTP Range(206), 강한 ETag, 조건부 요청(If-None-Match / If-Range) 처리
+"""
+
+import os
+from typing import Optional, Tuple
+from urllib.parse import quote
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from file_compression import accepts_encoding, open_decompressed
+
+# 다운로드 전송 청크 크기
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB
+
+
+def make_etag(file_hash: str, encoding: Optional[str] = None) -> str:
+    """저장된 SHA256으로 만든 강한 ETag (압축 표현은 인코딩을 붙여 구분)"""
+    if encoding:
+        return f'"{file_hash}-{encoding}"'
+    return f'"{file_hash}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더와 ETag 비교 (약한 비교)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Range 헤더 파싱 -> (start, end) (end 포함)
+    - 단일 범위만 지원, 여러 범위나 잘못된 형식은 None (전체 전송)
+    - 만족할 수 없는 범위는 416
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    start_text, end_text = spec.split("-", 1)
+    try:
+        if start_text == "":
+            # 마지막 N 바이트
+            length = int(end_text)
+            if length < 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+            if length == 0:
+                start = size  # bytes=-0: 만족할 수 없는 범위 (아래에서 416)
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+            end = min(end, size - 1)
+            if start > end and start < size:
+                return None
+    except ValueError:
+        return None
+
+    if start >= size or size == 0:
+        raise HTTPException(
+            status_code=416,
+            detail="요청한 범위가 파일 크기를 벗어났습니다",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+class RangeFileResponse(Response):
+    """
+    파일의 일부(또는 전체)를 전송하는 응답
+    - 서버가 zero-copy 전송(http.response.zerocopysend)을 지원하면 sendfile 사용
+    - 아니면 스레드에서 pread로 읽어 청크 전송
+    """
+
+    def __init__(self, path: str, start: int, end: int, status_code: int,
+                 headers: dict, media_type: str, send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.length = max(0, end - start + 1)
+        self.send_body = send_body
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False,
+                })
+                return
+
+            offset, remaining = self.start, self.length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(
+                    os.pread, file.fileno(), min(DOWNLOAD_CHUNK_SIZE, remaining), offset
+                )
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # 전송 중 파일이 줄어든 경우 응답 종료
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            file.close()
+
+
+class DecompressedFileResponse(Response):
+    """
+    압축 저장된 파일을 해제하며 원본 바이트로 전송
+    Range 요청이면 start 이전 바이트는 해제만 하고 버림
+    - 비용은 O(start): 끝부분 범위 요청도 파일 앞부분 전체를 해제
+      (COMPRESSION_MAX_SIZE보다 큰 파일은 압축하지 않아 RangeFileResponse로 전송)
+    """
+
+    def __init__(self, path: str, encoding: str, start: int, end: int, status_code: int,
+                 headers: dict, media_type: str, send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.encoding = encoding
+        self.start = start
+        self.length = max(0, end - start + 1)
+        self.send_body = send_body
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        reader = await anyio.to_thread.run_sync(open_decompressed, self.path, self.encoding)
+        try:
+            skip = self.start
+            while skip > 0:
+                skipped = await anyio.to_thread.run_sync(reader.read, min(DOWNLOAD_CHUNK_SIZE, skip))
+                if not skipped:
+                    break
+                skip -= len(skipped)
+
+            remaining = self.length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(reader.read, min(DOWNLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            reader.close()
+
+
+def build_file_response(request: Request, path: str, size: int, file_hash: str,
+                        filename: str, media_type: str = "application/octet-stream",
+                        encoding: Optional[str] = None, stored_size: Optional[int] = None) -> Response:
+    """
+    조건부/범위 요청을 반영한 다운로드 응답 생성
+    - 압축 저장된 파일: 클라이언트가 해당 인코딩을 받으면 압축본 그대로 전송 (Content-Encoding)
+    - If-None-Match 일치 -> 304
+    - Range (If-Range가 있으면 ETag 일치할 때만) -> 206
+    """
+    send_body = request.method != "HEAD"
+
+    # 압축본 그대로 전송 (범위 요청은 원본 기준으로 처리)
+    if (encoding and "range" not in request.headers
+            and accepts_encoding(request.headers.get("accept-encoding"), encoding)):
+        etag = make_etag(file_hash, encoding)
+        headers = {
+            "etag": etag,
+            "accept-ranges": "bytes",
+            "cache-control": "private, no-cache",
+            "content-disposition": content_disposition(filename),
+            "content-encoding": encoding,
+            "vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={
+                "etag": etag,
+                "cache-control": headers["cache-control"],
+                "vary": headers["vary"],
+            })
+        return RangeFileResponse(path, 0, stored_size - 1, 200, headers, media_type, send_body)
+
+    etag = make_etag(file_hash)
+    headers = {
+        "etag": etag,
+        "accept-ranges": "bytes",
+        "cache-control": "private, no-cache",
+        "content-disposition": content_disposition(filename),
+    }
+    if encoding:
+        headers["vary"] = "Accept-Encoding"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={
+            key: value for key, value in headers.items() if key in ("etag", "cache-control", "vary")
+        })
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+        status_code = 206
+
+    if encoding:
+        return DecompressedFileResponse(path, encoding, start, end, status_code, headers, media_type, send_body)
+    return RangeFileResponse(path, start, end, status_code, headers, media_type, send_body)
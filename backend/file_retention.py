@@ -0,0 +1,512 @@
+"""
+VideoNet Pro - 업로드 저장 공간 관리
+- 파일/방/전체 할당량: 업로드 본문을 받는 도중(또는 받기 전에) 초과 여부 확인
+- 백그라운드 정리: TTL 만료, 회의 종료 후 방 파일 만료, 용량 초과 시 LRU 삭제
+- 디스크 사용량 지표
+"""
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+from fastapi.responses import JSONResponse
+from file_storage import BlobStore
+
+# ===== 설정 (0이면 제한 없음) =====
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(2 * 1024 ** 3)))        # 파일 1개 (2GB)
+ROOM_QUOTA_BYTES = int(os.getenv("ROOM_QUOTA_BYTES", str(5 * 1024 ** 3)))      # 방 1개 (5GB)
+STORAGE_QUOTA_BYTES = int(os.getenv("STORAGE_QUOTA_BYTES", str(50 * 1024 ** 3)))  # 전체 (50GB)
+MIN_FREE_DISK_BYTES = int(os.getenv("MIN_FREE_DISK_BYTES", str(1024 ** 3)))    # 디스크 최소 여유 (1GB)
+# 사용량 캐시 유효 시간 (청크마다 DB/디렉토리를 다시 읽지 않음)
+QUOTA_REFRESH_SECONDS = float(os.getenv("QUOTA_REFRESH_SECONDS", "1.0"))
+
+# 정리 작업
+SWEEP_INTERVAL_SECONDS = int(os.getenv("SWEEP_INTERVAL_SECONDS", "300"))
+FILE_TTL_SECONDS = int(os.getenv("FILE_TTL_SECONDS", str(7 * 24 * 60 * 60)))    # 업로드 후 보관 기간
+ROOM_FILE_GRACE_SECONDS = int(os.getenv("ROOM_FILE_GRACE_SECONDS", "600"))     # 회의 종료 후 유예 (음수면 만료 안 함)
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 60 * 60)))   # 멈춘 이어받기 세션
+# 전체 사용량이 상한 비율을 넘으면 하한 비율까지 오래 안 쓴 파일부터 삭제
+LRU_HIGH_WATERMARK = float(os.getenv("LRU_HIGH_WATERMARK", "0.9"))
+LRU_LOW_WATERMARK = float(os.getenv("LRU_LOW_WATERMARK", "0.8"))
+LRU_PROTECT_SECONDS = int(os.getenv("LRU_PROTECT_SECONDS", "3600"))  # 최근 사용 파일은 LRU 삭제 제외
+# 참조 없는 블롭(시작 시 복구 등)을 해시 재사용을 위해 남겨 두는 시간
+UNREFERENCED_BLOB_GRACE_SECONDS = int(os.getenv("UNREFERENCED_BLOB_GRACE_SECONDS", str(24 * 60 * 60)))
+
+
+class QuotaExceededError(Exception):
+    """할당량 초과 (scope: file, room, storage, disk)"""
+
+    MESSAGES = {
+        "file": "파일 크기 제한을 초과했습니다",
+        "room": "방 저장 공간 할당량을 초과했습니다",
+        "storage": "서버 저장 공간 할당량을 초과했습니다",
+        "disk": "서버 디스크 여유 공간이 부족합니다",
+    }
+
+    def __init__(self, scope: str, limit: int, used: int, requested: int):
+        super().__init__(self.MESSAGES[scope])
+        self.scope = scope
+        self.limit = limit
+        self.used = used
+        self.requested = requested
+
+    @property
+    def status_code(self) -> int:
+        # 파일 자체가 너무 크면 413, 저장 공간 부족이면 507
+        return 413 if self.scope == "file" else 507
+
+    def detail(self) -> dict:
+        return {
+            "message": str(self),
+            "scope": self.scope,
+            "limit": self.limit,
+            "used": self.used,
+            "requested": self.requested
+        }
+
+
+class StorageQuota:
+    """
+    저장 공간 할당량 검사
+    - 사용량 = 저장된 블롭 + 업로드 중인 임시 파일 (선언 크기가 있으면 선언 크기)
+    - 본문을 받는 중인 요청은 reserve()로 받은 만큼 예약 (동시 업로드 합산)
+    - 저장소/임시 파일 집계(SQLite 합계, 세션 파일 읽기)는 이벤트 루프를 막지 않도록 스레드에서 실행:
+      루프에서는 마지막 집계를 사용하고, 오래되었거나 무효화되었으면 백그라운드에서 다시 집계
+      (집계에 아직 반영되지 않은 요청의 바이트는 release 이후 다음 집계까지 계속 포함)
+    예약 정보는 루프와 정리 스레드가 함께 읽으므로 잠금으로 보호
+    """
+
+    def __init__(self, store: BlobStore, upload_dir: Path, partial_dir: Path):
+        self.store = store
+        self.upload_dir = upload_dir
+        self.partial_dir = partial_dir
+        self.active: Dict[str, list] = {}  # 예약 키 -> [room_id, 예약 바이트]
+        self._settling: Dict[str, Tuple[int, Optional[str], int]] = {}  # 키 -> (release 번호, 방, 바이트)
+        self._lock = threading.Lock()
+        self._release_seq = 0
+        self._generation = 0  # invalidate마다 증가
+        self._snapshot: Optional[dict] = None
+        self._snapshot_at = 0.0
+        self._snapshot_generation = -1
+        self._refreshing: Optional[asyncio.Task] = None
+
+    def _scan_partials(self) -> Dict[str, Tuple[Optional[str], int]]:
+        """업로드 중인 임시 파일 (키 -> (방, 바이트))"""
+        partials = {}
+        for entry in os.scandir(self.partial_dir):
+            if not entry.name.endswith(".part"):
+                continue
+            key = entry.name[:-len(".part")]
+            try:
+                size = entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            room_id = None
+            info_path = self.partial_dir / f"{key}.json"
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    session = json.load(f)
+                room_id = session.get("room_id")
+                size = max(size, session.get("size") or 0)
+            except (FileNotFoundError, ValueError):
+                pass
+            partials[key] = (room_id, size)
+        return partials
+
+    def refresh(self) -> dict:
+        """저장소/임시 파일 사용량 다시 집계 (블로킹, 스레드에서 호출)"""
+        with self._lock:
+            release_seq, generation = self._release_seq, self._generation
+        snapshot = {
+            **self.store.usage(),
+            "rooms": self.store.room_usage(),
+            "partials": self._scan_partials()
+        }
+        with self._lock:
+            # 집계를 시작하기 전에 끝난 요청은 이번 집계에 포함됨
+            self._settling = {key: entry for key, entry in self._settling.items() if entry[0] > release_seq}
+            self._snapshot = snapshot
+            self._snapshot_at = time.monotonic()
+            self._snapshot_generation = generation
+        return snapshot
+
+    async def _refresh_in_background(self):
+        try:
+            await asyncio.to_thread(self.refresh)
+        except Exception as e:
+            print(f"⚠️ 저장소 사용량 집계 실패: {e}")
+
+    def snapshot(self) -> dict:
+        """
+        저장소/임시 파일 사용량
+        - 이벤트 루프: 마지막 집계 반환, 오래되었으면(QUOTA_REFRESH_SECONDS, invalidate) 백그라운드 집계 예약
+        - 스레드(정리 작업, 지표): 오래되었으면 바로 다시 집계
+        """
+        stale = (self._snapshot is None or self._snapshot_generation != self._generation
+                 or time.monotonic() - self._snapshot_at > QUOTA_REFRESH_SECONDS)
+        if not stale:
+            return self._snapshot
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.refresh()
+        if self._snapshot is None:
+            # 시작 시 집계 전 (reconcile_storage에서 미리 집계하므로 보통 없음)
+            return self.refresh()
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = loop.create_task(self._refresh_in_background())
+        return self._snapshot
+
+    def invalidate(self):
+        """업로드 완료/삭제 후 다음 검사 전에 사용량을 다시 집계하도록 함"""
+        with self._lock:
+            self._generation += 1
+
+    def is_active(self, key: str) -> bool:
+        with self._lock:
+            return key in self.active
+
+    def current_usage(self, room_id: Optional[str] = None) -> Tuple[int, int]:
+        """(전체 사용량, 방 사용량) - 예약 중인 요청과 아직 집계에 반영되지 않은 요청 포함"""
+        snapshot = self.snapshot()
+        with self._lock:
+            active = list(self.active.items())
+            settling = list(self._settling.items())
+        active_keys = {key for key, _ in active}
+        settling_sizes = {key: size for key, (_, _, size) in settling}
+
+        total = snapshot["stored_bytes"]
+        room_total = snapshot["rooms"].get(room_id, 0) if room_id else 0
+        for key, (partial_room, size) in snapshot["partials"].items():
+            if key in active_keys:
+                continue
+            # 이어받기 세션처럼 같은 키가 집계 전 요청에도 있으면 큰 쪽만
+            size = max(size, settling_sizes.pop(key, 0))
+            total += size
+            if room_id and partial_room == room_id:
+                room_total += size
+        pending = [(reserved_room, size) for _, (reserved_room, size) in active]
+        pending += [(settled_room, size) for key, (_, settled_room, size) in settling
+                    if key in settling_sizes and key not in active_keys]
+        for reserved_room, size in pending:
+            total += size
+            if room_id and reserved_room == room_id:
+                room_total += size
+        return total, room_total
+
+    def check_file_size(self, size: int):
+        if MAX_UPLOAD_SIZE and size > MAX_UPLOAD_SIZE:
+            raise QuotaExceededError("file", MAX_UPLOAD_SIZE, 0, size)
+
+    def check(self, room_id: Optional[str], size: int, stored: bool = True):
+        """
+        size 바이트를 더 저장할 수 있는지 확인 (불가능하면 QuotaExceededError)
+        stored=False: 이미 저장된 내용을 참조만 추가 (방 할당량만 확인)
+        """
+        total, room_total = self.current_usage(room_id)
+        if room_id and ROOM_QUOTA_BYTES and room_total + size > ROOM_QUOTA_BYTES:
+            raise QuotaExceededError("room", ROOM_QUOTA_BYTES, room_total, size)
+        if not stored:
+            return
+        if STORAGE_QUOTA_BYTES and total + size > STORAGE_QUOTA_BYTES:
+            raise QuotaExceededError("storage", STORAGE_QUOTA_BYTES, total, size)
+        if MIN_FREE_DISK_BYTES:
+            free = shutil.disk_usage(self.upload_dir).free
+            if free - size < MIN_FREE_DISK_BYTES:
+                raise QuotaExceededError("disk", MIN_FREE_DISK_BYTES, free, size)
+
+    def begin(self, key: str, room_id: Optional[str], initial: int = 0):
+        """요청 시작 - 이미 디스크에 있는 initial 바이트를 예약으로 대신 집계"""
+        with self._lock:
+            self.active[key] = [room_id, initial]
+
+    def reserve(self, key: str, size: int):
+        """받을 바이트 예약 (초과하면 기록하기 전에 QuotaExceededError)"""
+        with self._lock:
+            room_id, reserved = self.active[key]
+        self.check_file_size(reserved + size)
+        self.check(room_id, size)
+        with self._lock:
+            if key in self.active:
+                self.active[key][1] = reserved + size
+
+    def release(self, key: str):
+        """요청 종료 - 예약한 바이트는 디스크에 반영된 뒤 집계될 때까지 계속 포함"""
+        with self._lock:
+            entry = self.active.pop(key, None)
+            if entry is not None:
+                self._settle(key, entry[0], entry[1])
+            self._generation += 1
+
+    def add_pending(self, key: str, room_id: Optional[str], size: int):
+        """새로 차지한 공간 (이어받기 세션 생성 등) - 다음 집계 전까지 포함"""
+        with self._lock:
+            self._settle(key, room_id, size)
+            self._generation += 1
+
+    def _settle(self, key: str, room_id: Optional[str], size: int):
+        self._release_seq += 1
+        self._settling[key] = (self._release_seq, room_id, size)
+
+    def metrics(self) -> dict:
+        """디스크 사용량 지표"""
+        snapshot = self.refresh()
+        total, _ = self.current_usage()
+        with self._lock:
+            active_keys = set(self.active)
+        disk = shutil.disk_usage(self.upload_dir)
+        rooms = sorted(snapshot["rooms"].items(), key=lambda item: item[1], reverse=True)
+        return {
+            "stored_bytes": snapshot["stored_bytes"],
+            "logical_bytes": snapshot["logical_bytes"],
+            "partial_bytes": total - snapshot["stored_bytes"],
+            "used_bytes": total,
+            "blobs": snapshot["blobs"],
+            "files": snapshot["files"],
+            "active_uploads": len(snapshot["partials"].keys() | active_keys),
+            "dedup_saved_bytes": max(0, snapshot["logical_bytes"] - snapshot["stored_bytes"]),
+            "quota": {
+                "storage_bytes": STORAGE_QUOTA_BYTES,
+                "room_bytes": ROOM_QUOTA_BYTES,
+                "max_upload_size": MAX_UPLOAD_SIZE,
+                "min_free_disk_bytes": MIN_FREE_DISK_BYTES,
+                "usage_ratio": round(total / STORAGE_QUOTA_BYTES, 4) if STORAGE_QUOTA_BYTES else None
+            },
+            "disk": {"total_bytes": disk.total, "used_bytes": disk.used, "free_bytes": disk.free},
+            "top_rooms": [{"room_id": room_id, "bytes": size} for room_id, size in rooms[:10]]
+        }
+
+
+class StorageSweeper:
+    """
+    주기적 저장소 정리 (백그라운드)
+    1) TTL이 지난 파일
+    2) 회의가 끝나고 유예 시간이 지난 방의 파일
+    3) 오래 멈춘 이어받기 업로드 세션
+    4) 유예 시간이 지나도록 참조가 없는 블롭
+    5) 전체 사용량이 상한을 넘으면 참조 없는 블롭 먼저, 그다음 오래 안 쓴 파일부터 (LRU)
+    """
+
+    def __init__(self, store: BlobStore, quota: StorageQuota, partial_dir: Path,
+                 on_session_expired: Optional[Callable[[str], None]] = None,
+                 on_blob_removed: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.quota = quota
+        self.partial_dir = partial_dir
+        self.on_session_expired = on_session_expired
+        self.on_blob_removed = on_blob_removed  # 블롭 삭제 시 파생 파일(미리보기 등) 정리
+        self.stats = {
+            "last_sweep_at": None,
+            "last_duration_s": None,
+            "removed": {"ttl": 0, "room_ended": 0, "lru": 0, "sessions": 0, "unreferenced": 0},
+            "freed_bytes": 0
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def _remove_files(self, file_ids) -> int:
+        removed = 0
+        for file_id in file_ids:
+            metadata = self.store.get(file_id)
+            if metadata is None:
+                continue
+            if self.store.remove_reference(file_id) and self.on_blob_removed:
+                self.on_blob_removed(metadata["hash"])
+            removed += 1
+        return removed
+
+    def _collect_blobs(self, hashes) -> int:
+        removed = 0
+        for file_hash in hashes:
+            if self.store.collect_blob(file_hash):
+                if self.on_blob_removed:
+                    self.on_blob_removed(file_hash)
+                removed += 1
+        return removed
+
+    def _expire_sessions(self, now: float) -> Tuple[int, int]:
+        """UPLOAD_SESSION_TTL 동안 진행이 없는 이어받기 세션 삭제 -> (세션 수, 바이트)"""
+        removed, freed = 0, 0
+        for entry in os.scandir(self.partial_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            upload_id = entry.name[:-len(".json")]
+            if self.quota.is_active(upload_id):
+                continue
+            data_path = self.partial_dir / f"{upload_id}.part"
+            try:
+                last_activity = max(entry.stat().st_mtime,
+                                    data_path.stat().st_mtime if data_path.exists() else 0)
+                if now - last_activity <= UPLOAD_SESSION_TTL:
+                    continue
+                if data_path.exists():
+                    freed += data_path.stat().st_size
+                    os.remove(data_path)
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            if self.on_session_expired:
+                self.on_session_expired(upload_id)
+            removed += 1
+        return removed, freed
+
+    def sweep(self) -> dict:
+        """정리 1회 실행 (스레드에서 호출) -> 이번 실행에서 삭제한 항목 수"""
+        started = time.time()
+        before = self.store.usage()["stored_bytes"]
+        removed = {"ttl": 0, "room_ended": 0, "lru": 0, "sessions": 0, "unreferenced": 0}
+
+        if FILE_TTL_SECONDS > 0:
+            while expired := self.store.expired_files(started - FILE_TTL_SECONDS):
+                removed["ttl"] += self._remove_files(expired)
+
+        if ROOM_FILE_GRACE_SECONDS >= 0:
+            for room_id in self.store.ended_rooms(started - ROOM_FILE_GRACE_SECONDS):
+                removed["room_ended"] += self._remove_files(
+                    metadata["file_id"] for metadata in self.store.list_room(room_id)
+                )
+                self.store.clear_room_ended(room_id)
+
+        removed["sessions"], session_bytes = self._expire_sessions(started)
+
+        # 참조 없는 블롭은 다른 정리 대상이 아니므로 여기서 회수 (할당량을 계속 차지하지 않도록)
+        while unreferenced := self.store.unreferenced_blobs(started - UNREFERENCED_BLOB_GRACE_SECONDS):
+            collected = self._collect_blobs(unreferenced)
+            removed["unreferenced"] += collected
+            if not collected:
+                break
+
+        if STORAGE_QUOTA_BYTES:
+            self.quota.invalidate()
+            used, _ = self.quota.current_usage()
+            if used > STORAGE_QUOTA_BYTES * LRU_HIGH_WATERMARK:
+                target = STORAGE_QUOTA_BYTES * LRU_LOW_WATERMARK
+                while used > target:
+                    # 참조 중인 파일보다 유예 중인 참조 없는 블롭을 먼저 삭제
+                    unreferenced = self.store.unreferenced_blobs(started, limit=1)
+                    if unreferenced:
+                        removed["unreferenced"] += self._collect_blobs(unreferenced)
+                    else:
+                        candidates = self.store.least_recently_used(started - LRU_PROTECT_SECONDS, limit=1)
+                        if not candidates:
+                            break
+                        removed["lru"] += self._remove_files(candidates)
+                    self.quota.invalidate()
+                    used, _ = self.quota.current_usage()
+
+        self.quota.invalidate()
+        freed = max(0, before - self.store.usage()["stored_bytes"]) + session_bytes
+        for reason, count in removed.items():
+            self.stats["removed"][reason] += count
+        self.stats["freed_bytes"] += freed
+        self.stats["last_sweep_at"] = started
+        self.stats["last_duration_s"] = round(time.time() - started, 3)
+        return {**removed, "freed_bytes": freed}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                result = await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                print(f"⚠️ 저장소 정리 실패: {e}")
+                continue
+            if result["freed_bytes"] or any(result[key] for key in
+                                            ("ttl", "room_ended", "lru", "sessions", "unreferenced")):
+                print(f"🧹 저장소 정리: TTL {result['ttl']}개, 회의 종료 {result['room_ended']}개, "
+                      f"LRU {result['lru']}개, 세션 {result['sessions']}개, "
+                      f"참조 없는 블롭 {result['unreferenced']}개, "
+                      f"{result['freed_bytes'] / 1024 / 1024:.1f}MB 확보")
+
+    def start(self):
+        """주기적 정리 시작 (이벤트 루프 안에서 호출)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class _BodyLimitExceeded(Exception):
+    """본문 수신 중 할당량 초과 (폼 파싱 중단용)"""
+
+
+class UploadLimitMiddleware:
+    """
+    multipart 업로드(/api/files/upload) 할당량 검사 미들웨어 (ASGI)
+    폼 파싱이 핸들러보다 먼저 본문 전체를 임시 파일로 받기 때문에
+    Content-Length로 미리 거절하고, 길이를 모르면 받는 도중 초과 시점에 중단합니다
+    """
+
+    def __init__(self, app, quota: StorageQuota, paths=("/api/files/upload",)):
+        self.app = app
+        self.quota = quota
+        self.paths = frozenset(paths)
+
+    @staticmethod
+    def _error_response(error: QuotaExceededError) -> JSONResponse:
+        return JSONResponse({"detail": error.detail()}, status_code=error.status_code,
+                            headers={"Connection": "close"})
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or scope["path"].rstrip("/") not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        room_id = parse_qs(scope.get("query_string", b"").decode()).get("room_id", [None])[0]
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        try:
+            if content_length.isdigit():
+                self.quota.check_file_size(int(content_length))
+                self.quota.check(room_id, int(content_length))
+        except QuotaExceededError as e:
+            await self._error_response(e)(scope, receive, send)
+            return
+
+        key = f"request-{id(scope)}"
+        error: Optional[QuotaExceededError] = None
+        response_sent = False
+
+        async def limited_receive():
+            nonlocal error
+            message = await receive()
+            if message["type"] == "http.request" and self.quota.is_active(key):
+                try:
+                    self.quota.reserve(key, len(message.get("body", b"")))
+                except QuotaExceededError as e:
+                    error = e
+                    raise _BodyLimitExceeded()
+                if not message.get("more_body", False):
+                    # 본문 수신 완료 - 이후는 임시 업로드 파일 크기로 집계됨
+                    self.quota.release(key)
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_sent
+            if error is None:
+                await send(message)
+            elif message["type"] == "http.response.start" and not response_sent:
+                # 본문 파싱 오류(400) 응답 대신 할당량 초과 응답
+                await self._error_response(error)(scope, receive, send)
+            response_sent = response_sent or message["type"] == "http.response.start"
+
+        self.quota.begin(key, room_id)
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyLimitExceeded:
+            if response_sent:
+                raise
+            await self._error_response(error)(scope, receive, send)
+        finally:
+            self.quota.release(key)
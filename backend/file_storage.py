@@ -0,0 +1,498 @@
+"""
+VideoNet Pro - 콘텐츠 주소 기반 파일 저장소
+SHA256 해시를 키로 한 번만 저장하고, 업로드/방 단위 참조를 관리합니다
+메타데이터는 SQLite 인덱스에 저장되어 재시작/여러 워커 간에 유지됩니다
+"""
+
+import os
+import json
+import time
+import secrets
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from file_compression import ENCODING_SUFFIX, open_decompressed
+
+SUFFIX_ENCODING = {suffix: encoding for encoding, suffix in ENCODING_SUFFIX.items()}
+
+
+class StreamHasher:
+    """
+    전체 SHA256과 고정 크기 파트별 SHA256을 한 번에 계산
+    파트 해시는 머클 트리의 잎(leaf)으로 사용됩니다
+    """
+
+    def __init__(self, part_size: int):
+        self.part_size = part_size
+        self.sha256 = hashlib.sha256()
+        self.part_hashes: List[str] = []
+        self.size = 0
+        self._part = hashlib.sha256()
+        self._part_fill = 0
+
+    def update(self, data: bytes):
+        self.sha256.update(data)
+        self.size += len(data)
+
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.part_size - self._part_fill)
+            self._part.update(view[:take])
+            self._part_fill += take
+            view = view[take:]
+            if self._part_fill == self.part_size:
+                self.part_hashes.append(self._part.hexdigest())
+                self._part = hashlib.sha256()
+                self._part_fill = 0
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+    def finish_parts(self) -> List[str]:
+        """마지막(짧은) 파트까지 포함한 파트 해시 목록 (빈 파일은 빈 파트 1개)"""
+        if self._part_fill or not self.part_hashes:
+            return self.part_hashes + [self._part.hexdigest()]
+        return list(self.part_hashes)
+
+
+def merkle_root(part_hashes: List[str]) -> str:
+    """
+    파트 해시로 머클 루트 계산
+    부모 = SHA256(왼쪽 + 오른쪽), 짝이 없는 마지막 노드는 그대로 올림
+    """
+    level = [bytes.fromhex(h) for h in part_hashes] or [hashlib.sha256(b"").digest()]
+    while len(level) > 1:
+        next_level = [hashlib.sha256(level[i] + level[i + 1]).digest()
+                      for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0].hex()
+
+
+class BlobStore:
+    """
+    해시 기반 블롭 저장소 + 참조 테이블
+    - 블롭: blobs/<해시 앞 2자리>/<해시>
+    - 참조: file_id -> (파일명, 방, 해시)
+    - 참조 수가 0이 되면 블롭 삭제 (GC)
+    - 압축 저장된 블롭은 <해시>.zst / <해시>.gz (encoding 컬럼)
+    - 쓰기는 공유 연결 + 락(transaction), 읽기는 스레드별 연결(_reader)
+    """
+
+    def __init__(self, root: Path, db_path: Optional[Path] = None):
+        self.blob_dir = root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path or (root / "file_index.db")
+        self.conn = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._init_schema()
+
+    def _init_schema(self):
+        """인덱스 테이블 생성 (file_id, room_id, hash로 조회)"""
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs (hash),
+                room_id TEXT,
+                uploaded_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_room ON files (room_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files (hash)")
+
+        # 파트 해시/머클 루트 컬럼 (이전 버전 인덱스 DB에는 컬럼 추가)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(blobs)")}
+        for column, column_type in (("part_size", "INTEGER"), ("part_hashes", "TEXT"),
+                                    ("merkle_root", "TEXT"), ("encoding", "TEXT"),
+                                    ("stored_size", "INTEGER")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE blobs ADD COLUMN {column} {column_type}")
+
+        # LRU 정리를 위한 마지막 다운로드 시각
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if "last_accessed_at" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN last_accessed_at REAL")
+
+        # 회의가 끝난 방 (유예 시간 후 방 파일 만료)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ended_rooms (
+                room_id TEXT PRIMARY KEY,
+                ended_at REAL NOT NULL
+            )
+        """)
+
+    @contextmanager
+    def transaction(self):
+        """
+        쓰기 잠금 트랜잭션 (여러 워커 간 블롭 저장/삭제 직렬화)
+        같은 연결을 쓰는 스레드(압축, 정리 작업)끼리는 프로세스 내 락으로 직렬화
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def _reader(self) -> sqlite3.Connection:
+        """
+        읽기용 연결 (스레드마다 하나)
+        WAL 모드라 쓰기 트랜잭션을 기다리지 않고 커밋된 내용만 봄
+        (공유 연결로 읽으면 다른 스레드의 커밋 전 변경이 보이거나 커서가 섞임)
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, file_hash: str, encoding: Optional[str] = None) -> Path:
+        """블롭 파일 경로 (압축 저장이면 확장자 포함)"""
+        path = self.blob_dir / file_hash[:2] / file_hash
+        if encoding:
+            path = path.with_name(file_hash + ENCODING_SUFFIX[encoding])
+        return path
+
+    def _to_metadata(self, row: sqlite3.Row) -> dict:
+        return {
+            "file_id": row["file_id"],
+            "filename": row["filename"],
+            "size": row["size"],
+            "hash": row["hash"],
+            "path": str(self.blob_path(row["hash"], row["encoding"])),
+            "encoding": row["encoding"],
+            "stored_size": row["stored_size"] or row["size"],
+            "room_id": row["room_id"],
+            "uploaded_at": row["uploaded_at"]
+        }
+
+    def _select_files(self, where: str, params: tuple,
+                      conn: Optional[sqlite3.Connection] = None) -> List[sqlite3.Row]:
+        return (conn or self._reader()).execute(f"""
+            SELECT f.*, b.encoding, b.stored_size
+            FROM files f JOIN blobs b ON f.hash = b.hash
+            WHERE {where}
+        """, params).fetchall()
+
+    def has_blob(self, file_hash: str) -> bool:
+        row = self._reader().execute("SELECT encoding FROM blobs WHERE hash = ?", (file_hash,)).fetchone()
+        return row is not None and self.blob_path(file_hash, row["encoding"]).exists()
+
+    def blob_location(self, file_hash: str) -> Optional[Tuple[Path, Optional[str]]]:
+        """블롭의 현재 경로와 압축 방식 (없으면 None)"""
+        row = self._reader().execute("SELECT encoding FROM blobs WHERE hash = ?", (file_hash,)).fetchone()
+        if row is None:
+            return None
+        return self.blob_path(file_hash, row["encoding"]), row["encoding"]
+
+    def blob_size(self, file_hash: str) -> Optional[int]:
+        row = self._reader().execute("SELECT size FROM blobs WHERE hash = ?", (file_hash,)).fetchone()
+        return row["size"] if row else None
+
+    def open_blob(self, metadata: dict):
+        """블롭을 원본 바이트로 읽는 스트림 (압축 저장이면 해제하며 읽음)"""
+        return open_decompressed(Path(metadata["path"]), metadata["encoding"])
+
+    def store_blob(self, partial_path: Path, file_hash: str, size: int,
+                   part_size: int, part_hashes: List[str],
+                   filename: str, room_id: Optional[str]) -> Tuple[dict, bool]:
+        """
+        업로드 완료 파일을 블롭으로 등록하고 참조 생성
+        이미 같은 해시가 있으면 임시 파일만 삭제 (중복 제거)
+        블롭 등록과 참조 생성은 한 트랜잭션: 그 사이 다른 워커/정리 작업이 블롭을 지울 수 없음
+        반환값: (참조 메타데이터, 새로 저장했으면 True)
+        """
+        with self.transaction() as conn:
+            exists = conn.execute(
+                "SELECT part_hashes, encoding FROM blobs WHERE hash = ?", (file_hash,)
+            ).fetchone()
+            path = self.blob_path(file_hash)
+            is_new = not (exists and self.blob_path(file_hash, exists["encoding"]).exists())
+            if not is_new:
+                os.remove(partial_path)
+                if exists["part_hashes"] is None:
+                    self._set_parts(conn, file_hash, part_size, part_hashes)
+            else:
+                path.parent.mkdir(exist_ok=True)
+                os.replace(partial_path, path)
+                conn.execute(
+                    "INSERT OR REPLACE INTO blobs (hash, size, created_at) VALUES (?, ?, ?)",
+                    (file_hash, size, time.time())
+                )
+                self._set_parts(conn, file_hash, part_size, part_hashes)
+            file_id = self._insert_reference(conn, file_hash, size, filename, room_id)
+            return self.get(file_id, conn), is_new
+
+    def apply_compression(self, file_hash: str, compressed_path: Path,
+                          encoding: str, stored_size: int) -> bool:
+        """
+        압축본으로 교체 (원본 삭제)
+        그 사이 블롭이 삭제되었거나 이미 압축되었으면 압축본을 버림
+        """
+        with self.transaction() as conn:
+            row = conn.execute("SELECT encoding FROM blobs WHERE hash = ?", (file_hash,)).fetchone()
+            raw_path = self.blob_path(file_hash)
+            if row is None or row["encoding"] is not None or not raw_path.exists():
+                os.remove(compressed_path)
+                return False
+
+            os.replace(compressed_path, self.blob_path(file_hash, encoding))
+            conn.execute(
+                "UPDATE blobs SET encoding = ?, stored_size = ? WHERE hash = ?",
+                (encoding, stored_size, file_hash)
+            )
+
+        # 커밋 후 원본 삭제 (이미 열려 있는 다운로드는 삭제된 원본을 끝까지 읽을 수 있음)
+        try:
+            os.remove(raw_path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _set_parts(self, conn: sqlite3.Connection, file_hash: str,
+                   part_size: int, part_hashes: List[str]):
+        conn.execute(
+            "UPDATE blobs SET part_size = ?, part_hashes = ?, merkle_root = ? WHERE hash = ?",
+            (part_size, json.dumps(part_hashes), merkle_root(part_hashes), file_hash)
+        )
+
+    def set_parts(self, file_hash: str, part_size: int, part_hashes: List[str]):
+        """파트 정보가 없는 블롭(복구된 블롭 등)에 파트 해시 기록"""
+        with self.transaction() as conn:
+            self._set_parts(conn, file_hash, part_size, part_hashes)
+
+    def get_parts(self, file_hash: str) -> Optional[dict]:
+        """블롭의 파트 크기, 파트 해시, 머클 루트 (없으면 None)"""
+        row = self._reader().execute(
+            "SELECT part_size, part_hashes, merkle_root FROM blobs WHERE hash = ?", (file_hash,)
+        ).fetchone()
+        if row is None or row["part_hashes"] is None:
+            return None
+        return {
+            "part_size": row["part_size"],
+            "part_hashes": json.loads(row["part_hashes"]),
+            "merkle_root": row["merkle_root"]
+        }
+
+    def _insert_reference(self, conn: sqlite3.Connection, file_hash: str, size: int,
+                          filename: str, room_id: Optional[str]) -> str:
+        file_id = secrets.token_hex(8)
+        conn.execute("""
+            INSERT INTO files (file_id, filename, size, hash, room_id, uploaded_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (file_id, filename, size, file_hash, room_id, time.time()))
+        return file_id
+
+    def add_reference(self, file_hash: str, filename: str, room_id: Optional[str]) -> dict:
+        """
+        저장된 블롭에 대한 업로드 참조 생성 (해시로 업로드 생략)
+        블롭 확인과 참조 생성은 한 트랜잭션, 블롭이 없으면(디스크 파일 포함) KeyError
+        """
+        with self.transaction() as conn:
+            blob = conn.execute("SELECT size, encoding FROM blobs WHERE hash = ?", (file_hash,)).fetchone()
+            if blob is None or not self.blob_path(file_hash, blob["encoding"]).exists():
+                raise KeyError(file_hash)
+            file_id = self._insert_reference(conn, file_hash, blob["size"], filename, room_id)
+            return self.get(file_id, conn)
+
+    def get(self, file_id: str, conn: Optional[sqlite3.Connection] = None) -> Optional[dict]:
+        """참조 메타데이터 (트랜잭션 안에서는 conn을 넘겨 커밋 전 행도 조회)"""
+        rows = self._select_files("f.file_id = ?", (file_id,), conn)
+        return self._to_metadata(rows[0]) if rows else None
+
+    def list_room(self, room_id: str) -> List[dict]:
+        rows = self._select_files("f.room_id = ? ORDER BY f.uploaded_at", (room_id,))
+        return [self._to_metadata(row) for row in rows]
+
+    def list_by_hash(self, file_hash: str) -> List[dict]:
+        rows = self._select_files("f.hash = ?", (file_hash,))
+        return [self._to_metadata(row) for row in rows]
+
+    def remove_reference(self, file_id: str) -> bool:
+        """
+        업로드 참조 삭제
+        반환값: 참조 수가 0이 되어 블롭까지 삭제했으면 True
+        """
+        with self.transaction() as conn:
+            row = conn.execute("SELECT hash FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            return self._collect_blob(conn, row["hash"])
+
+    def _collect_blob(self, conn: sqlite3.Connection, file_hash: str) -> bool:
+        """참조가 없는 블롭 삭제 (트랜잭션 안에서 호출)"""
+        in_use = conn.execute("SELECT 1 FROM files WHERE hash = ? LIMIT 1", (file_hash,)).fetchone()
+        if in_use:
+            return False
+
+        conn.execute("DELETE FROM blobs WHERE hash = ?", (file_hash,))
+        for encoding in (None, *ENCODING_SUFFIX):
+            path = self.blob_path(file_hash, encoding)
+            if path.exists():
+                os.remove(path)
+        return True
+
+    def touch(self, file_id: str, min_interval: float = 60.0):
+        """다운로드 시각 기록 (잦은 쓰기를 막기 위해 min_interval초마다 한 번)"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE files SET last_accessed_at = ? WHERE file_id = ? AND COALESCE(last_accessed_at, 0) < ?",
+                (now, file_id, now - min_interval)
+            )
+
+    def usage(self) -> dict:
+        """디스크 사용량 (stored_bytes: 실제 저장 크기, logical_bytes: 참조 기준 크기)"""
+        blobs = self._reader().execute(
+            "SELECT COUNT(*) AS count, COALESCE(SUM(COALESCE(stored_size, size)), 0) AS bytes FROM blobs"
+        ).fetchone()
+        files = self._reader().execute(
+            "SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS bytes FROM files"
+        ).fetchone()
+        return {
+            "stored_bytes": blobs["bytes"],
+            "blobs": blobs["count"],
+            "logical_bytes": files["bytes"],
+            "files": files["count"]
+        }
+
+    def room_usage(self) -> Dict[str, int]:
+        """방별 파일 크기 합계 (중복 제거 전 크기 - 방 할당량 기준)"""
+        rows = self._reader().execute(
+            "SELECT room_id, SUM(size) AS bytes FROM files WHERE room_id IS NOT NULL GROUP BY room_id"
+        )
+        return {row["room_id"]: row["bytes"] for row in rows}
+
+    def expired_files(self, uploaded_before: float, limit: int = 500) -> List[str]:
+        """uploaded_before 이전에 올라온 파일 (TTL 만료)"""
+        rows = self._reader().execute(
+            "SELECT file_id FROM files WHERE uploaded_at < ? ORDER BY uploaded_at LIMIT ?",
+            (uploaded_before, limit)
+        )
+        return [row["file_id"] for row in rows]
+
+    def least_recently_used(self, used_before: float, limit: int = 100) -> List[str]:
+        """마지막 사용(다운로드, 없으면 업로드) 시각이 오래된 순서의 파일"""
+        rows = self._reader().execute("""
+            SELECT file_id FROM files
+            WHERE COALESCE(last_accessed_at, uploaded_at) < ?
+            ORDER BY COALESCE(last_accessed_at, uploaded_at)
+            LIMIT ?
+        """, (used_before, limit))
+        return [row["file_id"] for row in rows]
+
+    def unreferenced_blobs(self, created_before: float, limit: int = 500) -> List[str]:
+        """참조가 하나도 없는 블롭 (시작 시 복구된 블롭 등), 오래된 순서"""
+        rows = self._reader().execute("""
+            SELECT hash FROM blobs b
+            WHERE created_at < ? AND NOT EXISTS (SELECT 1 FROM files f WHERE f.hash = b.hash)
+            ORDER BY created_at
+            LIMIT ?
+        """, (created_before, limit))
+        return [row["hash"] for row in rows]
+
+    def collect_blob(self, file_hash: str) -> bool:
+        """참조가 없으면 블롭 삭제 (그 사이 참조가 생겼으면 유지) -> 삭제했으면 True"""
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (file_hash,)).fetchone() is None:
+                return False
+            return self._collect_blob(conn, file_hash)
+
+    def mark_room_ended(self, room_id: str):
+        """회의 종료 기록 (이미 기록되어 있으면 처음 종료 시각 유지)"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO ended_rooms (room_id, ended_at) VALUES (?, ?)",
+                (room_id, time.time())
+            )
+
+    def clear_room_ended(self, room_id: str):
+        """종료 기록 삭제 (참가자가 다시 들어왔거나 방 파일을 모두 정리한 경우)"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM ended_rooms WHERE room_id = ?", (room_id,))
+
+    def ended_rooms(self, ended_before: float) -> List[str]:
+        rows = self._reader().execute(
+            "SELECT room_id FROM ended_rooms WHERE ended_at < ?", (ended_before,)
+        )
+        return [row["room_id"] for row in rows]
+
+    def reconcile(self) -> dict:
+        """
+        시작 시 인덱스와 blobs 디렉토리 대조
+        - 디스크에 없는 블롭의 인덱스/참조 삭제
+        - 인덱스에 없는 블롭은 참조 없는 블롭으로 등록 (해시 사전 확인/link로 재사용 가능,
+          유예 시간 안에 참조되지 않으면 StorageSweeper가 삭제)
+        """
+        on_disk = {}  # (hash, encoding) -> DirEntry
+        for prefix in os.scandir(self.blob_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".tmp"):
+                    # 중단된 압축 작업의 임시 파일
+                    os.remove(entry.path)
+                    continue
+                file_hash, _, suffix = entry.name.partition(".")
+                on_disk[(file_hash, SUFFIX_ENCODING.get("." + suffix) if suffix else None)] = entry
+
+        with self.transaction() as conn:
+            indexed = {(row["hash"], row["encoding"])
+                       for row in conn.execute("SELECT hash, encoding FROM blobs")}
+            indexed_hashes = {file_hash for file_hash, _ in indexed}
+
+            missing = indexed - on_disk.keys()
+            for file_hash, _ in missing:
+                conn.execute("DELETE FROM files WHERE hash = ?", (file_hash,))
+                conn.execute("DELETE FROM blobs WHERE hash = ?", (file_hash,))
+
+            orphaned = {key for key in on_disk.keys() - indexed if key[0] not in indexed_hashes}
+            for file_hash, encoding in orphaned:
+                entry = on_disk[(file_hash, encoding)]
+                size = stored_size = entry.stat().st_size
+                if encoding:
+                    # 압축본은 원본 크기를 알기 위해 한 번 해제하며 읽음
+                    size = 0
+                    with open_decompressed(Path(entry.path), encoding) as f:
+                        while chunk := f.read(1024 * 1024):
+                            size += len(chunk)
+                conn.execute(
+                    "INSERT INTO blobs (hash, size, created_at, encoding, stored_size) VALUES (?, ?, ?, ?, ?)",
+                    (file_hash, size, time.time(), encoding, stored_size)
+                )
+
+            # 압축 교체 도중 남은 원본/압축본 중복 정리
+            for key in on_disk.keys() - indexed - orphaned:
+                os.remove(on_disk[key].path)
+
+        return {
+            "blobs": len(on_disk),
+            "missing": len(missing),
+            "orphaned": len(orphaned)
+        }
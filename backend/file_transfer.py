@@ -4,13 +4,27 @@ VideoNet Pro - P2P 파일 전송 시스템
 """
 
 import os
+import re
+import json
+import time
+import secrets
 import hashlib
 import asyncio
-from typing import Dict, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-import aiofiles
+import threading
+from typing import BinaryIO, Dict, List, Optional, Set
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel
 from pathlib import Path
+from file_storage import BlobStore, StreamHasher, merkle_root
+from file_responses import build_file_response, etag_matches, make_etag
+from file_compression import (
+    ENCODING_SUFFIX, MIN_SAVINGS_RATIO, available_codec, compress_file,
+    guess_content_type, is_compressible
+)
+from file_retention import QuotaExceededError, StorageQuota, StorageSweeper
+from file_previews import PreviewWorkerPool, preview_kind
 
 router = APIRouter(prefix="/api/files", tags=["File Transfer"])
 
@@ -18,17 +32,294 @@ router = APIRouter(prefix="/api/files", tags=["File Transfer"])
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# 파일 메타데이터 저장
-file_metadata: Dict[str, dict] = {}
+# 업로드 중인 파일 (완료 전까지 최종 경로에 쓰지 않음)
+PARTIAL_DIR = UPLOAD_DIR / ".partial"
+PARTIAL_DIR.mkdir(exist_ok=True)
+
+# 서버 읽기/쓰기 청크 크기
+FILE_CHUNK_SIZE = int(os.getenv("FILE_CHUNK_SIZE", str(1024 * 1024)))  # 1MB
+# 이어받기 업로드에서 클라이언트에게 권장하는 청크 크기
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))  # 8MB
+
+# 파트별 해시(머클 트리 잎) 크기 - 일반/이어받기 업로드에 적용
+MERKLE_PART_SIZE = int(os.getenv("MERKLE_PART_SIZE", str(4 * 1024 * 1024)))  # 4MB
+# 멀티파트 업로드 파트 크기 범위
+MIN_PART_SIZE = int(os.getenv("MULTIPART_MIN_PART_SIZE", str(64 * 1024)))  # 64KB
+MAX_PART_SIZE = int(os.getenv("MULTIPART_MAX_PART_SIZE", str(64 * 1024 * 1024)))  # 64MB
+# 순서를 기다리는 파트를 메모리에 보관할 최대 크기 (초과분은 완료 전 디스크에서 한 번 읽음)
+MULTIPART_REORDER_BUFFER = int(os.getenv("MULTIPART_REORDER_BUFFER", str(64 * 1024 * 1024)))
+# 업로드 후 백그라운드 압축 동시 작업 수
+COMPRESSION_WORKERS = int(os.getenv("COMPRESSION_WORKERS", "1"))
+
+# 해시 기반 저장소 (같은 내용은 한 번만 저장, 업로드/방 단위 참조 관리)
+# 메타데이터 인덱스는 SQLite에 저장 (재시작/여러 워커 간 공유)
+FILE_INDEX_DB = os.getenv("FILE_INDEX_DB", str(UPLOAD_DIR / "file_index.db"))
+blob_store = BlobStore(UPLOAD_DIR, Path(FILE_INDEX_DB))
+
+# 세션 정보 없이 남은 임시 업로드 파일 정리 기준 (초)
+STALE_PARTIAL_SECONDS = int(os.getenv("STALE_PARTIAL_SECONDS", str(6 * 60 * 60)))
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# 백그라운드 압축 작업
+compression_slots = asyncio.Semaphore(COMPRESSION_WORKERS)
+background_tasks: Set[asyncio.Task] = set()
+
+# 이어받기 업로드 세션 (upload_id -> 세션 정보)
+upload_sessions: Dict[str, dict] = {}
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# 미리보기(썸네일) 생성 워커 - 내용 해시 기준으로 캐시
+PREVIEW_DIR = UPLOAD_DIR / "previews"
+PREVIEW_CACHE_SECONDS = int(os.getenv("PREVIEW_CACHE_SECONDS", str(24 * 60 * 60)))
+preview_pool = PreviewWorkerPool(PREVIEW_DIR, blob_store.blob_location)
+
+# 저장 공간 할당량 / 주기적 정리 (TTL, 회의 종료, LRU, 멈춘 세션)
+storage_quota = StorageQuota(blob_store, UPLOAD_DIR, PARTIAL_DIR)
+storage_sweeper = StorageSweeper(
+    blob_store, storage_quota, PARTIAL_DIR,
+    on_session_expired=lambda upload_id: upload_sessions.pop(upload_id, None),
+    on_blob_removed=preview_pool.discard
+)
+
+
+class UploadSessionCreate(BaseModel):
+    """이어받기 업로드 세션 생성 요청"""
+    filename: str
+    size: Optional[int] = None  # 전체 크기 (알 수 없으면 생략)
+    room_id: Optional[str] = None
+    hash: Optional[str] = None  # 미리 계산한 SHA256 (이미 저장된 내용이면 업로드 생략)
+    part_size: Optional[int] = None  # 지정하면 병렬 멀티파트 업로드
+
+
+class PartVerifyRequest(BaseModel):
+    """클라이언트가 계산한 파트별 SHA256 (서버의 part_size 기준)"""
+    part_hashes: List[str]
+
+
+class FileLinkRequest(BaseModel):
+    """이미 저장된 내용(해시)을 업로드 없이 참조 등록"""
+    hash: str
+    filename: str
+    room_id: Optional[str] = None
+
+
+@router.on_event("startup")
+async def reconcile_storage():
+    """
+    서버 시작 시 저장소 점검
+    - 파일 인덱스와 blobs 디렉토리 대조
+    - 중단된 일반 업로드의 임시 파일 삭제 (이어받기 세션은 유지)
+    """
+    result = await asyncio.to_thread(blob_store.reconcile)
+
+    removed = 0
+    now = time.time()
+    for entry in os.scandir(PARTIAL_DIR):
+        name = entry.name
+        if not name.endswith(".part"):
+            continue
+        has_session = (PARTIAL_DIR / f"{name[:-len('.part')]}.json").exists()
+        if not has_session and now - entry.stat().st_mtime > STALE_PARTIAL_SECONDS:
+            os.remove(entry.path)
+            removed += 1
+
+    print(f"🗂️ 파일 인덱스 점검: 블롭 {result['blobs']}개, "
+          f"누락 {result['missing']}개 정리, 미등록 {result['orphaned']}개 복구, 임시 파일 {removed}개 삭제")
+    # 첫 할당량 검사가 이벤트 루프에서 집계하지 않도록 미리 집계
+    await asyncio.to_thread(storage_quota.refresh)
+
+    storage_sweeper.start()
+    preview_pool.start()
+
+
+@router.on_event("shutdown")
+async def stop_background_workers():
+    await storage_sweeper.stop()
+    await preview_pool.stop()
+
+
+class HashingFileWriter:
+    """
+    업로드 스트림을 디스크에 쓰면서 SHA256(전체 + 파트별)을 함께 계산
+    - 파일을 다시 읽지 않음 (단일 패스)
+    - 쓰기와 해시 계산은 스레드에서 실행 (이벤트 루프 블로킹 방지)
+    """
+
+    def __init__(self, path: Path, mode: str = 'wb', hasher: Optional[StreamHasher] = None):
+        self.path = path
+        self.mode = mode
+        self.hasher = hasher if hasher is not None else StreamHasher(MERKLE_PART_SIZE)
+        self.size = 0
+        self._file = None
+
+    async def __aenter__(self):
+        self._file = await asyncio.to_thread(open, self.path, self.mode)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.to_thread(self._file.close)
+
+    def _write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+
+    async def write(self, chunk: bytes):
+        await asyncio.to_thread(self._write, chunk)
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+class HashingSink:
+    """
+    업로드 스트림의 SHA256만 계산하는 sink (디스크/메모리에 모으지 않음)
+    - 조각의 해시는 스레드에서 계산하고 기다리지 않고 반환 (다음 조각 수신과 겹침)
+    - 계산 중인 조각은 최대 1개 (다음 write에서 이전 계산을 기다림)
+    """
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self._pending: Optional[asyncio.Future] = None
+
+    async def __aenter__(self):
+        return self
 
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._wait()
 
-def calculate_file_hash(file_path: str) -> str:
-    """파일의 SHA256 해시 계산 (무결성 검증용)"""
-    sha256 = hashlib.sha256()
+    async def _wait(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+
+    async def write(self, chunk: bytes):
+        await self._wait()
+        # hashlib은 큰 입력을 해시하는 동안 GIL을 놓으므로 이벤트 루프와 동시에 진행
+        self._pending = asyncio.ensure_future(asyncio.to_thread(self.sha256.update, chunk))
+        self.size += len(chunk)
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+
+def hash_stream(reader: BinaryIO, length: int, part_size: int = MERKLE_PART_SIZE) -> StreamHasher:
+    """스트림 앞부분 length 바이트의 해시 상태"""
+    hasher = StreamHasher(part_size)
+    remaining = length
+    while remaining > 0 and (chunk := reader.read(min(FILE_CHUNK_SIZE, remaining))):
+        hasher.update(chunk)
+        remaining -= len(chunk)
+    return hasher
+
+
+def hash_file_prefix(file_path: Path, length: int, part_size: int = MERKLE_PART_SIZE) -> StreamHasher:
+    """파일 앞부분 length 바이트의 해시 상태 (이어받기 세션 복원용)"""
     with open(file_path, 'rb') as f:
-        while chunk := f.read(8192):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+        return hash_stream(f, length, part_size)
+
+
+def file_response(metadata: dict, message: str) -> dict:
+    return {
+        "file_id": metadata["file_id"],
+        "filename": metadata["filename"],
+        "size": metadata["size"],
+        "hash": metadata["hash"],
+        "message": message
+    }
+
+
+def quota_error(error: QuotaExceededError) -> HTTPException:
+    return HTTPException(status_code=error.status_code, detail=error.detail())
+
+
+def get_file_or_404(file_id: str) -> dict:
+    metadata = blob_store.get(file_id)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다")
+    return metadata
+
+
+def link_existing(file_hash: str, filename: str, room_id: Optional[str]) -> Optional[dict]:
+    """이미 저장된 내용이면 업로드 없이 참조 등록 (없으면 None)"""
+    file_hash = file_hash.lower()
+    if not SHA256_PATTERN.match(file_hash) or not blob_store.has_blob(file_hash):
+        return None
+    # 디스크는 더 쓰지 않지만 방 할당량에는 포함
+    try:
+        storage_quota.check(room_id, blob_store.blob_size(file_hash) or 0, stored=False)
+    except QuotaExceededError as e:
+        raise quota_error(e)
+    try:
+        metadata = blob_store.add_reference(file_hash, Path(filename).name, room_id)
+    except KeyError:
+        # 확인 직후 다른 요청이 마지막 참조를 삭제한 경우 (참조는 만들지 않음, 업로드 필요)
+        return None
+    storage_quota.invalidate()
+    preview_pool.submit(file_hash, metadata["filename"])
+    return {
+        **file_response(metadata, "파일이 성공적으로 업로드되었습니다"),
+        "deduplicated": True
+    }
+
+
+async def compress_blob(file_hash: str, size: int):
+    """
+    새로 저장된 블롭을 압축본으로 교체 (백그라운드)
+    충분히 줄어들지 않으면 원본 유지
+    """
+    async with compression_slots:
+        codec = available_codec()
+        raw_path = blob_store.blob_path(file_hash)
+        tmp_path = raw_path.with_name(raw_path.name + ENCODING_SUFFIX[codec] + ".tmp")
+        try:
+            started = time.time()
+            stored_size = await asyncio.to_thread(compress_file, raw_path, tmp_path, codec)
+            if stored_size > size * (1 - MIN_SAVINGS_RATIO):
+                tmp_path.unlink()
+                return
+            if await asyncio.to_thread(blob_store.apply_compression, file_hash, tmp_path, codec, stored_size):
+                print(f"🗜️ 압축 저장 ({codec}): {file_hash[:16]} {size} -> {stored_size} 바이트 "
+                      f"({1 - stored_size / size:.0%} 절감, {time.time() - started:.2f}초)")
+        except FileNotFoundError:
+            # 압축 전에 삭제된 블롭
+            if tmp_path.exists():
+                tmp_path.unlink()
+        except Exception as e:
+            print(f"⚠️ 압축 실패: {file_hash[:16]} ({e})")
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+
+def schedule_compression(file_hash: str, filename: str, size: int):
+    """압축 효과가 큰 파일이면 백그라운드 압축 예약 (업로드 응답은 기다리지 않음)"""
+    if not is_compressible(filename, size):
+        return
+    task = asyncio.get_running_loop().create_task(compress_blob(file_hash, size))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+def commit_upload(partial_path: Path, filename: str, size: int, file_hash: str,
+                  part_size: int, part_hashes: List[str], room_id: Optional[str]) -> dict:
+    """완료된 업로드를 해시 저장소에 등록하고 참조 생성"""
+    metadata, is_new = blob_store.store_blob(
+        partial_path, file_hash, size, part_size, part_hashes, Path(filename).name, room_id
+    )
+    storage_quota.invalidate()
+    if is_new:
+        schedule_compression(file_hash, metadata["filename"], size)
+    # 미리보기는 큐에만 넣고 기다리지 않음 (큐가 가득 차면 첫 조회 때 다시 예약)
+    preview_pool.submit(file_hash, metadata["filename"])
+    # 중복 업로드면 기존 블롭의 파트 기준 머클 루트
+    parts = blob_store.get_parts(file_hash)
+
+    return {
+        **file_response(metadata, "파일이 성공적으로 업로드되었습니다"),
+        "merkle_root": parts["merkle_root"] if parts else merkle_root(part_hashes),
+        "deduplicated": not is_new
+    }
 
 
 @router.post("/upload")
@@ -40,77 +331,570 @@ async def upload_file(
     파일 업로드 (청크 기반)
     - 무손실 전송
     - 해시 검증
+    - 크기/할당량은 UploadLimitMiddleware가 본문을 받는 중에 검사
     """
+    # 완료 전까지는 임시 경로에 기록 (중단 시 반쪽 파일이 남지 않도록)
+    partial_path = PARTIAL_DIR / f"{secrets.token_hex(16)}.part"
+
     try:
-        # 파일 저장 경로
-        file_path = UPLOAD_DIR / file.filename
-
-        # 파일 크기 추적
-        total_size = 0
-
-        # 청크 단위로 파일 저장
-        async with aiofiles.open(file_path, 'wb') as f:
-            while chunk := await file.read(8192):  # 8KB 청크
-                await f.write(chunk)
-                total_size += len(chunk)
-
-        # 파일 해시 계산
-        file_hash = calculate_file_hash(str(file_path))
-
-        # 메타데이터 저장
-        file_id = file_hash[:16]  # 짧은 ID 생성
-        file_metadata[file_id] = {
-            "filename": file.filename,
-            "size": total_size,
-            "hash": file_hash,
-            "path": str(file_path),
-            "room_id": room_id
-        }
+        # 청크 단위로 저장하면서 해시 계산 (저장 후 다시 읽지 않음)
+        async with HashingFileWriter(partial_path) as writer:
+            while chunk := await file.read(FILE_CHUNK_SIZE):
+                await writer.write(chunk)
 
-        return {
-            "file_id": file_id,
-            "filename": file.filename,
-            "size": total_size,
-            "hash": file_hash,
-            "message": "파일이 성공적으로 업로드되었습니다"
-        }
+        return commit_upload(
+            partial_path, file.filename, writer.size, writer.hexdigest(),
+            MERKLE_PART_SIZE, writer.hasher.finish_parts(), room_id
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"파일 업로드 실패: {str(e)}")
 
+    finally:
+        if partial_path.exists():
+            partial_path.unlink()
+
+
+# ===== 이어받기(Resumable) 업로드 =====
+# 1) POST   /uploads                     세션 생성
+# 2) PUT    /uploads/{upload_id}?offset=N 청크 전송 (raw body)
+# 3) GET    /uploads/{upload_id}          확정된 offset 조회 (끊긴 뒤 재개 지점)
+# 4) POST   /uploads/{upload_id}/complete 최종 확정
+#
+# 병렬 멀티파트 모드 (세션 생성 시 part_size 지정)
+# 2') PUT   /uploads/{upload_id}/parts/{index}  파트 전송 (순서 무관, 동시 전송 가능)
+#           X-Part-SHA256 헤더가 있으면 도착 즉시 검증
+
+# 디스크에 저장하는 세션 정보 (락, 해시 상태 등 실행 중 정보는 제외)
+SESSION_FIELDS = ("upload_id", "filename", "size", "room_id", "created_at",
+                  "mode", "part_size", "part_count", "parts")
+
+
+def _session_paths(upload_id: str):
+    return PARTIAL_DIR / f"{upload_id}.part", PARTIAL_DIR / f"{upload_id}.json"
+
+
+def _session_snapshot(session: dict) -> dict:
+    """디스크에 저장할 세션 정보 사본 (이벤트 루프에서 만들어 스레드로 전달)"""
+    data = {key: session[key] for key in SESSION_FIELDS if key in session}
+    if "parts" in data:
+        data["parts"] = dict(data["parts"])
+    return data
+
+
+def _write_session(upload_id: str, data: dict):
+    _, info_path = _session_paths(upload_id)
+    tmp_path = info_path.with_suffix(".json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, info_path)
+
+
+def _save_session(session: dict):
+    _write_session(session["upload_id"], _session_snapshot(session))
+
 
-@router.get("/download/{file_id}")
-async def download_file(file_id: str):
+async def _save_session_async(session: dict):
+    """
+    세션 정보를 스레드에서 저장
+    같은 세션의 파트가 동시에 도착하므로 세션별 잠금으로 한 번에 하나씩 기록하고
+    더 최신 사본이 이미 기록되었으면 건너뜀 (오래된 사본이 덮어쓰지 않도록)
+    """
+    data = _session_snapshot(session)
+    session["save_seq"] += 1
+    seq = session["save_seq"]
+
+    def write():
+        with session["save_lock"]:
+            if seq <= session["saved_seq"]:
+                return
+            _write_session(session["upload_id"], data)
+            session["saved_seq"] = seq
+
+    await asyncio.to_thread(write)
+
+
+def _init_session_state(session: dict, restored: bool) -> dict:
+    """
+    실행 중 상태 초기화
+    - 복원된 세션은 해시 상태가 없으므로 완료 시 디스크에서 다시 계산
+    """
+    session["lock"] = asyncio.Lock()
+    session["save_lock"] = threading.Lock()  # 세션 정보 파일 기록 (스레드)
+    session["save_seq"] = session["saved_seq"] = 0
+    if session.get("mode") == "multipart":
+        session["hasher"] = None if restored else hashlib.sha256()
+        session["hashed_parts"] = 0  # 전체 해시에 반영된 앞쪽 파트 수
+        session["pending"] = {}      # 순서를 기다리는 파트 (index -> bytes, 버퍼 초과 시 None)
+        session["pending_bytes"] = 0
+    return session
+
+
+def get_upload_session(upload_id: str) -> dict:
+    """업로드 세션 조회 (서버 재시작 후에는 디스크의 세션 정보에서 복원)"""
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise HTTPException(status_code=404, detail="업로드 세션을 찾을 수 없습니다")
+
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        data_path, info_path = _session_paths(upload_id)
+        if not info_path.exists() or not data_path.exists():
+            raise HTTPException(status_code=404, detail="업로드 세션을 찾을 수 없습니다")
+        with open(info_path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        upload_sessions[upload_id] = _init_session_state(session, restored=True)
+
+    return session
+
+
+def committed_offset(upload_id: str) -> int:
+    """디스크에 기록된 바이트 수 = 확정된 offset"""
+    data_path, _ = _session_paths(upload_id)
+    return data_path.stat().st_size
+
+
+def part_length(session: dict, index: int) -> int:
+    start = index * session["part_size"]
+    return min(session["part_size"], session["size"] - start)
+
+
+def missing_parts(session: dict) -> List[int]:
+    return [i for i in range(session["part_count"]) if str(i) not in session["parts"]]
+
+
+def _write_at(path: Path, offset: int, data: bytes):
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+
+
+def _read_at(path: Path, offset: int, length: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+@router.post("/uploads")
+async def create_upload_session(request: UploadSessionCreate):
+    """
+    이어받기 업로드 세션 생성
+    - hash가 이미 저장된 내용이면 세션 없이 바로 참조 등록 (completed=True)
+    - part_size를 지정하면 병렬 멀티파트 모드 (size 필수)
+    - 크기를 선언하면 할당량을 미리 확인 (첫 바이트를 받기 전에 거절)
+    """
+    if request.size is not None and request.size < 0:
+        raise HTTPException(status_code=400, detail="잘못된 파일 크기입니다")
+
+    if request.hash:
+        linked = link_existing(request.hash, request.filename, request.room_id)
+        if linked is not None:
+            return {**linked, "completed": True}
+
+    if request.size is not None:
+        try:
+            storage_quota.check_file_size(request.size)
+            storage_quota.check(request.room_id, request.size)
+        except QuotaExceededError as e:
+            raise quota_error(e)
+
+    upload_id = secrets.token_hex(16)
+    data_path, _ = _session_paths(upload_id)
+
+    session = {
+        "upload_id": upload_id,
+        "filename": Path(request.filename).name,
+        "size": request.size,
+        "room_id": request.room_id,
+        "created_at": time.time(),
+        "mode": "stream"
+    }
+
+    if request.part_size is not None:
+        if not request.size:
+            raise HTTPException(status_code=400, detail="멀티파트 업로드에는 파일 크기가 필요합니다")
+        if not MIN_PART_SIZE <= request.part_size <= MAX_PART_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"파트 크기는 {MIN_PART_SIZE}~{MAX_PART_SIZE} 바이트여야 합니다"
+            )
+        session.update({
+            "mode": "multipart",
+            "part_size": request.part_size,
+            "part_count": -(-request.size // request.part_size),
+            "parts": {}  # index -> 검증된 파트 SHA256
+        })
+
+    # 멀티파트는 최종 크기로 미리 할당해 두고 각 파트를 제자리에 기록
+    with open(data_path, 'wb') as f:
+        if session["mode"] == "multipart":
+            f.truncate(request.size)
+    _save_session(session)
+    upload_sessions[upload_id] = _init_session_state(session, restored=False)
+    # 선언 크기만큼 사용 중으로 집계 (다음 집계 전에 들어오는 요청도 포함하도록)
+    storage_quota.add_pending(upload_id, session["room_id"], session["size"] or 0)
+
+    response = {
+        "upload_id": upload_id,
+        "offset": 0,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "completed": False
+    }
+    if session["mode"] == "multipart":
+        response.update({"part_size": session["part_size"], "part_count": session["part_count"]})
+    return response
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_status(upload_id: str):
+    """확정된 offset 조회 (멀티파트는 아직 받지 않은 파트 목록)"""
+    session = get_upload_session(upload_id)
+    if session.get("mode") == "multipart":
+        return {
+            "upload_id": upload_id,
+            "filename": session["filename"],
+            "size": session["size"],
+            "part_size": session["part_size"],
+            "part_count": session["part_count"],
+            "received_parts": len(session["parts"]),
+            "missing_parts": missing_parts(session)
+        }
+
+    return {
+        "upload_id": upload_id,
+        "filename": session["filename"],
+        "size": session["size"],
+        "offset": committed_offset(upload_id),
+        "chunk_size": UPLOAD_CHUNK_SIZE
+    }
+
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    청크 업로드
+    - offset은 현재 확정된 offset과 같아야 함 (다르면 409 + 현재 offset)
+    - 전송 중 연결이 끊겨도 이미 기록된 바이트는 유지됨
+    - 크기를 선언하지 않은 세션은 청크를 기록하기 전에 할당량 확인
+    """
+    session = get_upload_session(upload_id)
+    if session.get("mode") == "multipart":
+        raise HTTPException(status_code=400, detail="멀티파트 세션은 /parts/{index}로 업로드하세요")
+    data_path, _ = _session_paths(upload_id)
+
+    async with session["lock"]:
+        _check_not_completing(session)
+        current = committed_offset(upload_id)
+        if offset != current:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "offset이 일치하지 않습니다", "offset": current}
+            )
+
+        # 재시작 등으로 해시 상태가 없으면 기록된 앞부분으로 복원
+        hasher = session.get("hasher")
+        if hasher is None:
+            hasher = await asyncio.to_thread(hash_file_prefix, data_path, current)
+
+        # 해시 상태는 정상적으로 기록된 바이트와 일치할 때만 세션에 유지
+        session.pop("hasher", None)
+        unknown_size = session["size"] is None
+        if unknown_size:
+            storage_quota.begin(upload_id, session["room_id"], current)
+        try:
+            async with HashingFileWriter(data_path, 'ab', hasher) as writer:
+                async for chunk in request.stream():
+                    if not chunk:
+                        continue
+                    if unknown_size:
+                        storage_quota.reserve(upload_id, len(chunk))
+                    elif current + writer.size + len(chunk) > session["size"]:
+                        raise HTTPException(status_code=413, detail="선언한 파일 크기를 초과했습니다")
+                    await writer.write(chunk)
+        except ClientDisconnect:
+            # 끊기기 전까지 받은 바이트는 유지 (다음 PUT에서 이어서 전송)
+            pass
+        except QuotaExceededError as e:
+            session["hasher"] = writer.hasher
+            raise quota_error(e)
+        finally:
+            if unknown_size:
+                storage_quota.release(upload_id)
+        session["hasher"] = writer.hasher
+
+    return {
+        "upload_id": upload_id,
+        "offset": current + writer.size
+    }
+
+
+def _check_not_completing(session: dict):
+    """완료 처리 중이거나 완료된 세션에는 더 기록하지 않음 (세션 잠금 안에서 호출)"""
+    if session.get("completing") or session["upload_id"] not in upload_sessions:
+        raise HTTPException(status_code=409, detail="이미 완료 처리 중이거나 완료된 업로드입니다")
+
+
+async def _advance_multipart_hash(session: dict, index: int, data: bytes, changed: bool):
+    """
+    도착한 파트를 순서대로 전체 SHA256에 반영 (세션 잠금 안에서 호출)
+    - 앞 파트를 기다리는 파트는 버퍼에 보관 (버퍼 초과분만 나중에 디스크에서 읽음)
+    """
+    if session["hasher"] is None:
+        return
+    if index < session["hashed_parts"]:
+        # 이미 반영된 파트가 다른 내용으로 다시 올라오면 완료 시 전체 재계산
+        if changed:
+            session["hasher"] = None
+        return
+
+    pending = session["pending"]
+    previous = pending.pop(index, None)
+    if previous is not None:
+        session["pending_bytes"] -= len(previous)
+    if session["pending_bytes"] + len(data) <= MULTIPART_REORDER_BUFFER:
+        pending[index] = data
+        session["pending_bytes"] += len(data)
+    else:
+        pending[index] = None
+
+    data_path, _ = _session_paths(session["upload_id"])
+    while session["hashed_parts"] in pending:
+        next_index = session["hashed_parts"]
+        chunk = pending.pop(next_index)
+        if chunk is None:
+            chunk = await asyncio.to_thread(
+                _read_at, data_path, next_index * session["part_size"], part_length(session, next_index)
+            )
+        else:
+            session["pending_bytes"] -= len(chunk)
+        await asyncio.to_thread(session["hasher"].update, chunk)
+        session["hashed_parts"] += 1
+
+
+@router.put("/uploads/{upload_id}/parts/{index}")
+async def upload_part(upload_id: str, index: int, request: Request):
+    """
+    멀티파트 파트 업로드 (병렬 전송 가능)
+    - 도착한 파트의 SHA256을 즉시 계산/검증 (X-Part-SHA256 불일치 시 422, 기록하지 않음)
+    - 파트는 최종 파일의 제 위치에 바로 기록 (완료 시 재조립/재읽기 없음)
+    """
+    session = get_upload_session(upload_id)
+    if session.get("mode") != "multipart":
+        raise HTTPException(status_code=400, detail="멀티파트 세션이 아닙니다")
+    if not 0 <= index < session["part_count"]:
+        raise HTTPException(status_code=400, detail="잘못된 파트 번호입니다")
+
+    expected = part_length(session, index)
+    data = bytearray()
+    async for chunk in request.stream():
+        if len(data) + len(chunk) > expected:
+            raise HTTPException(status_code=413, detail="파트 크기를 초과했습니다")
+        data.extend(chunk)
+    if len(data) != expected:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "파트 크기가 일치하지 않습니다", "expected": expected, "received": len(data)}
+        )
+    data = bytes(data)
+
+    part_hash = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+    client_hash = request.headers.get("x-part-sha256")
+    if client_hash and client_hash.lower() != part_hash:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "파트 해시가 일치하지 않습니다", "index": index, "server_hash": part_hash}
+        )
+
+    # 기록/파트 목록 갱신은 완료 처리와 같은 잠금 안에서 (완료 중 파일이 바뀌지 않도록)
+    data_path, _ = _session_paths(upload_id)
+    async with session["lock"]:
+        _check_not_completing(session)
+        await asyncio.to_thread(_write_at, data_path, index * session["part_size"], data)
+
+        previous = session["parts"].get(str(index))
+        session["parts"][str(index)] = part_hash
+        await _save_session_async(session)
+        await _advance_multipart_hash(session, index, data, changed=previous not in (None, part_hash))
+
+    return {
+        "upload_id": upload_id,
+        "index": index,
+        "hash": part_hash,
+        "received_parts": len(session["parts"]),
+        "part_count": session["part_count"]
+    }
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """업로드 완료 처리 (해시 계산 및 메타데이터 등록)"""
+    session = get_upload_session(upload_id)
+    data_path, info_path = _session_paths(upload_id)
+
+    async with session["lock"]:
+        _check_not_completing(session)
+        total_size = committed_offset(upload_id)
+        if session.get("mode") == "multipart":
+            missing = missing_parts(session)
+            if missing:
+                raise HTTPException(
+                    status_code=409,
+                    detail={"message": "아직 모든 파트가 업로드되지 않았습니다", "missing_parts": missing}
+                )
+            part_size = session["part_size"]
+            part_hashes = [session["parts"][str(i)] for i in range(session["part_count"])]
+
+            if session["hasher"] is not None and session["hashed_parts"] == session["part_count"]:
+                file_hash = session["hasher"].hexdigest()
+            else:
+                # 재시작 후 복원된 세션: 디스크에서 다시 계산하며 파트 해시도 재확인
+                hasher = await asyncio.to_thread(hash_file_prefix, data_path, total_size, part_size)
+                if hasher.finish_parts() != part_hashes:
+                    raise HTTPException(status_code=500, detail="저장된 파트가 손상되었습니다")
+                file_hash = hasher.hexdigest()
+        else:
+            if session["size"] is not None and total_size != session["size"]:
+                raise HTTPException(
+                    status_code=409,
+                    detail={"message": "아직 모든 청크가 업로드되지 않았습니다", "offset": total_size}
+                )
+
+            hasher = session.get("hasher")
+            if hasher is None:
+                hasher = await asyncio.to_thread(hash_file_prefix, data_path, total_size)
+            file_hash = hasher.hexdigest()
+            part_size, part_hashes = MERKLE_PART_SIZE, hasher.finish_parts()
+
+        # 이후 도착하는 파트/청크는 409 (잠금을 기다리던 요청 포함)
+        session["completing"] = True
+        try:
+            result = commit_upload(
+                data_path, session["filename"], total_size, file_hash,
+                part_size, part_hashes, session["room_id"]
+            )
+        except Exception as e:
+            session["completing"] = False
+            raise HTTPException(status_code=500, detail=f"파일 업로드 실패: {str(e)}")
+
+        upload_sessions.pop(upload_id, None)
+        if info_path.exists():
+            info_path.unlink()
+
+    return result
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """업로드 세션 취소"""
+    get_upload_session(upload_id)
+    upload_sessions.pop(upload_id, None)
+
+    for path in _session_paths(upload_id):
+        if path.exists():
+            path.unlink()
+    storage_quota.invalidate()
+
+    return {"message": "업로드가 취소되었습니다"}
+
+
+@router.get("/exists/{file_hash}")
+async def check_file_exists(file_hash: str):
+    """
+    해시 사전 확인
+    - 이미 저장된 내용이면 업로드 없이 /link로 참조만 등록 가능
+    """
+    file_hash = file_hash.lower()
+    return {
+        "hash": file_hash,
+        "exists": bool(SHA256_PATTERN.match(file_hash)) and blob_store.has_blob(file_hash)
+    }
+
+
+@router.post("/link")
+async def link_file(request: FileLinkRequest):
+    """이미 저장된 내용을 업로드 없이 새 파일(참조)로 등록"""
+    linked = link_existing(request.hash, request.filename, request.room_id)
+    if linked is None:
+        raise HTTPException(status_code=404, detail="저장된 파일 내용이 없습니다. 업로드가 필요합니다")
+    return linked
+
+
+@router.get("/room/{room_id}")
+async def list_room_files(room_id: str):
+    """방에 공유된 파일 목록"""
+    files = blob_store.list_room(room_id)
+    return {
+        "room_id": room_id,
+        "files": files,
+        "count": len(files)
+    }
+
+
+@router.api_route("/download/{file_id}", methods=["GET", "HEAD"])
+async def download_file(file_id: str, request: Request):
     """
     파일 다운로드
     - 무손실 전송 보장
+    - Range 요청으로 끊긴 다운로드 이어받기 (206)
+    - SHA256 기반 ETag로 재다운로드 생략 (304)
+    - 압축 저장된 파일은 Accept-Encoding에 따라 압축본 그대로 또는 해제하며 전송
     """
-    if file_id not in file_metadata:
-        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다")
-
-    metadata = file_metadata[file_id]
+    metadata = get_file_or_404(file_id)
     file_path = metadata["path"]
 
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="파일이 존재하지 않습니다")
-
-    return FileResponse(
-        file_path,
-        filename=metadata["filename"],
-        media_type="application/octet-stream"
+    if request.method == "GET":
+        # LRU 정리 기준 (최근에 받은 파일은 용량 부족 시에도 나중에 삭제)
+        await asyncio.to_thread(blob_store.touch, file_id)
+
+    return build_file_response(
+        request, file_path, metadata["size"], metadata["hash"], metadata["filename"],
+        media_type=guess_content_type(metadata["filename"]),
+        encoding=metadata["encoding"], stored_size=metadata["stored_size"]
     )
 
 
+@router.get("/preview/{file_id}")
+async def get_file_preview(file_id: str, request: Request):
+    """
+    미리보기 이미지 (JPEG)
+    - 이미지 썸네일, 동영상 대표 프레임, PDF 첫 페이지
+    - 아직 생성 중이면 202 + Retry-After (큐가 가득 차면 503)
+    - 내용 해시 기반 ETag로 캐시 (304)
+    """
+    metadata = get_file_or_404(file_id)
+    file_hash = metadata["hash"]
+    status = preview_pool.status(file_hash)
+
+    if status == "ready":
+        headers = {
+            "ETag": make_etag(file_hash, "preview"),
+            "Cache-Control": f"public, max-age={PREVIEW_CACHE_SECONDS}"
+        }
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(preview_pool.preview_path(file_hash), media_type="image/jpeg", headers=headers)
+
+    if status == "unsupported" or preview_kind(metadata["filename"]) is None:
+        raise HTTPException(status_code=404, detail="미리보기를 지원하지 않는 파일입니다")
+
+    if status == "missing" and not preview_pool.submit(file_hash, metadata["filename"]):
+        raise HTTPException(status_code=503, detail="미리보기 생성 대기열이 가득 찼습니다",
+                            headers={"Retry-After": "5"})
+
+    return JSONResponse({"file_id": file_id, "status": "pending"}, status_code=202,
+                        headers={"Retry-After": "1"})
+
+
 @router.get("/verify/{file_id}")
 async def verify_file(file_id: str, client_hash: str):
     """
     파일 무결성 검증
     - 클라이언트 해시와 서버 해시 비교
     """
-    if file_id not in file_metadata:
-        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다")
-
-    metadata = file_metadata[file_id]
+    metadata = get_file_or_404(file_id)
     server_hash = metadata["hash"]
 
     is_valid = (client_hash == server_hash)
@@ -125,29 +909,104 @@ async def verify_file(file_id: str, client_hash: str):
     }
 
 
+async def get_blob_parts(metadata: dict) -> dict:
+    """파일의 파트 해시 정보 (복구된 블롭처럼 없으면 한 번 계산해서 저장)"""
+    parts = blob_store.get_parts(metadata["hash"])
+    if parts is None:
+        def compute():
+            with blob_store.open_blob(metadata) as reader:
+                return hash_stream(reader, metadata["size"], MERKLE_PART_SIZE)
+
+        hasher = await asyncio.to_thread(compute)
+        blob_store.set_parts(metadata["hash"], MERKLE_PART_SIZE, hasher.finish_parts())
+        parts = blob_store.get_parts(metadata["hash"])
+    return parts
+
+
+@router.get("/parts/{file_id}")
+async def get_file_parts(file_id: str):
+    """
+    파트별 SHA256과 머클 루트 조회
+    - 수신 측은 같은 part_size로 파트 해시를 계산해 손상된 구간만 다시 받을 수 있음
+    """
+    metadata = get_file_or_404(file_id)
+    parts = await get_blob_parts(metadata)
+    return {
+        "file_id": file_id,
+        "size": metadata["size"],
+        "part_size": parts["part_size"],
+        "part_count": len(parts["part_hashes"]),
+        "part_hashes": parts["part_hashes"],
+        "merkle_root": parts["merkle_root"]
+    }
+
+
+@router.post("/verify/{file_id}/parts")
+async def verify_file_parts(file_id: str, request: PartVerifyRequest):
+    """
+    파트 단위 무결성 검증
+    - 머클 루트 비교 후 불일치 파트와 바이트 범위 반환
+    - 반환된 범위는 /download에 Range 헤더로 그대로 다시 요청 가능
+    """
+    metadata = get_file_or_404(file_id)
+    parts = await get_blob_parts(metadata)
+    server_parts = parts["part_hashes"]
+    client_parts = [h.lower() for h in request.part_hashes]
+    part_size, size = parts["part_size"], metadata["size"]
+
+    bad_parts = []
+    for index, server_hash in enumerate(server_parts):
+        if index >= len(client_parts) or client_parts[index] != server_hash:
+            start = index * part_size
+            end = max(start, min(size, start + part_size) - 1)
+            bad_parts.append({"index": index, "start": start, "end": end, "range": f"bytes={start}-{end}"})
+
+    client_root = merkle_root(client_parts) if client_parts else None
+    is_valid = client_root == parts["merkle_root"] and len(client_parts) == len(server_parts)
+
+    return {
+        "file_id": file_id,
+        "is_valid": is_valid,
+        "merkle_root": parts["merkle_root"],
+        "client_merkle_root": client_root,
+        "part_size": part_size,
+        "part_count": len(server_parts),
+        "bad_parts": bad_parts,
+        "message": "파일이 정상적으로 전송되었습니다" if is_valid
+                   else f"손상된 파트 {len(bad_parts)}개를 다시 받아야 합니다"
+    }
+
+
 @router.get("/metadata/{file_id}")
 async def get_file_metadata(file_id: str):
     """파일 메타데이터 조회"""
-    if file_id not in file_metadata:
-        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다")
-
-    return file_metadata[file_id]
+    return get_file_or_404(file_id)
 
 
 @router.delete("/delete/{file_id}")
 async def delete_file(file_id: str):
-    """파일 삭제"""
-    if file_id not in file_metadata:
-        raise HTTPException(status_code=404, detail="파일을 찾을 수 없습니다")
-
-    metadata = file_metadata[file_id]
-    file_path = metadata["path"]
+    """
+    파일 삭제
+    - 참조만 삭제하고, 더 이상 참조가 없을 때 실제 내용 삭제
+    """
+    metadata = get_file_or_404(file_id)
+    blob_deleted = blob_store.remove_reference(file_id)
+    storage_quota.invalidate()
+    if blob_deleted:
+        preview_pool.discard(metadata["hash"])
 
-    # 파일 삭제
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    return {
+        "message": "파일이 삭제되었습니다",
+        "blob_deleted": blob_deleted
+    }
 
-    # 메타데이터 삭제
-    del file_metadata[file_id]
 
-    return {"message": "파일이 삭제되었습니다"}
+@router.get("/storage")
+async def get_storage_metrics():
+    """
+    디스크 사용량 지표
+    - 저장/임시 파일 사용량, 할당량, 디스크 여유 공간, 사용량 상위 방
+    - 정리 작업 통계 (TTL/회의 종료/LRU/멈춘 세션 삭제 수, 확보한 바이트)
+    """
+    metrics = await asyncio.to_thread(storage_quota.metrics)
+    return {**metrics, "sweeper": storage_sweeper.stats, "previews": preview_pool.stats()}
@@ -0,0 +1,305 @@
+"""
+동영상 프레임 추출 엔진 (OpenCV)
+샘플링할 프레임마다 가장 싼 방법을 골라 디코딩 횟수를 줄입니다
+
+OpenCV(FFmpeg 백엔드)의 프레임 탐색 비용
+- cap.set(POS_FRAMES, t)는 (t - 16) 이전의 키프레임으로 이동한 뒤 t까지 디코딩
+  -> 비용 = t - 키프레임 + 1 프레임 (긴 GOP 코덱에서는 탐색마다 수백 프레임)
+- 키프레임 + 16 위치는 17프레임만 디코딩하면 되므로 가장 싼 탐색 위치
+- grab()은 다음 프레임을 디코딩만 하고 retrieve()에서만 이미지로 변환
+
+전략
+- seek: 목표 프레임마다 정확히 탐색 (기존 방식)
+- sequential: 처음부터 grab()으로 한 번 훑으며 목표 프레임만 retrieve()
+- keyframe: 허용 범위 안의 "키프레임 + 16" 위치로 옮겨 탐색
+- auto: 키프레임 목록(디코딩 없이 패킷만 읽음)으로 목표마다
+        앞으로 grab / 정확한 탐색 / 키프레임 정렬 탐색 중 가장 싼 방법 선택
+
+장면 전환 기반 선택 (select_scene_frames)
+- 균등 간격 대신 한 번의 디코딩 패스에서 장면이 바뀌는 프레임을 골라 개수 제한 안에서 반환
+
+거의 같은 프레임 묶기 (dhash, group_near_duplicates)
+- 64비트 차이 해시(dHash)의 해밍 거리로 비교, 대표 프레임 하나만 분석
+"""
+
+import bisect
+import heapq
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+STRATEGIES = ("auto", "seek", "sequential", "keyframe")
+SELECTIONS = ("uniform", "scene")
+# 장면 비교 시 "바뀐 픽셀"로 보는 밝기 차이 (카메라 노이즈/압축 잡음 무시)
+SCENE_PIXEL_DELTA = 25
+
+# OpenCV가 탐색 시 목표보다 앞에서 시작하는 프레임 수 (cap_ffmpeg_impl.hpp의 delta)
+SEEK_PREROLL_FRAMES = 16
+# 탐색 자체의 고정 비용 (디코더 초기화 등, 디코딩 프레임 수로 환산)
+SEEK_OVERHEAD_FRAMES = 2
+
+
+def probe_video(video_path: str) -> dict:
+    """동영상 기본 정보 (디코딩 없이 컨테이너 정보만 읽음)"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        return {
+            "fps": fps,
+            "frame_count": frame_count,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "duration": frame_count / fps if fps > 0 else 0,
+            "codec": "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 "),
+        }
+    finally:
+        cap.release()
+
+
+def keyframe_index(video_path: str) -> Optional[List[int]]:
+    """
+    키프레임 번호 목록 (패킷만 읽고 디코딩하지 않음)
+    백엔드가 원시 패킷 읽기를 지원하지 않으면 None
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return None
+        keyframes = []
+        index = 0
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(index)
+            index += 1
+        return keyframes or None
+    finally:
+        cap.release()
+
+
+def sample_positions(frame_count: int, num_frames: int) -> List[int]:
+    """균등한 간격의 샘플 위치 (기존 슬라이싱 방식과 동일)"""
+    return [int(i * frame_count / num_frames) for i in range(num_frames)]
+
+
+def seek_cost(position: int, keyframes: List[int]) -> int:
+    """position으로 정확히 탐색할 때 디코딩하는 프레임 수"""
+    start = max(0, position - SEEK_PREROLL_FRAMES)
+    key = keyframes[max(0, bisect.bisect_right(keyframes, start) - 1)]
+    return position - key + 1 + SEEK_OVERHEAD_FRAMES
+
+
+def cheapest_seek(target: int, keyframes: List[int], tolerance: int,
+                  frame_count: int) -> Tuple[int, int]:
+    """허용 범위 안에서 탐색 비용이 가장 싼 위치 -> (위치, 비용)"""
+    best = (target, seek_cost(target, keyframes))
+    low, high = target - tolerance, min(frame_count - 1, target + tolerance)
+    start = bisect.bisect_left(keyframes, low - SEEK_PREROLL_FRAMES)
+    for key in keyframes[start:]:
+        position = key + SEEK_PREROLL_FRAMES if key > 0 else 0
+        if position > high:
+            break
+        if position < low:
+            continue
+        cost = seek_cost(position, keyframes)
+        if (cost, abs(position - target)) < (best[1], abs(best[0] - target)):
+            best = (position, cost)
+    return best
+
+
+def plan_extraction(targets: List[int], frame_count: int, strategy: str = "auto",
+                    keyframes: Optional[List[int]] = None,
+                    tolerance: int = 0) -> List[Tuple[str, int]]:
+    """
+    추출 계획 -> [(동작, 프레임 번호)]
+    동작: "seek" (해당 위치로 탐색 후 read) / "grab" (현재 위치부터 해당 위치까지 grab 후 retrieve)
+    """
+    if strategy == "sequential":
+        return [("grab", target) for target in targets]
+    if strategy == "seek" or not keyframes:
+        return [("seek", target) for target in targets]
+
+    plan = []
+    position = 0  # 다음에 grab()하면 디코딩될 프레임 번호
+    for target in targets:
+        seek_to, cost = cheapest_seek(target, keyframes, tolerance, frame_count)
+        if strategy == "auto" and position <= target and target - position + 1 <= cost:
+            # 앞으로 grab하는 것이 탐색보다 싸면 정확한 위치를 그대로 사용
+            action, frame_index = "grab", target
+        else:
+            action, frame_index = "seek", seek_to
+        plan.append((action, frame_index))
+        position = frame_index + 1
+    return plan
+
+
+def plan_cost(plan: List[Tuple[str, int]], keyframes: Optional[List[int]]) -> int:
+    """계획의 예상 디코딩 프레임 수"""
+    total, position = 0, 0
+    for action, frame_index in plan:
+        if action == "grab":
+            total += frame_index - position + 1
+        else:
+            total += seek_cost(frame_index, keyframes) if keyframes else SEEK_PREROLL_FRAMES + 1
+        position = frame_index + 1
+    return total
+
+
+def extract_frames(video_path: str, num_frames: int = 10, strategy: str = "auto",
+                   tolerance: Optional[int] = None) -> List[Tuple[int, np.ndarray]]:
+    """
+    균등한 간격으로 num_frames개 프레임 추출 -> [(프레임 번호, BGR 이미지)]
+    tolerance: 키프레임 정렬을 위해 샘플 위치를 옮길 수 있는 최대 프레임 수
+               (기본: 샘플 간격의 1/4, 정확한 위치가 필요하면 0)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"알 수 없는 추출 전략: {strategy}")
+
+    frame_count = probe_video(video_path)["frame_count"]
+    if frame_count <= 0:
+        raise ValueError("동영상 읽기 실패")
+
+    targets = sorted(set(sample_positions(frame_count, num_frames)))
+    if tolerance is None:
+        tolerance = frame_count // (num_frames * 4)
+
+    keyframes = None
+    if strategy in ("auto", "keyframe"):
+        # 목표가 촘촘해 한 번 훑는 것이 어차피 싼 경우에는 키프레임 목록도 읽지 않음
+        dense = len(targets) * (SEEK_PREROLL_FRAMES + 1 + SEEK_OVERHEAD_FRAMES) >= targets[-1] + 1
+        if strategy == "auto" and dense:
+            strategy = "sequential"
+        else:
+            keyframes = keyframe_index(video_path)
+
+    plan = plan_extraction(targets, frame_count, strategy, keyframes, tolerance)
+    return run_plan(video_path, plan)
+
+
+def run_plan(video_path: str, plan: List[Tuple[str, int]]) -> List[Tuple[int, np.ndarray]]:
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    try:
+        position = 0
+        for action, frame_index in plan:
+            if action == "seek":
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                ok, frame = cap.read()
+            else:
+                ok = True
+                while ok and position < frame_index:
+                    ok = cap.grab()
+                    position += 1
+                ok = ok and cap.grab()
+                ok, frame = cap.retrieve() if ok else (False, None)
+            position = frame_index + 1
+            if ok:
+                frames.append((frame_index, frame))
+    finally:
+        cap.release()
+    return frames
+
+
+def _frame_signature(frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """장면 비교용 요약 (HSV 색상 히스토그램, 64x36 흑백 축소 이미지)"""
+    small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    cv2.normalize(hist, hist)
+    return hist, cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+def scene_change_score(previous: Tuple[np.ndarray, np.ndarray],
+                       current: Tuple[np.ndarray, np.ndarray]) -> float:
+    """
+    두 프레임의 장면 차이 (0 ~ 1)
+    색 분포 차이(히스토그램)와 구조 차이(축소 이미지에서 바뀐 픽셀 비율) 중 큰 값
+    - 히스토그램: 다른 장소/화면으로 넘어가는 컷
+    - 바뀐 픽셀: 색 분포가 같은 슬라이드/문서 화면 전환 (글자 몇 줄만 바뀌어도 5% 안팎)
+    """
+    hist_distance = cv2.compareHist(previous[0], current[0], cv2.HISTCMP_BHATTACHARYYA)
+    changed = float(np.mean(np.abs(previous[1] - current[1]) > SCENE_PIXEL_DELTA))
+    return min(1.0, max(hist_distance, changed * 5))
+
+
+def select_scene_frames(video_path: str, max_frames: int = 10, sample_fps: float = 2.0,
+                        threshold: float = 0.2) -> List[Tuple[int, np.ndarray]]:
+    """
+    장면 전환 프레임 선택 -> [(프레임 번호, BGR 이미지)] (프레임 번호 순)
+    - 한 번의 디코딩 패스에서 sample_fps 간격으로만 retrieve()해 직전 샘플과 비교
+    - 첫 프레임과, 차이가 threshold 이상인 샘플(새 장면의 첫 프레임)이 후보
+    - 후보가 max_frames를 넘으면 차이가 큰 전환부터 남김
+      (바로 이웃한 후보끼리는 더 큰 전환 하나만 남겨 페이드 같은 점진적 전환은 한 번만 선택)
+    - 메모리에는 최대 max_frames개 프레임만 보관
+    정적인 동영상은 max_frames보다 적은 프레임을 반환합니다
+    """
+    info = probe_video(video_path)
+    if info["frame_count"] <= 0:
+        raise ValueError("동영상 읽기 실패")
+    step = max(1, round(info["fps"] / sample_fps)) if info["fps"] > 0 else 1
+    # 점진적 전환(페이드, 카메라 이동)이 여러 샘플에 걸쳐 후보가 되지 않도록 하는 최소 간격
+    min_gap = step * 2
+
+    kept: List[Tuple[float, int, np.ndarray]] = []  # (점수, 프레임 번호, 이미지) 최소 힙
+    cap = cv2.VideoCapture(video_path)
+    try:
+        previous = None
+        index = -1
+        while cap.grab():
+            index += 1
+            if index % step:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                continue
+            signature = _frame_signature(frame)
+            # 첫 프레임은 항상 후보 (가장 높은 점수)
+            score = 2.0 if previous is None else scene_change_score(previous, signature)
+            previous = signature
+            if score < threshold:
+                continue
+
+            close = [item for item in kept if index - item[1] < min_gap]
+            if close:
+                if score <= max(item[0] for item in close):
+                    continue
+                kept = [item for item in kept if index - item[1] >= min_gap]
+                heapq.heapify(kept)
+            if len(kept) < max_frames:
+                heapq.heappush(kept, (score, index, frame))
+            elif score > kept[0][0]:
+                heapq.heapreplace(kept, (score, index, frame))
+    finally:
+        cap.release()
+
+    return [(index, frame) for _, index, frame in sorted(kept, key=lambda item: item[1])]
+
+
+def dhash(frame: np.ndarray) -> int:
+    """64비트 차이 해시 (9x8 흑백 축소 이미지에서 가로로 이웃한 픽셀의 밝기 대소)"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def group_near_duplicates(hashes: List[int], max_distance: int) -> List[Optional[int]]:
+    """
+    거의 같은 프레임 묶기 -> 프레임마다 대표 프레임 위치 (자신이 대표면 None)
+    앞에서부터 보며 해밍 거리가 max_distance 이하인 대표가 있으면 그 대표에 묶음
+    max_distance가 음수면 묶지 않음
+    """
+    representatives: List[int] = []
+    groups: List[Optional[int]] = []
+    for position, value in enumerate(hashes):
+        match = None
+        if max_distance >= 0:
+            distances = [((value ^ hashes[r]).bit_count(), r) for r in representatives]
+            if distances and min(distances)[0] <= max_distance:
+                match = min(distances)[1]
+        if match is None:
+            representatives.append(position)
+        groups.append(match)
+    return groups
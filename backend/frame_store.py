@@ -0,0 +1,144 @@
+"""
+VideoNet Pro - 분석 프레임 저장소
+동영상 분석에서 추출한 대표 프레임을 JPEG 파일로 한 번만 저장하고 URL로 제공합니다
+- 내용 해시(SHA256)를 ID로 사용: 같은 프레임은 한 번만 저장, 내용이 바뀌지 않으므로 브라우저가 영구 캐시
+- 응답용 프레임은 따로 축소/압축 (Vision 분석용 이미지와 별개)
+- 전체 크기 제한, 초과 시 오래 쓰이지 않은 프레임부터 삭제 (분석 캐시 적중 시 사용 시각 갱신)
+"""
+
+import os
+import re
+import hashlib
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+# ===== 설정 =====
+FRAME_MAX_WIDTH = int(os.getenv("FRAME_MAX_WIDTH", "640"))  # 응답 프레임 최대 너비 (px, 0이면 원본 크기)
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", "70"))
+FRAME_CACHE_MAX_BYTES = int(os.getenv("FRAME_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 512MB
+FRAME_CACHE_SECONDS = int(os.getenv("FRAME_CACHE_SECONDS", str(365 * 24 * 60 * 60)))  # 내용 해시 URL이라 길게
+
+FRAME_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def encode_frame(frame: np.ndarray, max_width: int = FRAME_MAX_WIDTH,
+                 quality: int = FRAME_JPEG_QUALITY) -> bytes:
+    """응답용 JPEG (max_width보다 넓으면 비율을 유지해 축소)"""
+    height, width = frame.shape[:2]
+    if 0 < max_width < width:
+        frame = cv2.resize(frame, (max_width, max(1, int(height * max_width / width))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("프레임 인코딩 실패")
+    return buffer.tobytes()
+
+
+class FrameStore:
+    """
+    내용 주소 기반 프레임 저장소
+    - put: 저장 후 ID 반환 (이미 있으면 사용 시각만 갱신)
+    - touch: 여러 프레임의 사용 시각 갱신, 하나라도 없으면 False
+    - pinned: with 블록 안에서 저장한 프레임은 크기 초과 정리에서 제외 (추출 중인 분석의 프레임)
+    프레임 추출 스레드에서 동시에 호출되므로 크기 집계는 잠금 안에서 처리
+    """
+
+    def __init__(self, root: Path, max_bytes: int = FRAME_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.counters = {"stored": 0, "reused": 0, "evicted": 0}
+        self._pinned: Counter = Counter()  # frame_id -> 고정한 분석 수
+        self.total_bytes = sum(size for _, size, _ in self._scan())
+
+    @staticmethod
+    def valid_id(frame_id: str) -> bool:
+        return bool(FRAME_ID_PATTERN.match(frame_id))
+
+    def path(self, frame_id: str) -> Path:
+        return self.root / frame_id[:2] / f"{frame_id}.jpg"
+
+    def _scan(self) -> List[Tuple[Path, int, float]]:
+        """저장된 프레임 (경로, 크기, 마지막 사용 시각)"""
+        entries = []
+        for path in self.root.glob("*/*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    @contextmanager
+    def pinned(self):
+        """고정 범위: put(data, pins)로 저장한 프레임 ID를 모아 두고 블록이 끝나면 해제"""
+        pins: Set[str] = set()
+        try:
+            yield pins
+        finally:
+            with self._lock:
+                self._pinned.subtract(pins)
+                self._pinned += Counter()  # 0이 된 항목 제거
+
+    def put(self, data: bytes, pins: Optional[Set[str]] = None) -> str:
+        frame_id = hashlib.sha256(data).hexdigest()
+        target = self.path(frame_id)
+        with self._lock:
+            if pins is not None and frame_id not in pins:
+                pins.add(frame_id)
+                self._pinned[frame_id] += 1
+            if target.exists():
+                os.utime(target)
+                self.counters["reused"] += 1
+                return frame_id
+            target.parent.mkdir(exist_ok=True)
+            tmp_path = target.with_name(target.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+            self.total_bytes += len(data)
+            self.counters["stored"] += 1
+            if self.total_bytes > self.max_bytes:
+                self._evict(keep=target)
+        return frame_id
+
+    def touch(self, frame_ids: Iterable[str]) -> bool:
+        for frame_id in frame_ids:
+            if not self.valid_id(frame_id):
+                return False
+            try:
+                os.utime(self.path(frame_id))
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _evict(self, keep: Path):
+        """최대 크기의 90%까지 오래 쓰이지 않은 프레임부터 삭제 (방금 저장한 프레임, 고정된 프레임 제외)"""
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(self._scan(), key=lambda entry: entry[2]):
+            if self.total_bytes <= target:
+                break
+            if path == keep or path.stem in self._pinned:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.total_bytes -= size
+            self.counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_width": FRAME_MAX_WIDTH,
+            "jpeg_quality": FRAME_JPEG_QUALITY
+        }
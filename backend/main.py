@@ -24,8 +24,10 @@ import string
 from contextlib import contextmanager
 import uvicorn
 from socketio_server import socket_app
-from file_transfer import router as file_router
+from file_transfer import router as file_router, storage_quota
+from file_retention import UploadLimitMiddleware
 from video_analysis import router as video_router
+from overload import overload_controller, OverloadMiddleware
 
 # ===== 설정 =====
 SECRET_KEY = os.getenv("SECRET_KEY", "videonet-secret-key-2024")
@@ -41,6 +43,12 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# 업로드 크기/저장 공간 할당량 검사 (본문을 받는 중에 거절)
+app.add_middleware(UploadLimitMiddleware, quota=storage_quota)
+
+# 과부하 차단 (CORS 안쪽에 두어 503 응답에도 CORS 헤더가 붙도록 함)
+app.add_middleware(OverloadMiddleware)
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +56,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # 파일 전송 라우터 추가
@@ -182,8 +191,14 @@ def generate_room_code() -> str:
 async def startup():
     """서버 시작시 실행"""
     init_database()
+    overload_controller.start()
     print("✅ VideoNet Pro 서버 시작!")
 
+@app.on_event("shutdown")
+async def shutdown():
+    """서버 종료시 실행"""
+    await overload_controller.stop()
+
 @app.get("/")
 async def root():
     """홈페이지"""
@@ -199,6 +214,11 @@ async def root():
         ]
     }
 
+@app.get("/api/system/load")
+async def get_system_load():
+    """서버 부하 상태 (이벤트 루프 지연, 처리 중 작업 수)"""
+    return overload_controller.status()
+
 @app.post("/api/auth/register")
 async def register(user: UserRegister):
     """회원가입"""
@@ -0,0 +1,132 @@
+"""
+VideoNet Pro - 스트리밍 multipart 파서
+요청 본문을 받는 대로 파일 파트를 sink에 넘깁니다
+- 파일 전체를 메모리나 중간 임시 파일(SpooledTemporaryFile)에 모으지 않음
+- 전체 본문 크기 제한 (Content-Length로 미리, 없으면 받는 도중 413)
+"""
+
+import os
+from contextlib import AsyncExitStack
+from typing import Any, AsyncContextManager, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+# sink에 넘기기 전에 모으는 크기 (작은 조각마다 스레드 전환하지 않도록)
+MULTIPART_WRITE_SIZE = int(os.getenv("MULTIPART_WRITE_SIZE", str(1024 * 1024)))  # 1MB
+# 파일이 아닌 폼 필드 최대 크기
+MAX_FIELD_SIZE = 64 * 1024
+
+# (필드 이름, 파일명) -> sink (async with로 열고 await sink.write(bytes)로 기록)
+SinkFactory = Callable[[str, str], AsyncContextManager[Any]]
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"업로드 크기 제한({max_size} 바이트)을 초과했습니다"
+    )
+
+
+async def stream_multipart(request: Request, open_sink: SinkFactory,
+                           max_size: Optional[int] = None) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    multipart/form-data 본문을 스트리밍으로 처리
+    반환값: (파일 필드 -> {"filename", "size", "sink"}, 일반 필드 -> 문자열)
+    sink는 본문 처리가 끝나면 닫힌 상태로 반환됩니다
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="multipart/form-data 요청이 필요합니다")
+
+    content_length = request.headers.get("content-length")
+    if max_size and content_length and content_length.isdigit() and int(content_length) > max_size:
+        raise _too_large(max_size)
+
+    # 파서 콜백은 동기 함수이므로 이벤트만 모아 두고 아래에서 비동기로 처리
+    events = []
+    header_field, header_value = bytearray(), bytearray()
+    headers: Dict[bytes, bytes] = {}
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+        headers.clear()
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+
+    files: Dict[str, dict] = {}
+    fields: Dict[str, str] = {}
+    received = 0
+
+    async with AsyncExitStack() as stack:
+        current: Optional[dict] = None  # 처리 중인 파트
+        buffer = bytearray()
+
+        async def flush():
+            if buffer:
+                await current["sink"].write(bytes(buffer))
+                current["size"] += len(buffer)
+                buffer.clear()
+
+        async for chunk in request.stream():
+            received += len(chunk)
+            if max_size and received > max_size:
+                raise _too_large(max_size)
+            parser.write(chunk)
+
+            for kind, value in events:
+                if kind == "headers":
+                    _, options = parse_options_header(value.get(b"content-disposition", b""))
+                    name = options.get(b"name", b"").decode("utf-8", "replace")
+                    filename = options.get(b"filename")
+                    if filename is not None:
+                        filename = os.path.basename(filename.decode("utf-8", "replace"))
+                        part_stack = AsyncExitStack()
+                        await stack.enter_async_context(part_stack)
+                        sink = await part_stack.enter_async_context(open_sink(name, filename))
+                        current = {"name": name, "filename": filename, "size": 0,
+                                   "sink": sink, "stack": part_stack}
+                    else:
+                        current = {"name": name, "value": bytearray()}
+                elif kind == "data" and current is not None:
+                    if "sink" in current:
+                        buffer.extend(value)
+                        if len(buffer) >= MULTIPART_WRITE_SIZE:
+                            await flush()
+                    else:
+                        if len(current["value"]) + len(value) > MAX_FIELD_SIZE:
+                            raise HTTPException(status_code=413, detail="폼 필드가 너무 큽니다")
+                        current["value"].extend(value)
+                elif kind == "end" and current is not None:
+                    if "sink" in current:
+                        await flush()
+                        await current.pop("stack").aclose()
+                        files[current["name"]] = current
+                    else:
+                        fields[current["name"]] = current["value"].decode("utf-8", "replace")
+                    current = None
+            events.clear()
+
+        parser.finalize()
+        if current is not None:
+            raise HTTPException(status_code=400, detail="업로드 본문이 중간에 끊겼습니다")
+
+    return files, fields
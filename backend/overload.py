@@ -0,0 +1,186 @@
+"""
+과부하 보호 모듈 - 이벤트 루프 지연 및 처리 중 작업 수 기반 부하 차단
+서버가 포화 상태일 때 새 방 참가와 무거운 요청을 거절/지연시키고
+이미 진행 중인 통화의 시그널링은 그대로 통과시킵니다
+"""
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from fastapi.responses import JSONResponse
+
+# ===== 설정 =====
+LAG_CHECK_INTERVAL = float(os.getenv("OVERLOAD_LAG_CHECK_INTERVAL", "0.25"))  # 초
+LAG_THRESHOLD_MS = float(os.getenv("OVERLOAD_LAG_THRESHOLD_MS", "150"))
+RETRY_AFTER_BASE = int(os.getenv("OVERLOAD_RETRY_AFTER", "2"))  # 초
+RETRY_AFTER_MAX = int(os.getenv("OVERLOAD_RETRY_AFTER_MAX", "30"))
+JOIN_DEFER_SECONDS = float(os.getenv("OVERLOAD_JOIN_DEFER_SECONDS", "1.0"))
+
+# 요청 본문을 읽기 전에 차단할 POST 경로 -> 작업 종류
+# 파일 전송은 분석과 한도를 따로 둠 (업로드가 분석 자리를 차지하거나 그 반대가 되지 않도록)
+# 청크/파트 PUT과 업로드 완료는 이미 수용한 업로드의 일부라 제한하지 않음
+HEAVY_PATHS: Dict[str, str] = {
+    "/api/video/analyze": "heavy",
+    "/api/video/jobs": "heavy",  # 분석 작업 등록 (업로드), 분석 자체는 작업 큐 크기로 제한
+    "/api/video/verify": "heavy",
+    "/api/files/upload": "transfer",
+    "/api/files/uploads": "transfer",  # 이어받기/멀티파트 업로드 세션 생성
+}
+
+# 작업 종류별 동시 처리 한도
+MAX_INFLIGHT: Dict[str, int] = {
+    "join": int(os.getenv("OVERLOAD_MAX_JOINS", "32")),
+    "heavy": int(os.getenv("OVERLOAD_MAX_HEAVY", "4")),
+    "transfer": int(os.getenv("OVERLOAD_MAX_TRANSFERS", "16")),
+}
+
+
+class OverloadedError(Exception):
+    """과부하로 요청이 거절됨"""
+
+    def __init__(self, kind: str, reason: str, retry_after: int):
+        super().__init__(f"{kind} 요청 거절: {reason}")
+        self.kind = kind
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class OverloadController:
+    """
+    서버 전역 과부하 제어기
+    - 이벤트 루프 지연 측정 (sleep 오차)
+    - 작업 종류별 처리 중 카운터
+    """
+
+    def __init__(self, max_inflight: Dict[str, int], lag_threshold_ms: float):
+        self.max_inflight = dict(max_inflight)
+        self.lag_threshold_ms = lag_threshold_ms
+        self.lag_ms = 0.0
+        self.inflight: Dict[str, int] = {kind: 0 for kind in max_inflight}
+        self.rejected: Dict[str, int] = {kind: 0 for kind in max_inflight}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _monitor(self):
+        """이벤트 루프 지연 측정 루프 (급상승은 즉시 반영, 회복은 천천히)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_CHECK_INTERVAL)
+            lag = max(0.0, loop.time() - started - LAG_CHECK_INTERVAL) * 1000
+            if lag > self.lag_ms:
+                self.lag_ms = lag
+            else:
+                self.lag_ms = self.lag_ms * 0.7 + lag * 0.3
+
+    def start(self):
+        """지연 측정 시작 (이벤트 루프 안에서 호출)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._monitor())
+
+    async def stop(self):
+        """지연 측정 중지"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_lagging(self) -> bool:
+        return self.lag_ms >= self.lag_threshold_ms
+
+    def retry_after(self) -> int:
+        """지연 정도에 비례한 재시도 대기 시간 (초)"""
+        factor = 1 + self.lag_ms / self.lag_threshold_ms if self.lag_threshold_ms > 0 else 1
+        return min(RETRY_AFTER_MAX, max(1, int(RETRY_AFTER_BASE * factor)))
+
+    def check(self, kind: str):
+        """새 작업 수용 가능 여부 확인 (불가능하면 OverloadedError)"""
+        if self.is_lagging():
+            reason = f"이벤트 루프 지연 {self.lag_ms:.0f}ms"
+        elif self.inflight.get(kind, 0) >= self.max_inflight.get(kind, 0):
+            reason = f"처리 중인 작업 {self.inflight[kind]}개"
+        else:
+            return
+        self.rejected[kind] = self.rejected.get(kind, 0) + 1
+        raise OverloadedError(kind, reason, self.retry_after())
+
+    async def wait_for_capacity(self, kind: str, max_wait: float):
+        """최대 max_wait초 동안 여유가 생기기를 기다린 뒤 수용 여부 확인"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        while True:
+            try:
+                self.check(kind)
+                return
+            except OverloadedError:
+                if loop.time() >= deadline:
+                    raise
+                # 대기 중 재시도는 거절 횟수에 포함하지 않음
+                self.rejected[kind] -= 1
+            await asyncio.sleep(LAG_CHECK_INTERVAL)
+
+    @asynccontextmanager
+    async def admit(self, kind: str, max_wait: float = 0.0):
+        """작업 수용 및 처리 중 카운터 관리"""
+        if max_wait > 0:
+            await self.wait_for_capacity(kind, max_wait)
+        else:
+            self.check(kind)
+        self.inflight[kind] = self.inflight.get(kind, 0) + 1
+        try:
+            yield
+        finally:
+            self.inflight[kind] -= 1
+
+    def status(self) -> dict:
+        return {
+            "overloaded": self.is_lagging(),
+            "loop_lag_ms": round(self.lag_ms, 1),
+            "lag_threshold_ms": self.lag_threshold_ms,
+            "inflight": dict(self.inflight),
+            "max_inflight": dict(self.max_inflight),
+            "rejected": dict(self.rejected),
+        }
+
+
+overload_controller = OverloadController(MAX_INFLIGHT, LAG_THRESHOLD_MS)
+
+
+class OverloadMiddleware:
+    """
+    무거운 HTTP 요청 차단 미들웨어 (ASGI)
+    업로드 본문을 받기 전에 503 + Retry-After로 응답합니다
+    - paths: 경로 -> 작업 종류 (종류별 동시 처리 한도 적용)
+    """
+
+    def __init__(self, app, paths: Dict[str, str] = HEAVY_PATHS,
+                 controller: OverloadController = overload_controller):
+        self.app = app
+        self.paths = dict(paths)
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        kind = self.paths.get(scope["path"].rstrip("/")) if scope["type"] == "http" else None
+        if kind is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            self.controller.check(kind)
+        except OverloadedError as e:
+            response = JSONResponse(
+                {"detail": f"서버가 혼잡합니다. {e.retry_after}초 후 다시 시도하세요 ({e.reason})"},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        self.controller.inflight[kind] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.inflight[kind] -= 1
@@ -3,8 +3,12 @@ Socket.IO 서버 - WebRTC 시그널링 서버
 실시간 통신과 WebRTC 연결을 관리합니다
 """
 
+import asyncio
 import socketio
 from typing import Dict, Set, List, Any
+from overload import overload_controller, OverloadedError, JOIN_DEFER_SECONDS
+from file_transfer import blob_store
+from video_analysis import analysis_jobs
 
 # T3: 압축 품질 (Q) 설정 관리 전역 변수 정의 (기본값 50)
 current_video_quality: int = 50
@@ -24,6 +28,18 @@ socket_app = socketio.ASGIApp(sio)
 connected_users: Dict[str, Dict] = {}  # session_id -> user_info
 room_participants: Dict[str, Set[str]] = {}  # room_id -> set of session_ids
 
+# 방 종료 기록(인덱스 DB 쓰기)은 스레드에서 실행, 입장/퇴장 순서대로 반영되도록 직렬화
+room_ended_lock = asyncio.Lock()
+
+
+async def update_room_ended(room_id: str, ended: bool):
+    """회의 종료 기록/취소 (DB 쓰기 잠금을 기다리는 동안 이벤트 루프를 막지 않음)"""
+    async with room_ended_lock:
+        if ended:
+            await asyncio.to_thread(blob_store.mark_room_ended, room_id)
+        else:
+            await asyncio.to_thread(blob_store.clear_room_ended, room_id)
+
 
 def get_room_user_details(room_id: str) -> List[Dict[str, Any]]:
     """room_users 이벤트에 사용되는 참가자 목록 생성"""
@@ -62,10 +78,31 @@ async def disconnect(sid):
 
 @sio.event
 async def join_room(sid, data):
-    """방 참가"""
+    """
+    방 참가
+    - 서버 과부하 시 잠시 대기 후에도 여유가 없으면 거절 (join_rejected)
+    - 이미 연결된 통화의 시그널링 이벤트는 과부하 검사 없이 처리
+    """
     room_id = data.get('roomId')
     user_info = data.get('userInfo', {}) or {}
 
+    try:
+        async with overload_controller.admit('join', max_wait=JOIN_DEFER_SECONDS):
+            await join_room_internal(sid, room_id, user_info)
+    except OverloadedError as e:
+        print(f'🚫 방 참가 거절 (과부하): {sid} -> Room {room_id} ({e.reason})')
+        await sio.emit('join_rejected', {
+            'roomId': room_id,
+            'reason': 'overloaded',
+            'retryAfter': e.retry_after,
+        }, to=sid)
+        return {'ok': False, 'retryAfter': e.retry_after}
+
+    return {'ok': True}
+
+
+async def join_room_internal(sid, room_id, user_info):
+    """방 참가 내부 처리"""
     print(f'👥 방 참가: {sid} -> Room {room_id}')
     
     # Socket.IO 룸에 참가
@@ -77,9 +114,11 @@ async def join_room(sid, data):
         connected_users[sid]['userInfo'] = user_info
     
     # 방 참가자 목록 업데이트
-    if room_id not in room_participants:
-        room_participants[room_id] = set()
-    room_participants[room_id].add(sid)
+    room_started = room_id not in room_participants
+    room_participants.setdefault(room_id, set()).add(sid)
+    # 회의가 다시 시작되면 방 파일 만료 취소
+    if room_started and room_id:
+        await update_room_ended(room_id, ended=False)
     
     # 다른 참가자들에게 "새 참가자" 알림
     await sio.emit('user_joined', {
@@ -116,9 +155,11 @@ async def leave_room_internal(sid, room_id):
     if room_id in room_participants:
         room_participants[room_id].discard(sid)
         
-        # 방에 아무도 없으면 방 정보 삭제
+        # 방에 아무도 없으면 방 정보 삭제 (회의 종료 - 유예 시간 후 방 파일 정리)
         if not room_participants[room_id]:
             del room_participants[room_id]
+            if room_id:
+                await update_room_ended(room_id, ended=True)
     
     # 다른 참가자들에게 알림
     await sio.emit('user_left', {
@@ -313,6 +354,43 @@ async def set_quality(sid, data):
         print(f'⚠️ 잘못된 형식의 압축 품질 값 수신: {quality}')
 
 
+# ===== 동영상 분석 작업 진행 상황 =====
+
+def analysis_room(job_id: str) -> str:
+    return f'analysis:{job_id}'
+
+
+async def emit_analysis_event(job_id: str, event: str, job: Dict[str, Any]):
+    """분석 작업 이벤트를 구독 중인 클라이언트에게 전달 (analysis_status / analysis_progress)"""
+    await sio.emit(f'analysis_{event}', job, room=analysis_room(job_id))
+
+
+analysis_jobs.add_listener(emit_analysis_event)
+
+
+@sio.event
+async def subscribe_analysis(sid, data):
+    """
+    분석 작업 진행 상황 구독 (POST /api/video/jobs 로 받은 jobId)
+    구독 즉시 현재 상태를 analysis_status로 보냄 (이미 끝난 작업이면 그것으로 끝)
+    """
+    job_id = (data or {}).get('jobId')
+    job = analysis_jobs.view(job_id) if job_id else None
+    if job is None:
+        await sio.emit('analysis_error', {'jobId': job_id, 'message': '분석 작업을 찾을 수 없습니다'}, to=sid)
+        return
+    await sio.enter_room(sid, analysis_room(job_id))
+    await sio.emit('analysis_status', job, to=sid)
+
+
+@sio.event
+async def unsubscribe_analysis(sid, data):
+    """분석 작업 진행 상황 구독 해제"""
+    job_id = (data or {}).get('jobId')
+    if job_id:
+        await sio.leave_room(sid, analysis_room(job_id))
+
+
 # ===== 디버깅용 이벤트 =====
 
 @sio.event
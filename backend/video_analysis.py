@@ -6,33 +6,144 @@
 import cv2
 import base64
 import os
+import json
+import math
+import asyncio
 from pathlib import Path
-from typing import List, Dict, Tuple, Any
-import hashlib
-from openai import OpenAI
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import List, Dict, Tuple, Any, Optional, Callable, Awaitable, Set
+import numpy as np
+from openai import (
+    AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+)
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import tempfile
 import time
+import random
+from file_transfer import UPLOAD_DIR, HashingFileWriter, HashingSink, get_file_or_404
+from file_responses import etag_matches, make_etag
+from multipart_stream import stream_multipart
+from frame_extraction import (
+    SELECTIONS, STRATEGIES, dhash, extract_frames, group_near_duplicates, probe_video, select_scene_frames
+)
+from analysis_cache import AnalysisCache, cache_key
+from person_detection import DETECTORS, PersonDetector
+from analysis_jobs import AnalysisJobQueue, JobQueueFull
+from chat_sessions import CHAT_SUMMARY_MAX_TOKENS, ChatSessionStore
+from chat_contexts import AnalysisContextStore
+from frame_store import (
+    FRAME_CACHE_SECONDS, FRAME_CACHE_MAX_BYTES, FRAME_JPEG_QUALITY, FRAME_MAX_WIDTH, FrameStore, encode_frame
+)
 
 router = APIRouter(prefix="/api/video", tags=["video"])
 
+# 분석용 동영상 최대 크기 (본문을 받는 도중 초과하면 413)
+VIDEO_MAX_UPLOAD_SIZE = int(os.getenv("VIDEO_MAX_UPLOAD_SIZE", str(2 * 1024 * 1024 * 1024)))  # 2GB
+# 파일 검증 요청 본문 최대 크기 (원본 + 수신 파일, 해시만 계산하고 저장하지 않음)
+VERIFY_MAX_UPLOAD_SIZE = int(os.getenv("VERIFY_MAX_UPLOAD_SIZE", str(2 * VIDEO_MAX_UPLOAD_SIZE)))
+# 프레임 추출 전략 (auto / seek / sequential / keyframe, frame_extraction.py 참고)
+FRAME_EXTRACTION_STRATEGY = os.getenv("FRAME_EXTRACTION_STRATEGY", "auto")
+if FRAME_EXTRACTION_STRATEGY not in STRATEGIES:
+    FRAME_EXTRACTION_STRATEGY = "auto"
+# 프레임 선택 방식 (scene: 장면 전환 프레임, uniform: 균등 간격)
+FRAME_SELECTION = os.getenv("FRAME_SELECTION", "scene")
+if FRAME_SELECTION not in SELECTIONS:
+    FRAME_SELECTION = "scene"
+SCENE_THRESHOLD = float(os.getenv("SCENE_THRESHOLD", "0.2"))  # 장면 전환으로 볼 차이 (0 ~ 1)
+SCENE_SAMPLE_FPS = float(os.getenv("SCENE_SAMPLE_FPS", "2"))  # 초당 비교할 프레임 수
+# 장면 선택은 전체를 한 번 디코딩하므로 이보다 긴 동영상은 균등 간격 사용
+SCENE_MAX_DURATION_SECONDS = float(os.getenv("SCENE_MAX_DURATION_SECONDS", "600"))
+# GPT Vision 호출 전 로컬 인물 검출 (off / hog / face / all, person_detection.py 참고)
+# 켜면 인물 여부는 로컬 검출 결과로 정하고, 인물이 없는 프레임은 Vision을 호출하지 않음
+PERSON_PREFILTER = os.getenv("PERSON_PREFILTER", "off")
+if PERSON_PREFILTER not in DETECTORS:
+    PERSON_PREFILTER = "off"
+person_detector = PersonDetector(PERSON_PREFILTER)
+# 거의 같은 프레임으로 볼 dHash 해밍 거리 (64비트 중, 음수면 묶지 않음)
+# 묶인 프레임은 대표 프레임의 분석 결과를 재사용하고 응답 이미지에서도 제외
+FRAME_DEDUP_DISTANCE = int(os.getenv("FRAME_DEDUP_DISTANCE", "5"))
+
+# ===== GPT Vision 호출 설정 =====
+VISION_MODEL = os.getenv("VISION_MODEL", "gpt-4o-mini")  # 저렴한 모델 사용
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "10"))  # 서버 전체 동시 호출 수 (분석 1건의 프레임 수 이상이면 약 1회 왕복)
+VISION_TIMEOUT_SECONDS = float(os.getenv("VISION_TIMEOUT_SECONDS", "30"))  # 호출 1회 제한 시간
+VISION_MAX_RETRIES = int(os.getenv("VISION_MAX_RETRIES", "2"))  # 일시적 오류 재시도 횟수
+VISION_BACKOFF_SECONDS = float(os.getenv("VISION_BACKOFF_SECONDS", "0.5"))  # 재시도 대기 (지수 증가)
+VISION_PROMPT = "이 이미지를 분석해주세요. 다음 정보를 간단히 제공해주세요:\n1. 인물 수 (몇 명)\n2. 주요 활동/장면\n3. 배경/장소\n최대한 짧게 답변해주세요."
+# 프롬프트나 결과 형식을 바꾸면 올려서 이전 캐시 결과를 쓰지 않도록 함
+VISION_PROMPT_VERSION = 2
+# 분석할 프레임 수
+ANALYSIS_NUM_FRAMES = 10
+
+# Vision 요청 방식 (요청의 vision_mode 필드로 바꿀 수 있음)
+# - frame: 프레임마다 요청 1회 (기본)
+# - batch: 여러 프레임을 요청 1회에 첨부 (프롬프트 1번, 요청 수 감소)
+# - sheet: 여러 프레임을 격자 이미지 1장으로 합쳐 첨부 (이미지 토큰도 감소, 프레임당 해상도는 낮아짐)
+VISION_MODES = ("frame", "batch", "sheet")
+VISION_MODE = os.getenv("VISION_MODE", "frame")
+if VISION_MODE not in VISION_MODES:
+    VISION_MODE = "frame"
+VISION_BATCH_SIZE = max(1, int(os.getenv("VISION_BATCH_SIZE", "5")))  # 요청 1회에 묶는 프레임 수
+VISION_SHEET_TILE_WIDTH = int(os.getenv("VISION_SHEET_TILE_WIDTH", "320"))  # 격자 한 칸 너비 (px)
+VISION_SHEET_DETAIL = os.getenv("VISION_SHEET_DETAIL", "low")  # 격자 이미지 detail (low / high / auto)
+VISION_BATCH_PROMPT = (
+    "다음은 동영상 프레임 {count}개입니다 ({layout}, 프레임 1~{count}). "
+    "프레임마다 다음 정보를 간단히 제공해주세요:\n1. 인물 수 (몇 명)\n2. 주요 활동/장면\n3. 배경/장소\n"
+    "최대한 짧게, 다음 JSON 형식으로만 답변해주세요: "
+    '{{"frames": [{{"frame": 1, "description": "..."}}]}}'
+)
+
+# ===== 분석 결과 캐시 (동영상 SHA256 + 분석 파라미터) =====
+ANALYSIS_CACHE_DB = os.getenv("ANALYSIS_CACHE_DB", str(UPLOAD_DIR / "analysis_cache.db"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))  # 0이면 캐시 끔
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # 256MB
+analysis_cache = AnalysisCache(Path(ANALYSIS_CACHE_DB), ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_MAX_BYTES)
+
+# ===== 응답 프레임 저장소 (결과에는 이미지 대신 URL) =====
+FRAME_URL_PREFIX = "/api/video/frames/"
+frame_store = FrameStore(UPLOAD_DIR / "frames", FRAME_CACHE_MAX_BYTES)
+
 # OpenAI 클라이언트 초기화 (lazy initialization)
 # API 키가 없어도 서버가 시작되도록 함
-client = None
-
-def get_openai_client():
-    """OpenAI 클라이언트 가져오기 (필요할 때만 초기화)"""
-    global client
-    if client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise HTTPException(
-                status_code=500,
-                detail="OpenAI API 키가 설정되지 않았습니다. .env 파일에 OPENAI_API_KEY를 설정하세요."
-            )
-        client = OpenAI(api_key=api_key)
-    return client
+async_client = None
+vision_semaphore = None
+
+def _openai_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="OpenAI API 키가 설정되지 않았습니다. .env 파일에 OPENAI_API_KEY를 설정하세요."
+        )
+    return api_key
+
+def get_async_openai_client():
+    """
+    비동기 OpenAI 클라이언트 (필요할 때만 초기화)
+    Vision 재시도는 _vision_request에서 직접 처리하므로 기본 SDK 재시도는 끔 (채팅은 get_chat_client)
+    """
+    global async_client
+    if async_client is None:
+        async_client = AsyncOpenAI(
+            api_key=_openai_api_key(),
+            timeout=VISION_TIMEOUT_SECONDS,
+            max_retries=0
+        )
+    return async_client
+
+def get_vision_semaphore() -> asyncio.Semaphore:
+    """동시 Vision 호출 제한 (여러 분석 요청이 함께 나눠 씀)"""
+    global vision_semaphore
+    if vision_semaphore is None:
+        vision_semaphore = asyncio.Semaphore(VISION_CONCURRENCY)
+    return vision_semaphore
+
+def _is_retryable(error: Exception) -> bool:
+    """일시적인 오류만 재시도 (시간 초과, 연결 실패, 429, 5xx)"""
+    if isinstance(error, (APITimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
 
 class VideoAnalysisResult(BaseModel):
     """동영상 분석 결과"""
@@ -44,7 +155,9 @@ class VideoAnalysisResult(BaseModel):
     analysis_time: float
     summary: str
     persons_detected: List[Dict[str, Any]]
-    key_frames: List[str]  # Base64 인코딩된 이미지
+    key_frames: List[str]  # 프레임 이미지 URL (/api/video/frames/{id}.jpg, 거의 같은 프레임은 대표 하나만)
+    cached: bool = False  # 분석 결과 캐시에서 반환했는지 여부
+    analysis_id: Optional[str] = None  # 채팅 컨텍스트 ID (/chat 요청에 분석 결과 대신 전달)
 
 class FileVerificationResult(BaseModel):
     """파일 검증 결과"""
@@ -55,372 +168,881 @@ class FileVerificationResult(BaseModel):
     original_size: int
     received_size: int
     verification_time: float
+    original_file_id: Optional[str] = None  # 저장된 파일과 비교한 경우 그 파일 ID
 
-def calculate_file_hash(file_path: str) -> str:
-    """파일의 SHA256 해시 계산"""
-    sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        while chunk := f.read(8192):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+def frame_selection(duration: float) -> str:
+    """동영상 길이에 따라 실제로 사용할 프레임 선택 방식"""
+    if FRAME_SELECTION == "scene" and duration <= SCENE_MAX_DURATION_SECONDS:
+        return "scene"
+    return "uniform"
 
-def extract_key_frames(video_path: str, num_frames: int = 10) -> List[str]:
+def extract_key_frames(video_path: str, num_frames: int = 10,
+                       selection: str = "uniform") -> List[Dict[str, Any]]:
     """
-    동영상에서 주요 프레임 추출 (슬라이싱 기반)
-    균등한 간격으로 프레임 샘플링
+    동영상에서 주요 프레임 추출
+    - scene: 장면이 바뀌는 프레임을 최대 num_frames개 (정적인 동영상은 더 적게)
+    - uniform: 균등한 간격으로 샘플링 (슬라이싱 기반, 가장 싼 디코딩 경로 사용)
+    반환값: 프레임마다 {"frame_number", "duplicate_of", "image", "frame_id", "person_count"}
+    - duplicate_of: 거의 같은 앞 프레임(대표)의 위치, 대표 프레임이면 None
+    - image: Vision 분석용 Base64 JPEG (중복 프레임은 None, 인코딩/검출도 하지 않음)
+    - frame_id: 프레임 저장소에 저장한 응답용 JPEG의 ID (축소/압축은 FRAME_MAX_WIDTH / FRAME_JPEG_QUALITY)
+    - person_count: 로컬 검출 인물 수 (검출기를 끄면 None)
     """
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    if total_frames == 0:
-        cap.release()
-        raise ValueError("동영상 읽기 실패")
-
-    # 균등한 간격으로 프레임 선택
-    frame_indices = [int(i * total_frames / num_frames) for i in range(num_frames)]
+    if selection == "scene":
+        frames = select_scene_frames(video_path, num_frames, SCENE_SAMPLE_FPS, SCENE_THRESHOLD)
+    else:
+        frames = extract_frames(video_path, num_frames, FRAME_EXTRACTION_STRATEGY)
+    groups = group_near_duplicates([dhash(frame) for _, frame in frames], FRAME_DEDUP_DISTANCE)
 
     key_frames = []
-    for idx in frame_indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-
-        if ret:
-            # JPEG로 인코딩 (압축률 높임)
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
-            # Base64 인코딩
-            frame_b64 = base64.b64encode(buffer).decode('utf-8')
-            key_frames.append(frame_b64)
-
-    cap.release()
+    # 이번 추출에서 저장한 프레임은 뒤 프레임 저장 시 크기 초과 정리에서 제외
+    with frame_store.pinned() as pins:
+        for (frame_number, frame), duplicate_of in zip(frames, groups):
+            entry = {"frame_number": frame_number, "duplicate_of": duplicate_of,
+                     "image": None, "frame_id": None, "person_count": None}
+            if duplicate_of is None:
+                # JPEG로 인코딩 (압축률 높임)
+                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
+                # Base64 인코딩
+                entry["image"] = base64.b64encode(buffer).decode('utf-8')
+                entry["frame_id"] = frame_store.put(encode_frame(frame), pins)
+                entry["person_count"] = person_detector.count(frame)
+            else:
+                entry["person_count"] = key_frames[duplicate_of]["person_count"]
+            key_frames.append(entry)
     return key_frames
 
-def analyze_frame_with_gpt(frame_b64: str) -> Dict:
+async def _vision_request(content: List[Dict], max_tokens: int, json_output: bool = False):
+    """
+    GPT Vision 호출 1회 (응답 객체 반환, 실패 시 예외)
+    - 동시 호출 수 제한, 호출마다 제한 시간
+    - 일시적 오류는 지수 백오프로 재시도
+    """
+    openai_client = get_async_openai_client()
+    options = {"response_format": {"type": "json_object"}} if json_output else {}
+    for attempt in range(VISION_MAX_RETRIES + 1):
+        try:
+            async with get_vision_semaphore():
+                return await openai_client.chat.completions.create(
+                    model=VISION_MODEL,
+                    messages=[{"role": "user", "content": content}],
+                    max_tokens=max_tokens,
+                    **options
+                )
+        except Exception as e:
+            if attempt < VISION_MAX_RETRIES and _is_retryable(e):
+                # 함께 실패한 호출들이 동시에 재시도하지 않도록 대기 시간에 지터 추가
+                delay = VISION_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+                print(f"  🔁 GPT Vision 재시도 {attempt + 1}/{VISION_MAX_RETRIES} ({delay:.2f}초 후): {e}")
+                await asyncio.sleep(delay)
+                continue
+            raise
+
+def _image_part(image_b64: str, detail: str = "low") -> Dict:
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{image_b64}",
+            "detail": detail  # low: 저해상도로 분석 (토큰 절약)
+        }
+    }
+
+async def analyze_frame_with_gpt(frame_b64: str) -> Dict:
     """
     GPT Vision API로 프레임 분석
     토큰 절약을 위해 텍스트 데이터로 변환
     """
     try:
-        # OpenAI 클라이언트 가져오기
-        openai_client = get_openai_client()
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",  # 저렴한 모델 사용
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "이 이미지를 분석해주세요. 다음 정보를 간단히 제공해주세요:\n1. 인물 수 (몇 명)\n2. 주요 활동/장면\n3. 배경/장소\n최대한 짧게 답변해주세요."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{frame_b64}",
-                                "detail": "low"  # 저해상도로 분석 (토큰 절약)
-                            }
-                        }
-                    ]
-                }
-            ],
+        response = await _vision_request(
+            [{"type": "text", "text": VISION_PROMPT}, _image_part(frame_b64)],
             max_tokens=150
         )
-
         return {
             "description": response.choices[0].message.content,
             "tokens_used": response.usage.total_tokens
         }
+    except HTTPException as e:
+        print(f"GPT Vision 분석 실패: {e.detail}")
     except Exception as e:
         print(f"GPT Vision 분석 실패: {e}")
-        return {
-            "description": "분석 실패",
-            "tokens_used": 0
-        }
+    return {
+        "description": "분석 실패",
+        "tokens_used": 0
+    }
 
-@router.post("/analyze")
-async def analyze_video(file: UploadFile = File(...)):
+def make_contact_sheet(frames_b64: List[str]) -> str:
     """
-    동영상 분석 API
-    - 슬라이싱 기반 요약
-    - GPT Vision API 인물 인식
+    프레임들을 번호를 붙인 격자 한 장으로 합침 -> Base64 JPEG
+    열 수는 ceil(sqrt(n)), 칸 크기는 VISION_SHEET_TILE_WIDTH 기준 (첫 프레임 비율 유지)
     """
-    start_time = time.time()
-
-    # 임시 파일로 저장
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    images = [cv2.imdecode(np.frombuffer(base64.b64decode(b64), np.uint8), cv2.IMREAD_COLOR)
+              for b64 in frames_b64]
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    height, width = images[0].shape[:2]
+    tile_width = VISION_SHEET_TILE_WIDTH
+    tile_height = max(1, int(height * tile_width / width))
+
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), np.uint8)
+    for number, image in enumerate(images):
+        row, column = divmod(number, columns)
+        tile = cv2.resize(image, (tile_width, tile_height), interpolation=cv2.INTER_AREA)
+        label = str(number + 1)
+        cv2.rectangle(tile, (0, 0), (28 + 18 * len(label), 40), (0, 0, 0), -1)
+        cv2.putText(tile, label, (8, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        sheet[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = tile
+
+    _, buffer = cv2.imencode('.jpg', sheet, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return base64.b64encode(buffer).decode('utf-8')
+
+def _parse_batch_response(text: str, count: int) -> Dict[int, str]:
+    """{"frames": [{"frame": 번호, "description": 설명}]} -> 번호(1부터) -> 설명"""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    items = data.get("frames", []) if isinstance(data, dict) else data
+    descriptions = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            number = int(item.get("frame"))
+        except (TypeError, ValueError):
+            continue
+        description = item.get("description")
+        if 1 <= number <= count and isinstance(description, str) and description.strip():
+            descriptions[number] = description.strip()
+    return descriptions
+
+async def analyze_batch_with_gpt(frames_b64: List[str], mode: str) -> List[Dict]:
+    """
+    여러 프레임을 요청 1회로 분석 (결과는 프레임 순서대로)
+    - batch: 이미지 여러 장을 한 요청에 첨부
+    - sheet: 번호를 붙인 격자 이미지(contact sheet) 한 장으로 첨부
+    응답(JSON)에서 빠진 프레임은 프레임별 호출로 다시 분석
+    요청 자체가 재시도 후에도 실패하면 (429/503, 시간 초과 등) 묶음 전체를 "분석 실패"로 처리
+    (이미 과부하인 API에 프레임별 호출을 더 보내지 않도록)
+    토큰은 프레임 수로 나누어 배분
+    """
+    count = len(frames_b64)
+    prompt = VISION_BATCH_PROMPT.format(
+        count=count,
+        layout="번호를 붙여 격자로 배치한 이미지 한 장" if mode == "sheet" else "이미지 각각"
+    )
+    if mode == "sheet":
+        sheet = await asyncio.to_thread(make_contact_sheet, frames_b64)
+        images = [_image_part(sheet, VISION_SHEET_DETAIL)]
+    else:
+        images = [_image_part(frame_b64) for frame_b64 in frames_b64]
 
     try:
-        # 동영상 메타데이터 추출
-        cap = cv2.VideoCapture(tmp_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        duration = frame_count / fps if fps > 0 else 0
-        cap.release()
-
-        # 파일 크기
-        file_size = len(content)
-
-        # 주요 프레임 추출 (10개)
-        print("📸 주요 프레임 추출 중...")
-        key_frames = extract_key_frames(tmp_path, num_frames=10)
-
-        # GPT Vision으로 전체 프레임 분석
-        print(f"🤖 GPT Vision 분석 중... (총 {len(key_frames)}개 프레임)")
-        persons_detected = []
-        total_tokens = 0
-        has_person = False
-
-        for i, frame_b64 in enumerate(key_frames):  # 전체 프레임 분석
-            print(f"  📸 프레임 {i+1}/{len(key_frames)} 분석 중...")
-            result = analyze_frame_with_gpt(frame_b64)
-
-            # "인물 없음" 감지
-            description = result["description"]
-            if "인물" in description.lower() and ("없" in description or "0" in description or "무" in description):
-                has_person_in_frame = False
-            else:
-                has_person_in_frame = True
-                has_person = True
-
-            persons_detected.append({
-                "frame_index": i,
-                "analysis": description,
-                "has_person": has_person_in_frame,
-                "tokens_used": result["tokens_used"]
-            })
-            total_tokens += result["tokens_used"]
-
-        # 요약 생성
-        summary = f"동영상 길이: {duration:.2f}초, 해상도: {width}x{height}, FPS: {fps:.2f}\n"
-        summary += f"전체 프레임 수: {frame_count}개, 분석된 프레임 수: {len(key_frames)}개\n"
-        summary += f"총 사용 토큰: {total_tokens}개\n\n"
-
-        if not has_person:
-            summary += "⚠️ 동영상 전체에서 인물이 감지되지 않았습니다.\n"
+        response = await _vision_request([{"type": "text", "text": prompt}, *images],
+                                         max_tokens=150 * count, json_output=True)
+    except Exception as e:
+        print(f"GPT Vision 묶음 분석 실패: {e.detail if isinstance(e, HTTPException) else e}")
+        return [{"description": "분석 실패", "tokens_used": 0} for _ in frames_b64]
+    descriptions = _parse_batch_response(response.choices[0].message.content, count)
+    tokens_used = response.usage.total_tokens
+
+    results = []
+    share, remainder = divmod(tokens_used, count)
+    for number in range(1, count + 1):
+        if number in descriptions:
+            results.append({"description": descriptions[number],
+                            "tokens_used": share + (1 if number <= remainder else 0)})
         else:
-            summary += "✅ 인물이 감지된 프레임:\n"
-            for p in persons_detected:
-                if p['has_person']:
-                    summary += f"  - 프레임 {p['frame_index']+1}: {p['analysis']}\n"
+            results.append(None)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        print(f"  ⚠️ 묶음 응답에 없는 프레임 {len(missing)}개는 프레임별로 다시 분석")
+        retried = await asyncio.gather(*(analyze_frame_with_gpt(frames_b64[i]) for i in missing))
+        for i, result in zip(missing, retried):
+            results[i] = result
+    return results
+
+def analysis_params(vision_mode: str = VISION_MODE) -> dict:
+    """분석 결과에 영향을 주는 파라미터 (캐시 키에 포함)"""
+    return {
+        "num_frames": ANALYSIS_NUM_FRAMES,
+        "model": VISION_MODEL,
+        "prompt_version": VISION_PROMPT_VERSION,
+        "extraction": FRAME_EXTRACTION_STRATEGY,
+        "selection": FRAME_SELECTION,
+        "scene": [SCENE_THRESHOLD, SCENE_SAMPLE_FPS, SCENE_MAX_DURATION_SECONDS],
+        "person_prefilter": PERSON_PREFILTER,
+        "dedup_distance": FRAME_DEDUP_DISTANCE,
+        "vision_mode": vision_mode,
+        "frames": [FRAME_MAX_WIDTH, FRAME_JPEG_QUALITY],
+        "batch": [VISION_BATCH_SIZE, VISION_SHEET_TILE_WIDTH, VISION_SHEET_DETAIL] if vision_mode != "frame" else None
+    }
 
-            summary += "\n❌ 인물이 없는 프레임:\n"
-            for p in persons_detected:
-                if not p['has_person']:
-                    summary += f"  - 프레임 {p['frame_index']+1}\n"
+async def analyze_frames(key_frames: List[str],
+                         person_counts: Optional[List[Optional[int]]] = None,
+                         mode: str = "frame",
+                         on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> List[Dict]:
+    """
+    전체 프레임 분석 (결과는 프레임 순서대로, 동시 호출 수는 VISION_CONCURRENCY로 제한)
+    - frame: 프레임마다 요청 1회 (동시에 실행)
+    - batch / sheet: VISION_BATCH_SIZE개씩 묶어 요청 1회 (묶음끼리 동시에 실행)
+    로컬 검출에서 인물이 0명인 프레임은 Vision을 호출하지 않음
+    on_progress: 요청이 끝날 때마다 await on_progress(분석한 프레임 수, Vision 대상 프레임 수)
+    """
+    person_counts = person_counts or [None] * len(key_frames)
+    results: List[Optional[Dict]] = [None] * len(key_frames)
+    targets = []
+    for i, count in enumerate(person_counts):
+        if count == 0:
+            results[i] = {"description": "인물 없음 (로컬 검출)", "tokens_used": 0}
+        else:
+            targets.append(i)
+
+    done = 0
+
+    async def tracked(call: Awaitable, frames: int):
+        nonlocal done
+        result = await call
+        done += frames
+        if on_progress is not None:
+            await on_progress(done, len(targets))
+        return result
+
+    if mode == "frame" or len(targets) <= 1:
+        analyzed = await asyncio.gather(*(tracked(analyze_frame_with_gpt(key_frames[i]), 1) for i in targets))
+    else:
+        groups = [targets[i:i + VISION_BATCH_SIZE] for i in range(0, len(targets), VISION_BATCH_SIZE)]
+        batches = await asyncio.gather(*(tracked(analyze_batch_with_gpt([key_frames[i] for i in group], mode),
+                                                 len(group))
+                                         for group in groups))
+        analyzed = [result for batch in batches for result in batch]
+
+    for i, result in zip(targets, analyzed):
+        results[i] = result
+    return results
+
+async def receive_video(request: Request) -> Tuple[Dict[str, Any], str, List[str]]:
+    """
+    분석할 동영상 업로드를 임시 파일로 받음 (multipart 필드: file, 선택 vision_mode)
+    반환값: (업로드 정보, vision_mode, 임시 파일 목록), 실패하면 임시 파일을 지우고 예외
+    """
+    tmp_paths = []
 
-        analysis_time = time.time() - start_time
+    def open_sink(name: str, filename: str):
+        fd, path = tempfile.mkstemp(suffix=Path(filename).suffix)
+        os.close(fd)
+        tmp_paths.append(path)
+        return HashingFileWriter(Path(path))
+
+    try:
+        # 임시 파일로 저장 (청크 단위, 크기 제한)
+        files, fields = await stream_multipart(request, open_sink, VIDEO_MAX_UPLOAD_SIZE)
+        if "file" not in files:
+            raise HTTPException(status_code=400, detail="동영상 파일(file)이 필요합니다")
+        vision_mode = fields.get("vision_mode") or VISION_MODE
+        if vision_mode not in VISION_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"vision_mode는 {', '.join(VISION_MODES)} 중 하나여야 합니다"
+            )
+        return files["file"], vision_mode, tmp_paths
+    except BaseException:
+        remove_files(tmp_paths)
+        raise
+
+def remove_files(paths: List[str]):
+    """임시 파일 삭제"""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
 
-        print(f"✅ 분석 완료 (총 {total_tokens} 토큰 사용, {analysis_time:.2f}초)")
-
-        return VideoAnalysisResult(
-            duration=duration,
-            frame_count=frame_count,
-            fps=fps,
-            resolution=(width, height),
-            file_size=file_size,
-            analysis_time=analysis_time,
-            summary=summary,
-            persons_detected=persons_detected,
-            key_frames=key_frames  # 전체 프레임 반환
+async def _no_progress(stage: str, **data):
+    pass
+
+def lookup_cached_analysis(key: str) -> Optional[Dict[str, Any]]:
+    """
+    캐시된 분석 결과 조회 (SQLite 조회/LRU 갱신과 프레임 파일 사용 시각 갱신, 스레드에서 호출)
+    결과가 가리키는 프레임이 저장소에서 삭제되었으면 None (다시 분석)
+    """
+    cached = analysis_cache.get(key)
+    if cached is not None and not frame_store.touch(
+            url[len(FRAME_URL_PREFIX):-len(".jpg")] for url in cached["key_frames"]):
+        print(f"⚠️ 분석 캐시의 프레임이 삭제되어 다시 분석: {key[:16]}")
+        return None
+    return cached
+
+def with_chat_context(result: Dict[str, Any], filename: str) -> Dict[str, Any]:
+    """분석 결과를 채팅 컨텍스트로 등록하고 analysis_id 추가"""
+    video_info = {"filename": filename, "duration": result["duration"], "resolution": result["resolution"]}
+    return dict(result, analysis_id=chat_contexts.register(result, video_info)["analysis_id"])
+
+async def run_analysis(upload: Dict[str, Any], vision_mode: str, start_time: float,
+                       progress: Callable[..., Awaitable[None]] = _no_progress) -> Dict[str, Any]:
+    """
+    업로드된 동영상 분석 (VideoAnalysisResult 필드 dict 반환)
+    - 같은 동영상/파라미터의 분석 결과는 캐시에서 바로 반환
+    - progress: 단계마다 await progress(stage, **data)
+      stage = probe / extract / vision (done, total) / summary
+    - 결과는 채팅 컨텍스트로 등록 (analysis_id)
+    """
+    tmp_path = str(upload["sink"].path)
+
+    # 같은 내용의 동영상을 같은 설정으로 분석한 적이 있으면 캐시된 결과 반환
+    file_hash = upload["sink"].hexdigest()
+    params = analysis_params(vision_mode)
+    key = cache_key(file_hash, params)
+    cached = await asyncio.to_thread(lookup_cached_analysis, key)
+    if cached is not None:
+        analysis_time = time.time() - start_time
+        print(f"⚡ 분석 캐시 적중: {file_hash[:16]} ({analysis_time * 1000:.1f}ms)")
+        return with_chat_context(dict(cached, analysis_time=analysis_time, cached=True), upload["filename"])
+
+    # 동영상 메타데이터 추출
+    await progress("probe")
+    info = await asyncio.to_thread(probe_video, tmp_path)
+    fps, frame_count = info["fps"], info["frame_count"]
+    width, height, duration = info["width"], info["height"], info["duration"]
+
+    # 파일 크기
+    file_size = upload["size"]
+
+    # 주요 프레임 추출 (최대 10개)
+    print("📸 주요 프레임 추출 중...")
+    selection = frame_selection(duration)
+    await progress("extract", selection=selection)
+    extract_started = time.time()
+    extracted = await asyncio.to_thread(extract_key_frames, tmp_path, ANALYSIS_NUM_FRAMES, selection)
+    # 거의 같은 프레임은 대표 프레임만 분석/반환
+    representatives = [i for i, entry in enumerate(extracted) if entry["duplicate_of"] is None]
+    key_frames = [extracted[i]["image"] for i in representatives]
+    frame_urls = [f"{FRAME_URL_PREFIX}{extracted[i]['frame_id']}.jpg" for i in representatives]
+    key_frame_index = {frame: position for position, frame in enumerate(representatives)}
+    person_counts = [extracted[i]["person_count"] for i in representatives]
+    print(f"  ⏱️ 프레임 추출 {time.time() - extract_started:.2f}초 "
+          f"({selection}, {len(extracted)}개 중 대표 {len(key_frames)}개, {FRAME_EXTRACTION_STRATEGY})")
+
+    # GPT Vision으로 대표 프레임 분석
+    vision_frames = sum(1 for count in person_counts if count != 0)
+    print(f"🤖 GPT Vision 분석 중... (총 {len(key_frames)}개 프레임 중 {vision_frames}개, "
+          f"{vision_mode}, 동시 {VISION_CONCURRENCY}개)")
+    await progress("vision", done=0, total=vision_frames)
+    vision_started = time.time()
+    results = await analyze_frames(
+        key_frames, person_counts, vision_mode,
+        on_progress=lambda done, total: progress("vision", done=done, total=total)
+    )
+    vision_seconds = time.time() - vision_started
+    print(f"  ⏱️ GPT Vision {vision_seconds:.2f}초")
+    await progress("summary")
+    persons_detected = []
+    total_tokens = 0
+    has_person = False
+
+    for i, entry in enumerate(extracted):  # 전체 프레임 분석 결과 (중복 프레임은 대표 결과 재사용)
+        representative = i if entry["duplicate_of"] is None else entry["duplicate_of"]
+        result = results[key_frame_index[representative]]
+        person_count = entry["person_count"]
+
+        description = result["description"]
+        if person_count is not None:
+            # 로컬 검출 결과로 판단
+            has_person_in_frame = person_count > 0
+        # "인물 없음" 감지
+        elif "인물" in description.lower() and ("없" in description or "0" in description or "무" in description):
+            has_person_in_frame = False
+        else:
+            has_person_in_frame = True
+        has_person = has_person or has_person_in_frame
+
+        persons_detected.append({
+            "frame_index": i,
+            "timestamp": round(entry["frame_number"] / fps, 2) if fps > 0 else 0.0,
+            "analysis": description,
+            "has_person": has_person_in_frame,
+            "person_count": person_count,  # 로컬 검출 인물 수 (검출기를 끄면 None)
+            "duplicate_of": entry["duplicate_of"],  # 거의 같은 앞 프레임의 frame_index (없으면 None)
+            "key_frame_index": key_frame_index[representative],  # key_frames에서 이 프레임 이미지 위치
+            # 토큰은 대표 프레임에만 집계
+            "tokens_used": result["tokens_used"] if entry["duplicate_of"] is None else 0
+        })
+        total_tokens += persons_detected[-1]["tokens_used"]
+
+    # 요약 생성
+    summary = f"동영상 길이: {duration:.2f}초, 해상도: {width}x{height}, FPS: {fps:.2f}\n"
+    summary += f"전체 프레임 수: {frame_count}개, 분석된 프레임 수: {len(extracted)}개\n"
+    if len(key_frames) < len(extracted):
+        summary += f"거의 같은 프레임 {len(extracted) - len(key_frames)}개는 대표 프레임 결과 재사용\n"
+    summary += f"총 사용 토큰: {total_tokens}개\n"
+    if PERSON_PREFILTER != "off":
+        summary += f"GPT Vision 호출: {vision_frames}개 (로컬 검출로 {len(key_frames) - vision_frames}개 생략)\n"
+    summary += "\n"
+
+    if not has_person:
+        summary += "⚠️ 동영상 전체에서 인물이 감지되지 않았습니다.\n"
+    else:
+        summary += "✅ 인물이 감지된 프레임:\n"
+        for p in persons_detected:
+            if p['has_person']:
+                summary += f"  - 프레임 {p['frame_index']+1} ({p['timestamp']:.1f}초): {p['analysis']}\n"
+
+        summary += "\n❌ 인물이 없는 프레임:\n"
+        for p in persons_detected:
+            if not p['has_person']:
+                summary += f"  - 프레임 {p['frame_index']+1} ({p['timestamp']:.1f}초)\n"
+
+    analysis_time = time.time() - start_time
+
+    print(f"✅ 분석 완료 (총 {total_tokens} 토큰 사용, {analysis_time:.2f}초)")
+
+    result = dict(
+        duration=duration,
+        frame_count=frame_count,
+        fps=fps,
+        resolution=(width, height),
+        file_size=file_size,
+        summary=summary,
+        persons_detected=persons_detected,
+        key_frames=frame_urls  # 대표 프레임 이미지 URL (persons_detected의 key_frame_index로 참조)
+    )
+
+    # 일부 프레임 분석이 실패한 결과는 캐시하지 않음 (다음 요청에서 다시 시도)
+    if all(p["analysis"] != "분석 실패" for p in persons_detected):
+        await asyncio.to_thread(
+            analysis_cache.put, key, file_hash, params, result, vision_seconds, total_tokens
         )
+    return with_chat_context(dict(result, analysis_time=analysis_time, cached=False), upload["filename"])
+
+@router.post("/analyze")
+async def analyze_video(request: Request):
+    """
+    동영상 분석 API (multipart 필드: file, 선택 vision_mode = frame / batch / sheet)
+    - 슬라이싱 기반 요약
+    - GPT Vision API 인물 인식
+    - 업로드는 받는 대로 임시 파일에 기록 (동영상 크기와 무관하게 메모리 사용 일정)
+    - 같은 동영상/파라미터의 분석 결과는 캐시에서 바로 반환
+    분석이 끝날 때까지 응답을 기다리므로 긴 동영상은 /jobs 사용 권장
+    """
+    start_time = time.time()
+    upload, vision_mode, tmp_paths = await receive_video(request)
+    try:
+        return VideoAnalysisResult(**await run_analysis(upload, vision_mode, start_time))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"동영상 분석 실패: {str(e)}")
 
     finally:
         # 임시 파일 삭제
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        remove_files(tmp_paths)
+
+# ===== 비동기 분석 작업 (작업 ID를 바로 반환, 진행 상황은 SSE / Socket.IO) =====
+
+async def _run_analysis_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    try:
+        return await run_analysis(params["upload"], params["vision_mode"], time.time(), progress)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"동영상 분석 실패: {str(e)}")
+
+analysis_jobs = AnalysisJobQueue(_run_analysis_job)
+
+@router.on_event("startup")
+async def start_analysis_workers():
+    analysis_jobs.start()
+
+@router.on_event("shutdown")
+async def stop_analysis_workers():
+    await analysis_jobs.stop()
+
+def _job_links(job: Dict[str, Any]) -> Dict[str, Any]:
+    job_id = job["job_id"]
+    return {
+        **job,
+        "status_url": f"/api/video/jobs/{job_id}",
+        "events_url": f"/api/video/jobs/{job_id}/events"
+    }
+
+@router.post("/jobs", status_code=202)
+async def submit_analysis_job(request: Request):
+    """
+    동영상 분석 작업 등록 (multipart 필드는 /analyze와 같음)
+    - 업로드가 끝나면 작업 ID를 바로 반환 (202), 분석은 워커가 순서대로 실행
+    - 대기열이 가득 차면 업로드를 받기 전에 503 + Retry-After
+    - 진행 상황: GET /jobs/{job_id}/events (SSE) 또는 Socket.IO subscribe_analysis
+    - 결과: GET /jobs/{job_id} (끝난 작업은 ANALYSIS_JOB_TTL_SECONDS 동안 보관)
+    """
+    busy = HTTPException(status_code=503, detail="분석 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요",
+                         headers={"Retry-After": "10"})
+    try:
+        analysis_jobs.check()
+    except JobQueueFull:
+        raise busy
+
+    upload, vision_mode, tmp_paths = await receive_video(request)
+    try:
+        job = analysis_jobs.submit({"upload": upload, "vision_mode": vision_mode},
+                                   cleanup=lambda: remove_files(tmp_paths))
+    except JobQueueFull:
+        # 업로드를 받는 동안 대기열이 찬 경우
+        remove_files(tmp_paths)
+        raise busy
+    print(f"🗂️ 분석 작업 등록: {job['job_id'][:8]} (대기 {job['position']}개)")
+    return _job_links(job)
+
+@router.get("/jobs")
+async def get_analysis_job_stats():
+    """분석 작업 큐 상태 (대기/실행 중 작업 수, 처리/거절 건수)"""
+    return analysis_jobs.stats()
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """분석 작업 상태 (끝난 작업은 결과 포함)"""
+    job = analysis_jobs.view(job_id, include_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="분석 작업을 찾을 수 없습니다 (만료되었거나 없는 작업)")
+    return _job_links(job)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Server-Sent Events 메시지 한 개"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job_events(job_id: str):
+    """
+    분석 작업 진행 상황 (Server-Sent Events)
+    - event: status (queued / running / done / failed), progress (stage, progress)
+    - 작업이 끝나면 스트림 종료 (결과는 GET /jobs/{job_id})
+    """
+    if analysis_jobs.view(job_id) is None:
+        raise HTTPException(status_code=404, detail="분석 작업을 찾을 수 없습니다 (만료되었거나 없는 작업)")
+
+    async def events():
+        async for event, job in analysis_jobs.subscribe(job_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield _sse(event, job)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/cache")
+async def get_analysis_cache_stats():
+    """분석 결과 캐시 상태 (적중률, 절약한 Vision 호출 시간/토큰, 프레임 저장소 사용량)"""
+    return {**analysis_cache.stats(), "frames": frame_store.stats()}
+
+@router.get("/frames/{frame_id}.jpg")
+async def get_key_frame(frame_id: str, request: Request):
+    """
+    분석 결과의 프레임 이미지 (JPEG)
+    - URL이 내용 해시이므로 immutable로 오래 캐시, ETag로 304
+    """
+    if not frame_store.valid_id(frame_id):
+        raise HTTPException(status_code=404, detail="프레임을 찾을 수 없습니다")
+    headers = {
+        "ETag": make_etag(frame_id),
+        "Cache-Control": f"public, max-age={FRAME_CACHE_SECONDS}, immutable"
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    path = frame_store.path(frame_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="프레임을 찾을 수 없습니다 (만료되었으면 다시 분석하세요)")
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
 
 @router.post("/verify")
-async def verify_file(original_file: UploadFile = File(...), received_file: UploadFile = File(...)):
+async def verify_file(request: Request):
     """
-    파일 검증 API
+    파일 검증 API (multipart 필드: original_file 또는 original_file_id, received_file)
     - SHA256 해시 비교
     - 파일 크기 비교
+    - 업로드는 받는 대로 해시만 계산 (임시 파일/메모리에 모으지 않음)
+    - original_file_id: 저장된 공유 파일(/api/files)의 해시와 비교 (수신 파일만 업로드)
     """
     start_time = time.time()
 
-    # 원본 파일 저장
-    with tempfile.NamedTemporaryFile(delete=False) as tmp1:
-        original_content = await original_file.read()
-        tmp1.write(original_content)
-        tmp1_path = tmp1.name
+    def open_sink(name: str, filename: str):
+        return HashingSink()
+
+    # 원본/수신 파일 해시 계산 (청크 단위, 크기 제한)
+    print("🔐 파일 해시 계산 중...")
+    files, fields = await stream_multipart(request, open_sink, VERIFY_MAX_UPLOAD_SIZE)
+    if "received_file" not in files:
+        raise HTTPException(status_code=400, detail="수신 파일(received_file)이 필요합니다")
+    received = files["received_file"]
+    received_hash = received["sink"].hexdigest()
+    received_size = received["size"]
+
+    original_file_id = fields.get("original_file_id")
+    if "original_file" in files:
+        original_hash = files["original_file"]["sink"].hexdigest()
+        original_size = files["original_file"]["size"]
+    elif original_file_id:
+        metadata = get_file_or_404(original_file_id)
+        original_hash = metadata["hash"]
+        original_size = metadata["size"]
+    else:
+        raise HTTPException(status_code=400, detail="원본 파일(original_file) 또는 original_file_id가 필요합니다")
+
+    is_valid = (original_hash == received_hash) and (original_size == received_size)
+    verification_time = time.time() - start_time
+
+    print(f"{'✅ 검증 성공' if is_valid else '❌ 검증 실패'} ({verification_time:.2f}초)")
+
+    return FileVerificationResult(
+        is_valid=is_valid,
+        original_hash=original_hash,
+        received_hash=received_hash,
+        file_size_match=(original_size == received_size),
+        original_size=original_size,
+        received_size=received_size,
+        verification_time=verification_time,
+        original_file_id=original_file_id if "original_file" not in files else None
+    )
 
-    # 수신 파일 저장
-    with tempfile.NamedTemporaryFile(delete=False) as tmp2:
-        received_content = await received_file.read()
-        tmp2.write(received_content)
-        tmp2_path = tmp2.name
+# ===== 채팅 세션 관리 =====
 
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+CHAT_MAX_TOKENS = 500
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_TIMEOUT_SECONDS", "60"))  # 답변 1회 제한 시간
+CHAT_SUMMARY_PROMPT = (
+    "다음은 동영상 분석 결과에 대한 이전 대화입니다. 이후 대화에 필요한 내용"
+    "(질문 주제, 답변에서 확인된 사실, 사용자의 관심사)만 최대한 짧게 요약해주세요."
+)
+
+# 세션 ID별 대화 기록 (세션 수/TTL 제한, 대화 기록은 토큰 예산 이내, chat_sessions.py 참고)
+chat_sessions = ChatSessionStore()
+chat_contexts = AnalysisContextStore()  # analysis_id -> 미리 만든 채팅 시스템 프롬프트
+# 실행 중인 대화 요약 작업 (완료 전에 가비지 컬렉션되지 않도록 참조 유지)
+summary_tasks: Set[asyncio.Task] = set()
+
+async def summarize_chat(session: Dict[str, Any]):
+    """잘라낸 대화를 기존 요약과 합쳐 다시 요약 (실패하면 요약 없이 버림)"""
+    pending = chat_sessions.take_pending(session)
+    if not pending:
+        return
+    summary = None
     try:
-        # 해시 계산
-        print("🔐 파일 해시 계산 중...")
-        original_hash = calculate_file_hash(tmp1_path)
-        received_hash = calculate_file_hash(tmp2_path)
-
-        # 크기 비교
-        original_size = len(original_content)
-        received_size = len(received_content)
-
-        is_valid = (original_hash == received_hash) and (original_size == received_size)
-        verification_time = time.time() - start_time
-
-        print(f"{'✅ 검증 성공' if is_valid else '❌ 검증 실패'} ({verification_time:.2f}초)")
-
-        return FileVerificationResult(
-            is_valid=is_valid,
-            original_hash=original_hash,
-            received_hash=received_hash,
-            file_size_match=(original_size == received_size),
-            original_size=original_size,
-            received_size=received_size,
-            verification_time=verification_time
+        transcript = "\n".join(
+            f"{'사용자' if m['role'] == 'user' else '어시스턴트'}: {m['content']}" for m in pending
         )
-
-    finally:
-        # 임시 파일 삭제
-        if os.path.exists(tmp1_path):
-            os.remove(tmp1_path)
-        if os.path.exists(tmp2_path):
-            os.remove(tmp2_path)
-
-# ===== 채팅 세션 관리 =====
-
-# 메모리에 채팅 세션 저장 (파일명을 키로 사용)
-chat_sessions: Dict[str, List[Dict[str, str]]] = {}
+        if session["summary"]:
+            transcript = f"기존 요약:\n{session['summary']}\n\n추가 대화:\n{transcript}"
+        response = await get_async_openai_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": CHAT_SUMMARY_PROMPT},
+                {"role": "user", "content": transcript}
+            ],
+            max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+            temperature=0.3
+        )
+        summary = response.choices[0].message.content
+        print(f"📝 대화 요약: {session['session_id'][:8]} (잘라낸 메시지 {len(pending)}개)")
+    except Exception as e:
+        print(f"⚠️ 대화 요약 실패, 잘라낸 대화는 요약 없이 버림: {e}")
+    chat_sessions.set_summary(session, summary)
+
+def schedule_summary(session: Dict[str, Any]):
+    """잘라낸 대화가 있으면 백그라운드에서 요약 (응답을 기다리게 하지 않음)"""
+    if not session["pending"]:
+        return
+    if CHAT_SUMMARY_MAX_TOKENS <= 0:
+        session["pending"].clear()
+        return
+    task = asyncio.get_running_loop().create_task(summarize_chat(session))
+    summary_tasks.add(task)
+    task.add_done_callback(summary_tasks.discard)
 
 class ChatRequest(BaseModel):
-    """채팅 요청"""
+    """채팅 요청 (analysis_id 또는 analysisResult + videoInfo)"""
     question: str
+    analysis_id: Optional[str] = None  # 분석 결과의 analysis_id (등록된 컨텍스트 사용)
+    analysisResult: Optional[Dict[str, Any]] = None  # analysis_id가 없거나 만료되었을 때만 전달
+    videoInfo: Dict[str, Any] = {}
+    session_id: Optional[str] = None  # 이전 응답의 session_id (없거나 만료되었으면 새 세션)
+    chatHistory: List[Dict[str, str]] = []  # 새 세션을 시작할 때만 사용 (이후 대화 기록은 서버가 보관)
+
+class ChatContextRequest(BaseModel):
+    """채팅 컨텍스트 등록 요청"""
     analysisResult: Dict[str, Any]
-    videoInfo: Dict[str, Any]
-    chatHistory: List[Dict[str, str]] = []  # 프론트엔드에서 전달받은 채팅 기록
+    videoInfo: Dict[str, Any] = {}
+
+def get_chat_client() -> AsyncOpenAI:
+    """채팅용 비동기 클라이언트 (이벤트 루프를 막지 않음, 답변이 길어 Vision보다 제한 시간을 길게)"""
+    return get_async_openai_client().with_options(timeout=CHAT_TIMEOUT_SECONDS, max_retries=2)
+
+def start_chat(request: ChatRequest) -> Tuple[Dict[str, Any], List[Dict[str, str]], str]:
+    """채팅 세션과 GPT 메시지 구성 -> (세션, 메시지, analysis_id)"""
+    # 등록된 분석 컨텍스트 (없으면 요청의 분석 결과로 등록)
+    context = chat_contexts.get(request.analysis_id) if request.analysis_id else None
+    if context is None:
+        if request.analysisResult is None:
+            raise HTTPException(status_code=404, detail="분석 컨텍스트를 찾을 수 없습니다 (만료되었거나 없는 ID, analysisResult와 함께 다시 요청)")
+        context = chat_contexts.register(request.analysisResult, request.videoInfo)
+
+    session = chat_sessions.get(request.session_id)
+    if session is None:
+        # 클라이언트가 보낸 기록으로 새 세션 시작 (assistant의 초기 메시지 제외)
+        session = chat_sessions.create([
+            msg for msg in request.chatHistory
+            if msg.get('role') == 'user'
+            or (msg.get('role') == 'assistant' and '동영상 분석이 완료되었습니다' not in msg.get('content', ''))
+        ])
+
+    # GPT 메시지 구성 (미리 만든 시스템 프롬프트 + 이전 대화 요약 + 최근 대화)
+    messages = [{"role": "system", "content": context["system_prompt"]}]
+    messages.extend(chat_sessions.prompt_messages(session))
+
+    # 현재 질문 추가
+    messages.append({
+        "role": "user",
+        "content": request.question
+    })
+    return session, messages, context["analysis_id"]
+
+def finish_chat(session: Dict[str, Any], question: str, answer: str):
+    """세션에 대화 저장 (예산을 넘으면 오래된 대화를 잘라내고 백그라운드에서 요약)"""
+    chat_sessions.append(session, "user", question)
+    chat_sessions.append(session, "assistant", answer)
+    schedule_summary(session)
 
 @router.post("/chat")
 async def chat_with_analysis(request: ChatRequest):
     """
     동영상 분석 결과 기반 채팅 API
-    - 분석 결과를 컨텍스트로 사용
+    - 분석 결과를 컨텍스트로 사용 (analysis_id로 등록된 컨텍스트, 만료되었으면 404)
     - GPT를 통해 추가 질문에 답변
-    - 대화 기억력 보장 (전체 채팅 히스토리 포함)
+    - 대화 기록은 세션 ID별로 서버에 보관 (응답의 session_id를 다음 요청에 전달)
+    - 오래된 대화는 요약으로 합쳐 프롬프트 크기 유지
+    답변이 끝나야 응답하므로 화면에 바로 보여 주려면 /chat/stream 사용
     """
     try:
-        # OpenAI 클라이언트 가져오기
-        openai_client = get_openai_client()
-
-        filename = request.videoInfo.get('filename', 'unknown')
-
-        # 세션 초기화 (파일별로 대화 저장)
-        if filename not in chat_sessions:
-            chat_sessions[filename] = []
-
-        # 컨텍스트 구성 (동영상 정보)
-        context = f"""
-동영상 정보:
-- 파일명: {filename}
-- 길이: {request.videoInfo.get('duration', 0):.2f}초
-- 해상도: {request.videoInfo.get('resolution', [0, 0])[0]}x{request.videoInfo.get('resolution', [0, 0])[1]}
-
-분석 요약:
-{request.analysisResult.get('summary', '')}
-
-인물 감지 정보:
-"""
-        # 인물 정보 추가
-        for person in request.analysisResult.get('persons_detected', []):
-            context += f"\n- 프레임 {person.get('frame_index', 0) + 1}: {person.get('analysis', '')}"
-
-        # GPT 메시지 구성 (시스템 메시지 + 컨텍스트 + 전체 대화 기록)
-        messages = [
-            {
-                "role": "system",
-                "content": f"""당신은 동영상 분석 전문 AI 어시스턴트입니다.
-사용자의 질문에 대해 제공된 동영상 분석 결과를 바탕으로 정확하고 상세하게 답변해주세요.
-동영상에 등장하는 인물의 특징, 장면 설명, 동영상 요약 등을 명확하게 전달하세요.
-분석 결과에 없는 정보는 추측하지 말고, "분석 결과에 해당 정보가 없습니다"라고 답변하세요.
-이전 대화 내용을 참고하여 일관성 있게 답변하세요.
-
-{context}"""
-            }
-        ]
-
-        # 프론트엔드에서 전달받은 채팅 히스토리 추가 (assistant의 초기 메시지 제외)
-        for msg in request.chatHistory:
-            if msg['role'] == 'user' or (msg['role'] == 'assistant' and '동영상 분석이 완료되었습니다' not in msg['content']):
-                messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
-
-        # 현재 질문 추가
-        messages.append({
-            "role": "user",
-            "content": request.question
-        })
+        session, messages, analysis_id = start_chat(request)
 
         # GPT 호출
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await get_chat_client().chat.completions.create(
+            model=CHAT_MODEL,
             messages=messages,
-            max_tokens=500,
+            max_tokens=CHAT_MAX_TOKENS,
             temperature=0.7
         )
 
         answer = response.choices[0].message.content
-
-        # 세션에 대화 저장
-        chat_sessions[filename].append({
-            "role": "user",
-            "content": request.question,
-            "timestamp": time.time()
-        })
-        chat_sessions[filename].append({
-            "role": "assistant",
-            "content": answer,
-            "timestamp": time.time()
-        })
+        finish_chat(session, request.question, answer)
 
         return {
             "answer": answer,
             "tokens_used": response.usage.total_tokens,
-            "session_id": filename,
-            "message_count": len(chat_sessions[filename])
+            "prompt_tokens": response.usage.prompt_tokens,
+            "session_id": session["session_id"],
+            "analysis_id": analysis_id,
+            "message_count": len(session["history"])
         }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"채팅 처리 실패: {str(e)}")
+
+@router.post("/chat/stream")
+async def stream_chat_with_analysis(request: ChatRequest):
+    """
+    동영상 분석 결과 기반 채팅 API (스트리밍, Server-Sent Events)
+    요청은 /chat과 같고, 답변을 생성되는 대로 전달
+    - event: session {session_id, analysis_id} (바로 전송)
+    - event: delta {text} (답변 조각)
+    - event: done {session_id, message_count, answer_length}
+    - event: error {detail}
+    답변이 끝까지 전달된 경우에만 세션에 저장 (중간에 연결이 끊기면 저장하지 않음)
+    """
+    try:
+        openai_client = get_chat_client()
+        session, messages, analysis_id = start_chat(request)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"채팅 처리 실패: {str(e)}")
 
-@router.get("/chat/history/{filename}")
-async def get_chat_history(filename: str):
+    async def events():
+        yield _sse("session", {"session_id": session["session_id"], "analysis_id": analysis_id})
+        stream = None
+        parts = []
+        try:
+            stream = await openai_client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=messages,
+                max_tokens=CHAT_MAX_TOKENS,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    parts.append(text)
+                    yield _sse("delta", {"text": text})
+        except Exception as e:
+            yield _sse("error", {"detail": f"채팅 처리 실패: {str(e)}"})
+            return
+        finally:
+            if stream is not None:
+                await stream.close()
+
+        answer = "".join(parts)
+        finish_chat(session, request.question, answer)
+        yield _sse("done", {
+            "session_id": session["session_id"],
+            "message_count": len(session["history"]),
+            "answer_length": len(answer)
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/chat/contexts")
+async def register_chat_context(request: ChatContextRequest):
+    """
+    분석 결과를 채팅 컨텍스트로 등록 -> analysis_id
+    /analyze, /jobs 결과에는 이미 analysis_id가 있으므로 만료되었거나 다른 곳에서 받은 결과만 등록
+    """
+    return chat_contexts.view(chat_contexts.register(request.analysisResult, request.videoInfo))
+
+@router.get("/chat/contexts")
+async def get_chat_context_stats():
+    """채팅 컨텍스트 저장소 상태 (컨텍스트 수, 적중/실패, 만료/삭제 수)"""
+    return chat_contexts.stats()
+
+@router.get("/chat/sessions")
+async def get_chat_session_stats():
+    """채팅 세션 저장소 상태 (세션 수, 만료/삭제 수, 잘라낸 메시지 수)"""
+    return chat_sessions.stats()
+
+@router.get("/chat/history/{session_id}")
+async def get_chat_history(session_id: str):
     """
-    특정 파일의 채팅 기록 조회
+    채팅 세션의 대화 기록 조회 (토큰 예산 이내의 최근 대화 + 이전 대화 요약)
     """
-    if filename not in chat_sessions:
+    session = chat_sessions.get(session_id)
+    if session is None:
         return {
+            "session_id": session_id,
             "history": [],
+            "summary": "",
             "message_count": 0
         }
 
-    return {
-        "history": chat_sessions[filename],
-        "message_count": len(chat_sessions[filename])
-    }
+    return chat_sessions.view(session)
 
-@router.delete("/chat/history/{filename}")
-async def clear_chat_history(filename: str):
+@router.delete("/chat/history/{session_id}")
+async def clear_chat_history(session_id: str):
     """
-    특정 파일의 채팅 기록 삭제
+    채팅 세션 삭제
     """
-    if filename in chat_sessions:
-        del chat_sessions[filename]
+    chat_sessions.delete(session_id)
 
     return {
         "message": "채팅 기록이 삭제되었습니다",
-        "filename": filename
+        "session_id": session_id
     }
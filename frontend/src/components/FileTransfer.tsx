@@ -48,6 +48,7 @@ export default function FileTransfer({ roomId, socket, myUserId }: FileTransferP
   const [showVerificationModal, setShowVerificationModal] = useState(false);
   const [showAnalysisModal, setShowAnalysisModal] = useState(false);
   const [chatMessages, setChatMessages] = useState<Array<{role: 'user' | 'assistant', content: string}>>([]);
+  const [chatSessionId, setChatSessionId] = useState<string | null>(null);  // 서버 채팅 세션 (대화 기록은 서버가 보관)
   const [chatInput, setChatInput] = useState('');
   const [isChatLoading, setIsChatLoading] = useState(false);
 
@@ -253,6 +254,7 @@ export default function FileTransfer({ roomId, socket, myUserId }: FileTransferP
       });
 
       setAnalysisResult(response.data);
+      setChatSessionId(null);
 
       // 초기 분석 결과를 채팅 메시지로 추가
       setChatMessages([
@@ -284,24 +286,71 @@ export default function FileTransfer({ roomId, socket, myUserId }: FileTransferP
     setChatMessages(prev => [...prev, { role: 'user', content: userMessage }]);
 
     setIsChatLoading(true);
+    let answered = false;
     try {
-      // GPT API로 추가 질문 전송 (전체 채팅 히스토리 포함)
-      const response = await axios.post('/api/video/chat', {
-        question: userMessage,
-        analysisResult: analysisResult,
-        videoInfo: {
-          filename: selectedFile?.name,
-          duration: analysisResult.duration,
-          resolution: analysisResult.resolution,
-        },
-        chatHistory: chatMessages  // 전체 대화 기록 전달
+      // GPT API로 추가 질문 전송 (대화 기록은 서버 세션에 있으므로 세션이 없을 때만 전달)
+      // 분석 결과는 서버에 등록된 analysis_id만 보내고, 만료되었으면(404) 분석 결과와 함께 다시 요청
+      // 스트리밍 API: 답변이 생성되는 대로 화면에 표시 (Server-Sent Events)
+      const sendChat = (withAnalysis: boolean) => fetch('/api/video/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          question: userMessage,
+          analysis_id: analysisResult.analysis_id,
+          ...(withAnalysis && {
+            analysisResult: analysisResult,
+            videoInfo: {
+              filename: selectedFile?.name,
+              duration: analysisResult.duration,
+              resolution: analysisResult.resolution,
+            },
+          }),
+          session_id: chatSessionId,
+          chatHistory: chatSessionId ? [] : chatMessages
+        })
       });
+      let response = await sendChat(!analysisResult.analysis_id);
+      if (response.status === 404 && analysisResult.analysis_id) {
+        response = await sendChat(true);
+      }
+      if (!response.ok || !response.body) {
+        throw new Error(`채팅 요청 실패: ${response.status}`);
+      }
 
-      // AI 응답 추가
-      setChatMessages(prev => [...prev, {
-        role: 'assistant',
-        content: response.data.answer
-      }]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // 이벤트는 빈 줄로 구분 ("event: ...\ndata: {...}")
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = raw.match(/^data: (.*)$/m)?.[1];
+          if (!event || !data) continue;
+          const payload = JSON.parse(data);
+
+          if (event === 'session') {
+            setChatSessionId(payload.session_id);
+          } else if (event === 'delta') {
+            // AI 응답 추가 (첫 조각이면 새 메시지, 이후에는 이어 붙임)
+            const isFirst = !answered;
+            answered = true;
+            setChatMessages(prev => isFirst
+              ? [...prev, { role: 'assistant', content: payload.text }]
+              : [...prev.slice(0, -1), { role: 'assistant', content: prev[prev.length - 1].content + payload.text }]);
+          } else if (event === 'error') {
+            throw new Error(payload.detail);
+          }
+        }
+      }
+      if (!answered) {
+        throw new Error('빈 응답');
+      }
     } catch (error) {
       console.error('질문 처리 실패:', error);
       setChatMessages(prev => [...prev, {
@@ -568,6 +617,10 @@ export default function FileTransfer({ roomId, socket, myUserId }: FileTransferP
                       onClick={() => {
                         if (window.confirm('대화 기록을 초기화하시겠습니까?')) {
                           setChatMessages([chatMessages[0]]);  // 첫 메시지만 유지
+                          if (chatSessionId) {
+                            axios.delete(`/api/video/chat/history/${chatSessionId}`).catch(() => {});
+                            setChatSessionId(null);
+                          }
                           toast.success('대화 기록이 초기화되었습니다');
                         }
                       }}
@@ -605,7 +658,7 @@ export default function FileTransfer({ roomId, socket, myUserId }: FileTransferP
                   </div>
                 ))}
 
-                {isChatLoading && (
+                {isChatLoading && chatMessages[chatMessages.length - 1]?.role === 'user' && (
                   <div className="flex justify-start">
                     <div className="bg-discord-darker text-gray-100 rounded-lg p-4">
                       <div className="flex items-center space-x-2">